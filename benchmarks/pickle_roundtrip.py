@@ -0,0 +1,79 @@
+""" Benchmark of pickling a processed Project and its samples """
+
+import argparse
+import logging
+import pickle
+import time
+
+import pandas as pd
+
+from peppy import Project
+
+CONFIG = {
+    "pep_version": "2.1.0",
+    "sample_modifiers": {
+        "append": {"protocol": "ATAC"},
+        "imply": [{"if": {"organism": "human"}, "then": {"genome": "hg38"}}],
+        "derive": {
+            "attributes": ["read1"],
+            "sources": {"src": "/data/{sample_name}_R1.fq"},
+        },
+    },
+}
+
+
+def make_project(n):
+    """
+    Create a project with the given number of processed samples
+
+    :param int n: number of samples
+    :return peppy.Project: processed project
+    """
+    samples_df = pd.DataFrame(
+        {
+            "sample_name": [f"sample{i}" for i in range(n)],
+            "organism": ["human", "mouse"] * (n // 2) + ["human"] * (n % 2),
+            "read1": "src",
+        }
+    )
+    return Project.from_pandas(samples_df, config=CONFIG)
+
+
+def timed(func, repeat):
+    """
+    Get the best time of the function calls
+
+    :param callable func: function to call
+    :param int repeat: number of calls
+    :return float: shortest call time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--samples", type=int, default=10000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    prj = make_project(args.samples)
+    for label, obj in [("project", prj), ("samples", list(prj.samples))]:
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        dump = timed(
+            lambda: pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), args.repeat
+        )
+        load = timed(lambda: pickle.loads(data), args.repeat)
+        print(
+            f"{label}: {len(data) / 2 ** 20:.1f} MiB, "
+            f"dumps {dump:.3f}s, loads {load:.3f}s, round trip {dump + load:.3f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
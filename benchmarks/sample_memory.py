@@ -0,0 +1,330 @@
+""" Benchmark of the memory held by the samples of a processed Project """
+
+import argparse
+import gc
+import inspect
+import logging
+import multiprocessing
+import os
+import pickle
+import resource
+import tempfile
+import time
+import traceback
+import tracemalloc
+
+import pandas as pd
+import yaml
+
+from peppy import Project
+
+CONFIG = {
+    "pep_version": "2.1.0",
+    "sample_table": "samples.csv",
+    "sample_modifiers": {
+        "append": {"protocol": "ATAC"},
+        "imply": [{"if": {"organism": "human"}, "then": {"genome": "hg38"}}],
+        "derive": {
+            "attributes": ["read1"],
+            "sources": {"src": "/data/{sample_name}_R1.fq"},
+        },
+        "remove": ["batch"],
+    },
+}
+
+# the project forked workers read from
+_PROJECT = None
+
+
+def write_project(n, folder, files=0):
+    """
+    Write the config and sample table of a project with the given number
+    of samples
+
+    :param int n: number of samples
+    :param str folder: folder to write the project files to
+    :param int files: number of files per sample to merge from a subsample
+        table, none if 0
+    :return str: path to the project config
+    """
+    samples_df = pd.DataFrame(
+        {
+            "sample_name": [f"sample{i}" for i in range(n)],
+            "organism": ["human", "mouse"] * (n // 2) + ["human"] * (n % 2),
+            "time": [str(i % 24) for i in range(n)],
+            "replicate": [str(i % 3) for i in range(n)],
+            "condition": ["treated", "untreated"] * (n // 2) + ["treated"] * (n % 2),
+            "lane": [f"L00{i % 4}" for i in range(n)],
+            "batch": [f"batch{i % 10}" for i in range(n)],
+            "read1": "src",
+        }
+    )
+    samples_df.to_csv(os.path.join(folder, CONFIG["sample_table"]), index=False)
+    config = dict(CONFIG)
+    if files:
+        subsamples_df = pd.DataFrame(
+            {
+                "sample_name": [f"sample{i}" for i in range(n) for _ in range(files)],
+                "file": [
+                    f"/data/run{j}/sample{i}_R1.fastq.gz"
+                    for i in range(n)
+                    for j in range(files)
+                ],
+            }
+        )
+        config["subsample_table"] = "subsamples.csv"
+        subsamples_df.to_csv(os.path.join(folder, "subsamples.csv"), index=False)
+    cfg = os.path.join(folder, "project_config.yaml")
+    with open(cfg, "w") as f:
+        yaml.safe_dump(config, f)
+    return cfg
+
+
+def make_project(cfg, **kwargs):
+    """
+    Create a project and process its samples
+
+    :param str cfg: path to the project config
+    :param kwargs: Project construction options
+    :return peppy.Project: processed project
+    """
+    return Project(cfg, **kwargs)
+
+
+def supported_options(modes):
+    """
+    Get the construction options of the modes the installed peppy supports
+
+    :param dict[str, dict] modes: Project construction options by mode name
+    :return dict[str, dict]: the supported modes
+    """
+    params = set(inspect.signature(Project.__init__).parameters)
+    return {mode: opts for mode, opts in modes.items() if set(opts) <= params}
+
+
+def resident_mib():
+    """
+    Get the resident memory of the process
+
+    :return float: resident set size in MiB
+    """
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def private_mib():
+    """
+    Get the memory the process does not share with the processes it was
+    forked from
+
+    :return float: private memory in MiB
+    """
+    total = 0
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                total += int(line.split()[1])
+    return total / 2**10
+
+
+def in_child(func, *args):
+    """
+    Call the function in a forked process, so that each measurement starts
+    from the same memory state
+
+    :param callable func: function to call
+    :param args: function arguments
+    :return: function result
+    :raise RuntimeError: if the function raised in the forked process
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            with os.fdopen(write_fd, "wb") as pipe:
+                try:
+                    outcome = (True, func(*args))
+                except BaseException:
+                    outcome = (False, traceback.format_exc())
+                pickle.dump(outcome, pipe)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as pipe:
+        succeeded, result = pickle.load(pipe)
+    os.waitpid(pid, 0)
+    if not succeeded:
+        raise RuntimeError(f"{func.__name__} failed:\n{result}")
+    return result
+
+
+def measure_memory(cfg, n, options):
+    """
+    Measure the memory the processed samples retain and take at peak
+
+    :param str cfg: path to the project config
+    :param int n: number of samples
+    :param dict options: Project construction options
+    :return dict: bytes per sample retained and at peak, resident and
+        peak resident MiB over the interpreter baseline
+    """
+    baseline = resident_mib()
+    tracemalloc.start()
+    prj = make_project(cfg, **options)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resident = resident_mib() - baseline
+    max_resident = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    assert len(prj.samples) == n
+    return {
+        "retained": retained / n,
+        "peak": peak / n,
+        "resident": resident,
+        "peak_resident": max_resident - baseline,
+    }
+
+
+def measure_gc(cfg):
+    """
+    Measure the garbage collection while the project is alive and after
+    the last reference to it is dropped
+
+    :param str cfg: path to the project config
+    :return dict: collection times in seconds and the number of objects
+        the collection after the drop found unreachable
+    """
+    prj = make_project(cfg)
+    gc.collect()
+    start = time.perf_counter()
+    gc.collect()
+    alive = time.perf_counter() - start
+    start = time.perf_counter()
+    del prj
+    dropped = time.perf_counter() - start
+    start = time.perf_counter()
+    unreachable = gc.collect()
+    collected = time.perf_counter() - start
+    return {
+        "alive": alive,
+        "drop": dropped,
+        "collect": collected,
+        "unreachable": unreachable,
+    }
+
+
+def _read_samples(_):
+    """
+    Read two attributes of every sample of the forked project
+
+    :return (float, float): private memory growth in MiB and the pass time
+    """
+    before = private_mib()
+    start = time.perf_counter()
+    for sample in _PROJECT.samples:
+        values = (sample["organism"], sample["read1"])
+    elapsed = time.perf_counter() - start
+    return private_mib() - before, elapsed
+
+
+def measure_fork(cfg, workers, frozen):
+    """
+    Measure the private memory forked workers gain by reading the samples
+
+    :param str cfg: path to the project config
+    :param int workers: number of workers
+    :param bool frozen: whether to freeze the project before forking
+    :return dict: mean private memory growth in MiB and pass time in seconds
+    """
+    global _PROJECT
+    _PROJECT = make_project(cfg)
+    if frozen:
+        _PROJECT.freeze()
+    gc.collect()
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(workers) as pool:
+        results = pool.map(_read_samples, range(workers))
+    return {
+        "growth": sum(r[0] for r in results) / workers,
+        "time": sum(r[1] for r in results) / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        epilog="Run it on two revisions to compare them; the modes the "
+        "installed peppy does not support are skipped.",
+    )
+    parser.add_argument("-n", "--samples", type=int, default=100000)
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument(
+        "-f",
+        "--files",
+        type=int,
+        default=0,
+        help="files per sample merged from a subsample table",
+    )
+    parser.add_argument(
+        "-s",
+        "--sections",
+        nargs="+",
+        choices=["memory", "gc", "fork"],
+        default=["memory", "gc", "fork"],
+    )
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    n = args.samples
+    with tempfile.TemporaryDirectory() as folder:
+        run_sections(
+            write_project(n, folder, args.files), n, args.workers, args.sections
+        )
+
+
+def run_sections(cfg, n, workers, sections):
+    """
+    Run the benchmark sections and print their results
+
+    :param str cfg: path to the project config
+    :param int n: number of samples
+    :param int workers: number of forked workers
+    :param Iterable[str] sections: names of the sections to run
+    """
+    if "memory" in sections:
+        modes = supported_options(
+            {
+                "default": {},
+                "low_memory": {"low_memory": True},
+                "row_views": {"row_views": True},
+            }
+        )
+        for mode, options in modes.items():
+            result = in_child(measure_memory, cfg, n, options)
+            print(
+                f"memory {mode}: {result['retained']:.0f} B/sample retained, "
+                f"{result['peak']:.0f} B/sample peak, "
+                f"{result['resident']:.1f} MiB resident, "
+                f"{result['peak_resident']:.1f} MiB peak resident"
+            )
+    if "gc" in sections:
+        result = in_child(measure_gc, cfg)
+        print(
+            f"gc: collection {result['alive'] * 1000:.1f} ms with the project "
+            f"alive; dropping it {result['drop'] * 1000:.1f} ms, then collection "
+            f"{result['collect'] * 1000:.1f} ms finding "
+            f"{result['unreachable']} unreachable objects"
+        )
+    if "fork" in sections:
+        frozen_modes = [False, True] if hasattr(Project, "freeze") else [False]
+        for frozen in frozen_modes:
+            result = in_child(measure_fork, cfg, workers, frozen)
+            print(
+                f"fork {'frozen' if frozen else 'plain'}: "
+                f"{result['growth']:.1f} MiB private growth per worker, "
+                f"{result['time']:.2f}s per pass"
+            )
+
+
+if __name__ == "__main__":
+    main()
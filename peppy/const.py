@@ -88,6 +88,9 @@ ATTR_KEY_PREFIX = "_key_"
 INPUTS_ATTR_NAME = "input_attrs"
 REQ_INPUTS_ATTR_NAME = "required_" + INPUTS_ATTR_NAME
 PROTOCOL_KEY = "protocol"
+PATCH_ATTR_COLUMN = "column"
+PATCH_VALUE_COLUMN = "value"
+IMPLIED_ATTRS_KEY = "_implied_attrs"
 SAMPLE_CONSTANTS = [
     "PROTOCOL_KEY",
     "SUBSAMPLE_SHEET_KEY",
@@ -106,14 +109,19 @@ SAMPLE_CONSTANTS = [
     "SAMPLE_YAML_FILE_KEY",
     "SAMPLE_YAML_EXT",
     "SAMPLE_MODIFIERS",
+    "PATCH_ATTR_COLUMN",
+    "PATCH_VALUE_COLUMN",
+    "IMPLIED_ATTRS_KEY",
 ]
 
 # Other
 REQUIRED_VERSION = ["2", "1", "0"]
 PKG_NAME = "peppy"
 MAX_PROJECT_SAMPLES_REPR = 20
+SAMPLE_CACHE_SIZE = 1024
 OTHER_CONSTANTS = [
     "MAX_PROJECT_SAMPLES_REPR",
+    "SAMPLE_CACHE_SIZE",
     "PKG_NAME",
     "REQUIRED_VERSION",
 ]
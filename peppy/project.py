@@ -2,25 +2,34 @@
 Build a Project object.
 """
 
+import ast
+import gc
+import heapq
+import operator
 import os
 import sys
 from collections.abc import Mapping, MutableMapping
-from contextlib import suppress
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from copy import deepcopy
+from functools import partial
+from itertools import repeat
 from logging import getLogger
-from typing import Iterable, List, Tuple, Union, Literal
+from typing import Iterable, List, Literal, Union
 
 import numpy as np
 import pandas as pd
 import yaml
+from pandas.api.types import infer_dtype, is_scalar
 from pandas.core.common import flatten
 from rich.console import Console
 from rich.progress import track
 from ubiquerg import is_url
-from copy import deepcopy
 
 from .const import (
     ACTIVE_AMENDMENTS_KEY,
     AMENDMENTS_KEY,
+    APPEND_KEY,
     ATTR_KEY_PREFIX,
     CFG_IMPORTS_KEY,
     CFG_SAMPLE_TABLE_KEY,
@@ -28,12 +37,12 @@ from .const import (
     CONFIG_FILE_KEY,
     CONFIG_KEY,
     CONFIG_VERSION_KEY,
-    APPEND_KEY,
     DERIVED_ATTRS_KEY,
     DERIVED_KEY,
     DERIVED_SOURCES_KEY,
     DESC_KEY,
     DUPLICATED_KEY,
+    IMPLIED_ATTRS_KEY,
     IMPLIED_COND_KEYS,
     IMPLIED_IF_KEY,
     IMPLIED_KEY,
@@ -41,11 +50,16 @@ from .const import (
     MAX_PROJECT_SAMPLES_REPR,
     METADATA_KEY,
     NAME_KEY,
+    ORIGINAL_CONFIG_KEY,
+    PATCH_ATTR_COLUMN,
+    PATCH_VALUE_COLUMN,
     PEP_LATEST_VERSION,
     PKG_NAME,
+    PRJ_REF,
     PROJ_MODS_KEY,
     REMOVE_KEY,
     REQUIRED_VERSION,
+    SAMPLE_CACHE_SIZE,
     SAMPLE_DF_KEY,
     SAMPLE_DF_LARGE,
     SAMPLE_EDIT_FLAG_KEY,
@@ -60,28 +74,47 @@ from .const import (
     SUBSAMPLE_RAW_LIST_KEY,
     SUBSAMPLE_TABLE_INDEX_KEY,
     SUBSAMPLE_TABLES_FILE_KEY,
-    ORIGINAL_CONFIG_KEY,
 )
 from .exceptions import (
-    InvalidSampleTableFileException,
-    MissingAmendmentError,
     IllegalStateException,
     InvalidConfigFileException,
+    InvalidSampleTableFileException,
+    MissingAmendmentError,
 )
 from .parsers import select_parser
-from .sample import Sample
+from .sample import (
+    DerivedSourceTemplate,
+    LazyDerivedAttribute,
+    MultiValue,
+    Sample,
+    SampleRows,
+    _obj2dict,
+    compile_derived_sources,
+    glob_derived_patterns,
+    has_glob_patterns,
+)
+from .sample_store import FrozenSamples, SampleStore
 from .utils import (
-    copy,
     is_cfg_or_anno,
     load_yaml,
     make_abs_via_cfg,
     make_list,
+    pandas_copy_on_write,
 )
 
 _LOGGER = getLogger(PKG_NAME)
 
+# value of the attributes the samples lack, in the sample indexes
+_MISSING = object()
+
+# longest implication 'if' string indexed by its substrings
+_MAX_INDEXED_STRING_LEN = 64
+
+# how deep the samples are kept in the objects a project refers to,
+# e.g. in the edited (sample, attributes) pairs dict
+_SAMPLES_DEPTH = 3
+
 
-@copy
 class Project(MutableMapping):
     """
     A class to model a Project (collection of samples and metadata).
@@ -95,6 +128,25 @@ class Project(MutableMapping):
     :param str | Iterable[str] amendments: names of the amendments to activate
     :param Iterable[str] amendments: amendments to use within configuration file
     :param bool defer_samples_creation: whether the sample creation should be skipped
+    :param int derive_max_workers: size of the thread pool used to expand
+        the derived attributes' glob patterns; patterns are expanded one by one if not set
+    :param bool lazy_derive: whether the derived attributes should be resolved
+        on first access rather than when the samples are created
+    :param int modifier_processes: number of worker processes to apply the
+        sample modifiers with; all samples are modified in this process if not set
+    :param bool row_views: whether the samples should read their values from
+        the sample table columns, rather than each holding a copy of them;
+        a sample gets its own values when it is edited. The parsed sample
+        table is released, if it can be read again. The attribute reads are
+        slower and the peak memory use is the same
+    :param bool low_memory: whether to drop the parsed sample and subsample
+        tables once the samples are created, if they can be read from the
+        files again, and to generate the sample table when it is requested
+    :param str | bool sample_store: path to a SQLite database to keep the
+        processed samples in, rather than in memory, or True to use a
+        temporary one; the samples are processed in chunks of the cache size
+    :param int sample_cache_size: number of the recently used samples to
+        keep in memory if the samples are kept in a sample store
 
     :Example:
 
@@ -112,6 +164,13 @@ class Project(MutableMapping):
         sample_table_index: Union[str, Iterable[str]] = None,
         subsample_table_index: Union[str, Iterable[str]] = None,
         defer_samples_creation: bool = False,
+        derive_max_workers: int = None,
+        lazy_derive: bool = False,
+        modifier_processes: int = None,
+        row_views: bool = False,
+        low_memory: bool = False,
+        sample_store: Union[str, bool] = None,
+        sample_cache_size: int = SAMPLE_CACHE_SIZE,
     ):
         _LOGGER.debug(
             "Creating {}{}".format(
@@ -138,8 +197,19 @@ class Project(MutableMapping):
             self[SUBSAMPLE_TABLES_FILE_KEY] = None
 
         self._samples = []
+        self._sample_index = None
+        self._sample_edits = {}
+        self._table_samples = None
         self[SAMPLE_EDIT_FLAG_KEY] = False
         self.progressbar = False
+        self.derive_max_workers = derive_max_workers
+        self.lazy_derive = lazy_derive
+        self.modifier_processes = modifier_processes
+        self.row_views = row_views
+        self._row_stores = []
+        self.low_memory = low_memory
+        self.sample_store = sample_store
+        self.sample_cache_size = sample_cache_size
 
         # table indexes can be specified in config or passed to the object constructor
         # That's the priority order:
@@ -162,9 +232,7 @@ class Project(MutableMapping):
 
         if not defer_samples_creation:
             self.create_samples(modify=False if self[SAMPLE_TABLE_FILE_KEY] else True)
-        self._sample_table = self._get_table_from_samples(
-            index=self.st_index, initial=True
-        )
+        self._init_sample_table()
 
     def __eq__(self, other):
         return [s.to_dict() for s in self.samples] == [
@@ -196,9 +264,7 @@ class Project(MutableMapping):
         tmp_obj[CONFIG_KEY] = config
 
         tmp_obj.create_samples(modify=False if tmp_obj[SAMPLE_TABLE_FILE_KEY] else True)
-        tmp_obj._sample_table = tmp_obj._get_table_from_samples(
-            index=tmp_obj.st_index, initial=True
-        )
+        tmp_obj._init_sample_table()
         return tmp_obj
 
     @classmethod
@@ -259,9 +325,7 @@ class Project(MutableMapping):
         self._set_indexes(self[CONFIG_KEY])
 
         self.create_samples(modify=False if self[SAMPLE_TABLE_FILE_KEY] else True)
-        self._sample_table = self._get_table_from_samples(
-            index=self.st_index, initial=True
-        )
+        self._init_sample_table()
 
         return self
 
@@ -273,6 +337,13 @@ class Project(MutableMapping):
         sample_table_index: Union[str, Iterable[str]] = None,
         subsample_table_index: Union[str, Iterable[str]] = None,
         defer_samples_creation: bool = False,
+        derive_max_workers: int = None,
+        lazy_derive: bool = False,
+        modifier_processes: int = None,
+        row_views: bool = False,
+        low_memory: bool = False,
+        sample_store: Union[str, bool] = None,
+        sample_cache_size: int = SAMPLE_CACHE_SIZE,
     ):
         """
         Init a peppy project instance from a yaml file
@@ -286,6 +357,20 @@ class Project(MutableMapping):
         :param str | Iterable[str] amendments: names of the amendments to activate
         :param Iterable[str] amendments: amendments to use within configuration file
         :param bool defer_samples_creation: whether the sample creation should be skipped
+        :param int derive_max_workers: size of the thread pool used to expand
+            the derived attributes' glob patterns
+        :param bool lazy_derive: whether the derived attributes should be
+            resolved on first access
+        :param int modifier_processes: number of worker processes to apply
+            the sample modifiers with
+        :param bool row_views: whether the samples should read their values
+            from the sample table columns
+        :param bool low_memory: whether to drop the parsed tables once the
+            samples are created and to generate the sample table on demand
+        :param str | bool sample_store: path to a SQLite database to keep
+            the processed samples in, or True to use a temporary one
+        :param int sample_cache_size: number of the recently used samples
+            to keep in memory if a sample store is used
         """
         # TODO: this is just a copy of the __init__ method. It should be refactored
         return cls(
@@ -294,6 +379,13 @@ class Project(MutableMapping):
             sample_table_index=sample_table_index,
             subsample_table_index=subsample_table_index,
             defer_samples_creation=defer_samples_creation,
+            derive_max_workers=derive_max_workers,
+            lazy_derive=lazy_derive,
+            modifier_processes=modifier_processes,
+            row_views=row_views,
+            low_memory=low_memory,
+            sample_store=sample_store,
+            sample_cache_size=sample_cache_size,
         )
 
     @classmethod
@@ -325,7 +417,8 @@ class Project(MutableMapping):
         :return dict: a dictionary representation of the Project object
         """
         if extended:
-            if self[SUBSAMPLE_DF_KEY] is not None:
+            self._restore_raw_tables()
+            if self.get(SUBSAMPLE_DF_KEY) is not None:
                 sub_df = [
                     sub_a.to_dict(orient=orient) for sub_a in self[SUBSAMPLE_DF_KEY]
                 ]
@@ -339,8 +432,13 @@ class Project(MutableMapping):
             except NotImplementedError:
                 self[ORIGINAL_CONFIG_KEY][NAME_KEY] = "unnamed"
             self[ORIGINAL_CONFIG_KEY][DESC_KEY] = self.description
+            raw_table = self._raw_sample_table()
+            if raw_table is None:
+                # there is no parsed table to read, e.g. in a project attached
+                # to shared memory, so the samples are what is there
+                raw_table = self.sample_table.reset_index(drop=True)
             p_dict = {
-                SAMPLE_RAW_DICT_KEY: self[SAMPLE_DF_KEY].to_dict(orient=orient),
+                SAMPLE_RAW_DICT_KEY: raw_table.to_dict(orient=orient),
                 CONFIG_KEY: dict(self[ORIGINAL_CONFIG_KEY]),
                 SUBSAMPLE_RAW_LIST_KEY: sub_df,
             }
@@ -352,10 +450,164 @@ class Project(MutableMapping):
 
         return p_dict
 
+    def copy(self):
+        """
+        Copy the project
+
+        The copy shares the sample and subsample tables with this project
+        until either one modifies them, if pandas copies on write, and has
+        its own copies of the table columns otherwise. Its samples share the
+        attribute values with the samples of this project copy-on-write:
+        a sample gets its own values when it is written to. The copy still
+        has a Sample object of its own per sample, bound to it, and its own
+        copies of the config and of the mutable public attribute values,
+        such as lists set by the user. Nothing is processed again. The copy
+        keeps its samples in memory, even if this project keeps them in a
+        sample store.
+
+        :return peppy.Project: copy of the project
+        """
+        self._apply_sample_edits()
+        prj = self.__class__.__new__(self.__class__)
+        prj.__dict__.update(self.__dict__)
+        prj.__dict__.pop("_held_by_samples", None)
+        prj._project_data = {
+            key: _copy_project_data(value) for key, value in self._project_data.items()
+        }
+        samples = list(self._samples)
+        copies = {id(s): s._copy(prj=prj) for s in samples}
+        prj._samples = [copies[id(s)] for s in samples]
+        prj._sample_index = None
+        prj.sample_store = None
+        prj._sample_edits = {}
+        prj._table_positions = None
+        prj._row_stores = []
+        prj._appended_rows = list(getattr(self, "_appended_rows", None) or [])
+        if getattr(self, "_sample_table", None) is not None:
+            prj._sample_table = _copy_project_data(self._sample_table)
+        for attr in ("st_index", "sst_index"):
+            if isinstance(getattr(self, attr, None), list):
+                setattr(prj, attr, list(getattr(self, attr)))
+        table_samples = getattr(self, "_table_samples", None)
+        if table_samples is not None and all(id(s) in copies for s in table_samples):
+            prj._table_samples = [copies[id(s)] for s in table_samples]
+            prj._view_samples()
+        else:
+            prj._table_samples = None
+        return prj
+
+    def freeze(self):
+        """
+        Freeze the processed samples, so that the processes forked from this
+        one keep sharing the memory holding them
+
+        Sample objects have their reference counts updated whenever they are
+        used, which copies the memory pages holding them into every forked
+        process that reads them. The samples are serialized into a single
+        immutable buffer instead, which the garbage collector does not scan
+        either, and are deserialized when they are accessed. The lazily
+        derived attributes are resolved first. The samples of a frozen
+        Project cannot be edited, added or removed.
+
+        :return peppy.Project: this project
+        """
+        if isinstance(self._samples, FrozenSamples):
+            return self
+        self._apply_sample_edits()
+        self._samples = FrozenSamples(self._samples, index=self.st_index, prj=self)
+        self._sample_index = None
+        self._table_samples = None
+        self._sample_edits = {}
+        self._table_positions = None
+        self._row_stores = []
+        return self
+
+    def publish(self):
+        """
+        Publish the processed project into a new shared memory block, so that
+        other processes can attach to it with `Project.from_shared_memory`
+        rather than have it pickled and processed again
+
+        The samples are serialized the way `Project.freeze` does it, this
+        project is left as it is. The parsed sample and subsample tables are
+        not published; the attached projects read them from the files when
+        they are requested, if they were read from files. The block is to be
+        closed and unlinked by the caller once the other processes are done
+        with it.
+
+        :return multiprocessing.shared_memory.SharedMemory: the block holding
+            the project; its name is what the other processes attach to
+        """
+        self._apply_sample_edits()
+        samples = self._samples
+        if not isinstance(samples, FrozenSamples):
+            samples = FrozenSamples(samples, index=self.st_index, prj=self)
+        project_data = {
+            key: value
+            for key, value in self._project_data.items()
+            if key not in (SAMPLE_DF_KEY, SUBSAMPLE_DF_KEY)
+        }
+        project_data[SAMPLE_DF_KEY] = None
+        project_data[SUBSAMPLE_DF_KEY] = None
+        return samples.share(
+            {
+                "project_data": project_data,
+                "st_index": self.st_index,
+                "sst_index": self.sst_index,
+                "raw_tables_rereadable": getattr(
+                    self, "_raw_tables_rereadable", False
+                ),
+            }
+        )
+
+    @classmethod
+    def from_shared_memory(cls, name: str):
+        """
+        Attach to a project published into shared memory with `Project.publish`
+
+        The samples are read from the shared memory block, without copying
+        it, so the project is frozen. The sample table is generated from the
+        samples when it is requested, the parsed tables are read from the
+        files of the published project.
+
+        :param str name: name of the shared memory block
+        :return peppy.Project: frozen project reading the samples from the
+            shared memory
+        """
+        prj = cls(defer_samples_creation=True)
+        samples, state = FrozenSamples.attach(name, prj=prj)
+        prj._project_data.update(state["project_data"])
+        prj.st_index = state["st_index"]
+        prj.sst_index = state["sst_index"]
+        # the parsed tables were not published, they are read when needed
+        prj._raw_tables_rereadable = state["raw_tables_rereadable"]
+        prj._raw_tables_released = prj._raw_tables_rereadable
+        prj._samples = samples
+        prj._sample_table = None
+        prj._table_samples = None
+        prj[SAMPLE_EDIT_FLAG_KEY] = True
+        return prj
+
+    def _assert_not_frozen(self):
+        """
+        Make sure the samples can be changed
+
+        :raise IllegalStateException: if the Project is frozen
+        """
+        if isinstance(getattr(self, "_samples", None), FrozenSamples):
+            raise IllegalStateException(
+                "Samples of a frozen Project cannot be edited, added or removed"
+            )
+
     def create_samples(self, modify: bool = False):
         """
         Populate Project with Sample objects
         """
+        # the new samples do not correspond to the stashed sample table rows
+        self._table_samples = None
+        if getattr(self, "sample_store", None):
+            self._create_samples_in_store(modify)
+            return
         self._samples: List[Sample] = self.load_samples()
         if self.samples is None:
             _LOGGER.debug("No samples found in the project.")
@@ -366,6 +618,62 @@ class Project(MutableMapping):
             self._assert_samples_have_names()
             self._auto_merge_duplicated_names()
 
+    def _create_samples_in_store(self, modify):
+        """
+        Populate the sample store with processed Sample objects
+
+        The samples are created and processed in chunks of the cache size,
+        so that they are not all in memory at once. The samples are processed
+        all together if their names are not unique, to merge the duplicates.
+
+        :param bool modify: whether to apply the sample modifiers
+        """
+        store = self._samples
+        if isinstance(store, SampleStore):
+            store.clear()
+        else:
+            store = SampleStore(
+                path=self.sample_store if isinstance(self.sample_store, str) else None,
+                cache_size=self.sample_cache_size,
+                index=self.st_index,
+                prj=self,
+            )
+        table = self._prepare_sample_data()
+        if table is None:
+            chunks = []
+        elif (
+            self.st_index in table.columns
+            and not table[self.st_index].duplicated().any()
+        ):
+            chunks = [
+                table.iloc[start : start + store.cache_size]
+                for start in range(0, len(table), store.cache_size)
+            ]
+        else:
+            chunks = [table]
+        subsample_tables = self[SUBSAMPLE_DF_KEY] if len(chunks) > 1 else None
+        if subsample_tables is not None:
+            subsample_chunks = _SubsampleChunks(
+                subsample_tables, self.st_index, table[self.st_index]
+            )
+        try:
+            for number, chunk in enumerate(chunks):
+                if subsample_tables is not None:
+                    self[SUBSAMPLE_DF_KEY] = subsample_chunks.tables_for(
+                        chunk[self.st_index], orphans=number == 0
+                    )
+                self._samples = [Sample(r, prj=self) for _, r in chunk.iterrows()]
+                if modify:
+                    self.modify_samples()
+                else:
+                    self._assert_samples_have_names()
+                    self._auto_merge_duplicated_names()
+                store.extend(self._samples)
+        finally:
+            self._samples = store
+            if subsample_tables is not None:
+                self[SUBSAMPLE_DF_KEY] = subsample_tables
+
     def _reinit(self):
         """
         Clear all object attributes and initialize again
@@ -374,17 +682,96 @@ class Project(MutableMapping):
             cfg_path = getattr(self, "config_file")
         else:
             cfg_path = None
+        options = self._processing_options()
         obj_attributes = self.__dict__.copy().keys()
         for attr in obj_attributes:
             delattr(self, attr)
-        self.__init__(cfg=cfg_path)
+        self.__init__(cfg=cfg_path, **options)
+
+    def _processing_options(self):
+        """
+        Get the sample processing options the Project was created with,
+        so that they can be carried over re-initialization
+
+        :return dict: constructor keyword arguments
+        """
+        return {
+            "derive_max_workers": getattr(self, "derive_max_workers", None),
+            "lazy_derive": getattr(self, "lazy_derive", False),
+            "modifier_processes": getattr(self, "modifier_processes", None),
+            "row_views": getattr(self, "row_views", False),
+            "low_memory": getattr(self, "low_memory", False),
+            "sample_store": getattr(self, "sample_store", None),
+            "sample_cache_size": getattr(self, "sample_cache_size", SAMPLE_CACHE_SIZE),
+        }
 
-    def _get_table_from_samples(self, index, initial=False):
+    def _init_sample_table(self):
+        """
+        Stash the initial sample table
+
+        If the derived attributes are resolved lazily, building the table
+        would resolve them all, so it's deferred until the table is requested.
+        In low memory mode the table is deferred too, unless it is the parsed
+        table itself, and the parsed tables are released. The table is also
+        deferred if the samples are kept in a sample store, as building it
+        reads all of them.
+        """
+        low_memory = getattr(self, "low_memory", False) and self._modifier_exists()
+        stored = isinstance(self._samples, SampleStore)
+        if (
+            low_memory
+            or (stored and self._modifier_exists())
+            or (
+                getattr(self, "lazy_derive", False)
+                and self._modifier_exists(DERIVED_KEY)
+            )
+        ):
+            self._sample_table = None
+            self._table_samples = None
+            self[SAMPLE_EDIT_FLAG_KEY] = True
+            if low_memory:
+                self._release_raw_tables()
+                if not stored:
+                    for sample in self.samples:
+                        sample._trim()
+            return
+        self._sample_table = self._get_table_from_samples(
+            index=self.st_index, initial=True
+        )
+        if self._modifier_exists():
+            # the table reflects the modified samples already
+            self[SAMPLE_EDIT_FLAG_KEY] = False
+        self._track_sample_table()
+
+    def _release_raw_tables(self):
+        """
+        Drop the parsed sample and subsample tables, if they were read from
+        files, so that they can be read again when they are needed
+        """
+        if not getattr(self, "_raw_tables_rereadable", False):
+            return
+        _LOGGER.debug("Releasing the parsed sample and subsample tables")
+        self[SAMPLE_DF_KEY] = None
+        self[SUBSAMPLE_DF_KEY] = None
+        self._raw_tables_released = True
+
+    def _restore_raw_tables(self):
+        """
+        Read the sample and subsample tables again, if they were released
+        """
+        if getattr(self, "_raw_tables_released", False):
+            _LOGGER.debug("Reading the released sample and subsample tables")
+            self._read_sample_data()
+            self._raw_tables_released = False
+
+    def _get_table_from_samples(self, index, initial=False, samples=None):
         """
         Generate a data frame from samples. Excludes private
         attrs (prepended with an underscore)
 
         :param str | Iterable[str] index: name of the columns to set the index to
+        :param Iterable[peppy.Sample] samples: samples to generate the data
+            frame from, all the Project's samples by default
         :return pandas.DataFrame: a data frame with current samples attributes
         """
         if initial and not self._modifier_exists():
@@ -393,11 +780,20 @@ class Project(MutableMapping):
             # and no sample_modifiers section is defined in the config,
             # then we can simply reuse the previously read anno sheet.
             if SAMPLE_DF_KEY in self:
-                df = self[SAMPLE_DF_KEY]
+                df = self._raw_sample_table()
             else:
                 df = pd.DataFrame()
         else:
-            df = pd.DataFrame.from_dict([s.to_dict() for s in self.samples])
+            samples = self.samples if samples is None else samples
+            if isinstance(samples, SampleStore):
+                # a frame per chunk, so that only a chunk of rows is held as dicts
+                frames = [
+                    pd.DataFrame.from_dict([s._table_dict() for s in chunk])
+                    for chunk in samples.chunks()
+                ]
+                df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            else:
+                df = pd.DataFrame.from_dict([s._table_dict() for s in samples])
         index = [index] if isinstance(index, str) else index
         if not all([i in df.columns for i in index]):
             _LOGGER.debug(
@@ -409,6 +805,272 @@ class Project(MutableMapping):
         df.set_index(keys=index, drop=False, inplace=True)
         return df
 
+    def _track_sample_table(self):
+        """
+        Start tracking the sample edits and the changes of the samples list,
+        so that they can be patched into the stashed sample table
+
+        The changes can only be tracked if the table rows correspond to the
+        samples and the samples are kept in memory; the samples of a frozen
+        Project cannot be changed, so they are not tracked either.
+        """
+        self._sample_edits = {}
+        self._sample_keys_changed = False
+        self._table_positions = None
+        # the table may be the parsed one or handed out already
+        self._sample_table_shared = True
+        samples = self.samples
+        if (
+            self._sample_table is not None
+            and not isinstance(samples, (SampleStore, FrozenSamples))
+            and len(self._sample_table) == len(samples)
+        ):
+            self._table_samples = list(samples)
+        else:
+            self._table_samples = None
+        self._view_samples()
+
+    def _view_samples(self):
+        """
+        Make the samples read their values from the stashed sample table
+        columns, if the Project was created with row views
+
+        The parsed tables are released then, unless the sample table is the
+        parsed one, so that the table columns are the only copy of the values.
+        """
+        if not getattr(self, "row_views", False) or self._table_samples is None:
+            self._row_stores = []
+            return
+        self._row_stores = SampleRows.from_samples(
+            self._table_samples, self._sample_table
+        )
+        if self._project_data.get(SAMPLE_DF_KEY) is not self._sample_table:
+            self._release_raw_tables()
+
+    @contextmanager
+    def batch(self):
+        """
+        Update the sample table with the sample edits made within the
+        context once, when the context exits
+
+        The edits are always patched into the sample table incrementally when
+        it is accessed; the batch makes the update happen eagerly, in one go.
+
+        :Example:
+
+        .. code-block:: python
+
+            with prj.batch():
+                for sample in prj.samples:
+                    sample["genome"] = "hg38"
+        """
+        try:
+            yield self
+        finally:
+            self._apply_sample_edits()
+
+    def _record_sample_edit(self, sample, attr):
+        """
+        Record a sample attribute edit to patch it into the sample table,
+        or mark the table for regeneration if the edits are not tracked
+
+        :param peppy.Sample sample: edited sample
+        :param str attr: name of the edited attribute
+        """
+        samples = getattr(self, "_samples", None)
+        if isinstance(samples, SampleStore):
+            samples.touch(sample)
+        elif isinstance(samples, FrozenSamples):
+            self._assert_not_frozen()
+        sample_index = getattr(self, "_sample_index", None)
+        if sample_index is not None:
+            sample_index.edit(sample, attr)
+        if (
+            attr is None
+            or self[SAMPLE_EDIT_FLAG_KEY]
+            or getattr(self, "_table_samples", None) is None
+        ):
+            self[SAMPLE_EDIT_FLAG_KEY] = True
+            return
+        self._sample_edits.setdefault(id(sample), (sample, set()))[1].add(attr)
+        if attr not in sample:
+            # the edit is reported before an attribute is set and after
+            # it is deleted, so the sample gains or loses the attribute
+            self._sample_keys_changed = True
+
+    def _apply_sample_edits(self):
+        """
+        Patch the stashed sample table with the recorded sample edits
+        and the changes of the samples list
+
+        Rows of the removed samples are dropped and rows of the samples added
+        at the end of the list are appended. The table is marked for
+        regeneration instead if the samples were reordered, the columns or
+        the index would change, or the values cannot be patched in.
+        """
+        table_samples = getattr(self, "_table_samples", None)
+        if self[SAMPLE_EDIT_FLAG_KEY] or table_samples is None:
+            return
+        samples = self.samples
+        edits, self._sample_edits = self._sample_edits, {}
+        keys_changed = getattr(self, "_sample_keys_changed", True)
+        self._sample_keys_changed = False
+        samples_changed = len(samples) != len(table_samples) or not all(
+            map(operator.is_, samples, table_samples)
+        )
+        if not edits and not samples_changed:
+            return
+        try:
+            self._sample_table = self._patch_sample_table(
+                samples, edits, samples_changed, keys_changed
+            )
+        except _SampleTableSchemaChange as e:
+            _LOGGER.debug(f"Regenerating sample_table: {e}")
+            self[SAMPLE_EDIT_FLAG_KEY] = True
+            return
+        self._sample_table_shared = False
+        if samples_changed:
+            self._table_samples = list(samples)
+            self._table_positions = None
+            self._view_samples()
+
+    def _patch_sample_table(self, samples, edits, samples_changed, keys_changed):
+        """
+        Patch the changes into the stashed sample table
+
+        The edited cells are set in place, on a copy if the table was handed
+        out. The columns that the changes could give another type are
+        regenerated from the samples instead, and the columns are reordered
+        if the samples gained or lost attributes, so that the table is the
+        same as a regenerated one.
+
+        :param list[peppy.Sample] samples: current samples
+        :param dict[int, tuple[peppy.Sample, set[str]]] edits: names of the
+            edited attributes of the samples, by the samples' ids
+        :param bool samples_changed: whether the samples list has changed
+            since the table was stashed
+        :param bool keys_changed: whether the edited samples gained or lost
+            attributes
+        :return pandas.DataFrame: patched sample table
+        :raise _SampleTableSchemaChange: if the table has to be regenerated
+        """
+        table = self._sample_table
+        table_samples = self._table_samples
+        index = [self.st_index] if isinstance(self.st_index, str) else self.st_index
+        if not all(i in table.columns for i in index):
+            raise _SampleTableSchemaChange("the table is not indexed")
+        kept, added = None, []
+        if samples_changed:
+            sample_ids = {id(s) for s in samples}
+            kept = [pos for pos, s in enumerate(table_samples) if id(s) in sample_ids]
+            table_sample_ids = {id(s) for s in table_samples}
+            added = samples[len(kept) :]
+            if not kept:
+                raise _SampleTableSchemaChange("all the samples were removed")
+            if (
+                len(samples) < len(kept)
+                or not all(map(operator.is_, samples, [table_samples[p] for p in kept]))
+                or any(id(s) in table_sample_ids for s in added)
+            ):
+                raise _SampleTableSchemaChange("the samples were reordered")
+            positions = {id(s): pos for pos, s in enumerate(samples[: len(kept)])}
+        else:
+            if getattr(self, "_table_positions", None) is None:
+                self._table_positions = {id(s): pos for pos, s in enumerate(samples)}
+            positions = self._table_positions
+        changes = {
+            positions[sample_id]: (sample._table_dict(), attrs)
+            for sample_id, (sample, attrs) in edits.items()
+            if sample_id in positions
+        }
+        columns = list(
+            dict.fromkeys(
+                attr
+                for _, attrs in changes.values()
+                for attr in attrs
+                if not attr.startswith("_")
+            )
+        )
+        if set(columns) & set(index):
+            raise _SampleTableSchemaChange("the index columns were edited")
+        if set(columns) - set(table.columns):
+            raise _SampleTableSchemaChange("attributes were added")
+        regenerate = set()
+        if kept is not None and len(kept) < len(table):
+            table = table.iloc[kept]
+            keys_changed = True
+            # the removed values may have decided the column types
+            regenerate.update(
+                col for col in table.columns if not _keeps_dtype(table[col])
+            )
+        if added:
+            added_rows = self._get_table_from_samples(index=index, samples=added)
+            if set(added_rows.columns) - set(table.columns):
+                raise _SampleTableSchemaChange("attributes were added")
+            regenerate.update(
+                col
+                for col in table.columns
+                if col not in added_rows or added_rows[col].dtype != table[col].dtype
+            )
+            table = pd.concat([table, added_rows])
+        elif kept is None and getattr(self, "_sample_table_shared", True):
+            table = table.copy(deep=not pandas_copy_on_write())
+        for col in columns:
+            if col in regenerate:
+                continue
+            cells = {
+                pos: sample_dict.get(col, np.nan)
+                for pos, (sample_dict, attrs) in changes.items()
+                if col in attrs
+            }
+            values = list(cells.values())
+            if not _keeps_dtype(table[col], values):
+                regenerate.add(col)
+                continue
+            loc = table.columns.get_loc(col)
+            try:
+                for pos, value in cells.items():
+                    table.iat[pos, loc] = value
+            except (TypeError, ValueError):
+                regenerate.add(col)
+                continue
+            if all(v is None or v is np.nan for v in values) and (
+                table[col].isna().all()
+            ):
+                # a column of missing values only is not a float column
+                regenerate.add(col)
+        for col in regenerate:
+            table[col] = self._get_sample_table_column(samples, col, table.index)
+        if keys_changed:
+            # columns are ordered by the first sample that has the attribute
+            columns = list(
+                dict.fromkeys(k for s in samples for k in s if not k.startswith("_"))
+            )
+            if set(columns) != set(table.columns):
+                raise _SampleTableSchemaChange("attributes were removed")
+            if columns != list(table.columns):
+                table = table[columns]
+        return table
+
+    @staticmethod
+    def _get_sample_table_column(samples, col, index):
+        """
+        Generate a sample table column from the samples, with the type
+        a regenerated sample table would give it
+
+        :param list[peppy.Sample] samples: samples, in the table rows order
+        :param str col: name of the column
+        :param pandas.Index index: sample table index
+        :return pandas.Series: sample table column
+        :raise _SampleTableSchemaChange: if no sample has the attribute
+        """
+        rows = pd.DataFrame.from_dict(
+            [{col: s._table_value(col)} if col in s else {} for s in samples]
+        )
+        if col not in rows:
+            raise _SampleTableSchemaChange("attributes were removed")
+        return rows[col].set_axis(index)
+
     def parse_config_file(
         self,
         cfg_path: str = None,
@@ -516,14 +1178,31 @@ class Project(MutableMapping):
         and store in the object root. The values sourced from the
         project config can be overwritten by the optional arguments.
         """
+        table = self._prepare_sample_data()
+        if table is None:
+            return []
+        return [Sample(r, prj=self) for _, r in table.iterrows()]
+
+    def _prepare_sample_data(self):
+        """
+        Read the sample and subsample tables, if needed, and prepare them
+        to create the samples from
+
+        :return pandas.DataFrame | None: sample table to create the samples
+            from, if there is one
+        """
         # To initiate project from pandas or dictionary we shouldn't run
         # this function otherwise it will cause errors
-        if SAMPLE_DF_KEY not in self or self.amendments is not None:
+        if (
+            SAMPLE_DF_KEY not in self
+            or self.amendments is not None
+            or getattr(self, "_raw_tables_released", False)
+        ):
             self._read_sample_data()
+            self._raw_tables_released = False
 
-        samples_list = []
         if SAMPLE_DF_KEY not in self:
-            return []
+            return None
 
         if CONFIG_KEY not in self:
             self[CONFIG_KEY] = {CONFIG_VERSION_KEY: PEP_LATEST_VERSION}
@@ -536,9 +1215,13 @@ class Project(MutableMapping):
         if SUBSAMPLE_DF_KEY not in self:
             self[SUBSAMPLE_DF_KEY] = None
 
-        for _, r in self[SAMPLE_DF_KEY].iterrows():
-            samples_list.append(Sample(r, prj=self))
-        return samples_list
+        # the samples share the repeated values with the tables
+        self[SAMPLE_DF_KEY] = _dedupe_table_values(self[SAMPLE_DF_KEY])
+        if self[SUBSAMPLE_DF_KEY] is not None:
+            self[SUBSAMPLE_DF_KEY] = [
+                _dedupe_table_values(sub_a) for sub_a in self[SUBSAMPLE_DF_KEY]
+            ]
+        return self[SAMPLE_DF_KEY]
 
     def modify_samples(self):
         """
@@ -554,6 +1237,22 @@ class Project(MutableMapping):
                     f"Config '{SAMPLE_MODS_KEY}' section contains unrecognized "
                     f"subsections: {mod_diff}"
                 )
+        processes = getattr(self, "modifier_processes", None)
+        if processes and processes > 1 and self._modifier_exists():
+            # row-local modifiers are applied to sample chunks in worker processes,
+            # the ones that need to see all samples are applied here
+            self._modify_samples_in_chunks(
+                ["attr_remove", "attr_constants", "attr_synonyms", "attr_imply"],
+                processes,
+            )
+            self._assert_samples_have_names()
+            self._auto_merge_duplicated_names()
+            self.attr_merge()
+            if self.lazy_derive or not self._modifier_exists(DERIVED_KEY):
+                self.attr_derive()
+            else:
+                self._modify_samples_in_chunks(["attr_derive"], processes)
+            return
         self.attr_remove()
         self.attr_constants()
         self.attr_synonyms()
@@ -563,6 +1262,50 @@ class Project(MutableMapping):
         self.attr_merge()
         self.attr_derive()
 
+    def _modify_samples_in_chunks(self, modifiers, processes):
+        """
+        Apply sample modifiers that only depend on the sample they modify
+        to chunks of samples in a pool of worker processes
+
+        The chunks are stitched back together in the original sample order.
+
+        :param list[str] modifiers: names of the modifier methods to apply
+        :param int processes: number of worker processes
+        """
+        samples = self.samples
+        if not samples:
+            return
+        chunksize = -(-len(samples) // (processes * 4))
+        chunks = [
+            [s._get_state() for s in samples[i : i + chunksize]]
+            for i in range(0, len(samples), chunksize)
+        ]
+        _LOGGER.debug(
+            f"Applying {', '.join(modifiers)} to {len(chunks)} sample chunks "
+            f"using {processes} processes"
+        )
+        modify_chunk = partial(
+            _apply_sample_modifiers,
+            self[CONFIG_KEY],
+            self.st_index,
+            modifiers,
+            self.derive_max_workers,
+        )
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            states = [
+                state for chunk in executor.map(modify_chunk, chunks) for state in chunk
+            ]
+        # each chunk comes back with its own copies of the values
+        pool = {}
+        for state in states:
+            for attr, value in state.items():
+                state[attr] = _pooled_value(value, pool)
+        self._samples = [
+            Sample._from_state(state, prj=sample.get(PRJ_REF))
+            for sample, state in zip(samples, states)
+        ]
+        self[SAMPLE_EDIT_FLAG_KEY] = True
+
     def _modifier_exists(self, modifier_key=None):
         """
         Check whether a specified sample modifier is defined and can be applied
@@ -659,7 +1402,7 @@ class Project(MutableMapping):
                 SAMPLE_NAME_ATTR
                 in self[CONFIG_KEY][SAMPLE_MODS_KEY][DERIVED_KEY][DERIVED_ATTRS_KEY]
             ):
-                self.attr_derive(attrs=[SAMPLE_NAME_ATTR])
+                self.attr_derive(attrs=[SAMPLE_NAME_ATTR], lazy=False)
 
         for sample in self.samples:
             if self.st_index not in sample:
@@ -676,8 +1419,14 @@ class Project(MutableMapping):
         :raises IllegalStateException: if both duplicated samples are detected and subsample_table is
             specified in the config
         """
-        sample_names_list = [s[self.st_index] for s in self.samples]
-        duplicated_sample_ids = self._get_duplicated_sample_ids(sample_names_list)
+        samples_by_id = {}
+        for sample in self.samples:
+            samples_by_id.setdefault(sample[self.st_index], []).append(sample)
+        duplicated_sample_ids = [
+            sample_id
+            for sample_id, id_samples in samples_by_id.items()
+            if len(id_samples) > 1
+        ]
 
         if not duplicated_sample_ids:
             return
@@ -693,13 +1442,9 @@ class Project(MutableMapping):
                 f"Duplicates: {duplicated_sample_ids}"
             )
 
+        merged_samples = []
         for duplicated_id in duplicated_sample_ids:
-            (
-                duplicated_samples,
-                non_duplicated_samples,
-            ) = self._get_duplicated_and_not_duplicated_samples(
-                duplicated_id, self.st_index, self.samples
-            )
+            duplicated_samples = samples_by_id[duplicated_id]
             sample_attributes = [
                 attr
                 for attr in duplicated_samples[0].keys()
@@ -708,54 +1453,25 @@ class Project(MutableMapping):
             merged_attrs = self._get_merged_attributes(
                 sample_attributes, duplicated_samples
             )
-            self._samples = non_duplicated_samples
 
             # make single element lists scalars
             for attribute_name, values in merged_attrs.items():
                 if isinstance(values, list) and len(list(set(values))) == 1:
                     merged_attrs[attribute_name] = values[0]
+                elif isinstance(values, list):
+                    merged_attrs[attribute_name] = MultiValue(values)
 
-            self.add_samples(Sample(series=merged_attrs))
-
-    @staticmethod
-    def _get_duplicated_and_not_duplicated_samples(
-        duplication: str, st_index: str, samples: List[Sample]
-    ) -> Tuple[List, List]:
-        """
-        Iterates over list of samples and splits them into list of duplicated samples and list of not duplicated.
-
-        Args:
-            duplication: Sample ID.
-            st_index: Sample table index.
-            samples: List of Sample instances.
+            merged_samples.append(Sample(series=merged_attrs))
 
-        Returns:
-            List of Sample objects of duplicated samples and not duplicated samples.
-        """
-        duplicated_samples, not_duplicated_samples = [], []
-        for sample in samples:
-            if sample[st_index] == duplication:
-                duplicated_samples.append(sample)
-            else:
-                not_duplicated_samples.append(sample)
-        return duplicated_samples, not_duplicated_samples
+        self._samples = [
+            s for s in self.samples if len(samples_by_id[s[self.st_index]]) == 1
+        ]
+        self.add_samples(merged_samples)
 
     @staticmethod
     def _all_values_in_the_list_are_the_same(list_of_values: List) -> bool:
         return all(value == list_of_values[0] for value in list_of_values)
 
-    def _get_duplicated_sample_ids(self, sample_names_list: List) -> set:
-        duplicated_ids = set()
-        seen = set()
-
-        for sample_id in sample_names_list:
-            if sample_id in seen:
-                duplicated_ids.add(sample_id)
-            else:
-                seen.add(sample_id)
-
-        return duplicated_ids
-
     @staticmethod
     def _get_merged_attributes(
         sample_attributes: List[str], duplicated_samples: List[Sample]
@@ -779,79 +1495,66 @@ class Project(MutableMapping):
         if SUBSAMPLE_DF_KEY not in self or self[SUBSAMPLE_DF_KEY] is None:
             _LOGGER.debug("No {} found, skipping merge".format(CFG_SUBSAMPLE_TABLE_KEY))
             return
+        sample_colname = self.st_index
+        sample_names = {s[sample_colname] for s in self.samples}
         for subsample_table in self[SUBSAMPLE_DF_KEY]:
-            for sample_name in list(subsample_table[self.st_index]):
-                if sample_name not in [s[self.st_index] for s in self.samples]:
-                    _LOGGER.warning(
-                        ("Couldn't find matching sample for subsample: {}").format(
-                            sample_name
+            if self.samples and sample_colname not in subsample_table.columns:
+                raise KeyError(
+                    "Subannotation requires column '{}'.".format(sample_colname)
+                )
+            _LOGGER.debug(
+                "Using '{}' as sample name column from "
+                "subannotation table".format(sample_colname)
+            )
+            rows_by_sample = self._group_subsample_rows(subsample_table)
+            for sample_name in rows_by_sample:
+                if sample_name not in sample_names:
+                    for _ in rows_by_sample[sample_name]:
+                        _LOGGER.warning(
+                            ("Couldn't find matching sample for subsample: {}").format(
+                                sample_name
+                            )
                         )
-                    )
             for sample in track(
                 self.samples,
                 description=f"Merging subsamples, adding sample attrs: {', '.join(subsample_table.keys())}",
                 disable=not (self.is_sample_table_large and self.progressbar),
                 console=Console(file=sys.stderr),
             ):
-                sample_colname = self.st_index
-                if sample_colname not in subsample_table.columns:
-                    raise KeyError(
-                        "Subannotation requires column '{}'.".format(sample_colname)
-                    )
-                _LOGGER.debug(
-                    "Using '{}' as sample name column from "
-                    "subannotation table".format(sample_colname)
-                )
-                sample_indexer = (
-                    subsample_table[sample_colname] == sample[self.st_index]
-                )
-                this_sample_rows = subsample_table[sample_indexer]
-                if len(this_sample_rows) == 0:
+                this_sample_rows = rows_by_sample.get(sample[sample_colname])
+                if not this_sample_rows:
                     _LOGGER.debug(
                         "No merge rows for sample '%s', skipping",
-                        sample[self.st_index],
+                        sample[sample_colname],
                     )
                     continue
                 _LOGGER.debug("%d rows to merge", len(this_sample_rows))
-                _LOGGER.debug("Merge rows dict: {}".format(this_sample_rows.to_dict()))
-
-                merged_attrs = {key: list() for key in this_sample_rows.columns}
-                _LOGGER.debug(this_sample_rows)
-                for subsample_row_id, row in this_sample_rows.iterrows():
-                    try:
-                        row[SUBSAMPLE_NAME_ATTR]
-                    except KeyError:
-                        row[SUBSAMPLE_NAME_ATTR] = str(subsample_row_id)
-                    rowdata = row.to_dict()
-
-                    def _select_new_attval(merged_attrs, attname, attval):
-                        """
-                        Select new attribute value for the merged columns
-                        dictionary
-                        """
-                        if attname in merged_attrs:
-                            return merged_attrs[attname] + [attval]
-                        return [str(attval).rstrip()]
-
-                    for attname, attval in rowdata.items():
-                        if attname == sample_colname or not attval:
-                            _LOGGER.debug(f"Skipping KV: {attname}={attval}")
-                            continue
-                        _LOGGER.debug(
-                            f"merge: sample '{sample[self.st_index]}'; '{attname}'='{attval}'"
-                        )
-                        merged_attrs[attname] = _select_new_attval(
-                            merged_attrs, attname, attval
-                        )
-
-                # remove sample name from the data with which to update sample
-                merged_attrs.pop(sample_colname, None)
-
+                merged_attrs = _merge_subsample_rows(
+                    this_sample_rows, subsample_table.columns, sample_colname
+                )
                 _LOGGER.debug(
-                    f"Updating Sample {sample[self.st_index]}: {merged_attrs}"
+                    f"Updating Sample {sample[sample_colname]}: {merged_attrs}"
                 )
                 sample.update(merged_attrs)
 
+    def _group_subsample_rows(self, subsample_table):
+        """
+        Group subsample table rows by the sample table index value in a single pass
+
+        :param pandas.DataFrame subsample_table: subsample table to group
+        :return dict[str, list[tuple]]: mapping of sample identifiers to the
+            list of (row label, row data) pairs, in table order
+        """
+        rows_by_sample = {}
+        if self.st_index not in subsample_table.columns:
+            return rows_by_sample
+        records = subsample_table.to_dict(orient="records")
+        for row_id, rowdata in zip(subsample_table.index, records):
+            rows_by_sample.setdefault(rowdata[self.st_index], []).append(
+                (row_id, rowdata)
+            )
+        return rows_by_sample
+
     def attr_imply(self):
         """
         Infer value for additional field(s) from other field(s).
@@ -863,61 +1566,58 @@ class Project(MutableMapping):
         if not self._modifier_exists(IMPLIED_KEY):
             return
         implications = self[CONFIG_KEY][SAMPLE_MODS_KEY][IMPLIED_KEY]
-        if not isinstance(implications, list):
-            raise InvalidConfigFileException(
-                f"{SAMPLE_MODS_KEY}.{IMPLIED_KEY} has to be a list of key-value pairs"
-            )
         _LOGGER.debug(f"Sample attribute implications: {implications}")
-        for implication in implications:
-            if not all([key in implication for key in IMPLIED_COND_KEYS]):
-                raise InvalidConfigFileException(
-                    f"{SAMPLE_MODS_KEY}.{IMPLIED_KEY} section is invalid: {implication}"
-                )
+        implication_index = _ImplicationIndex(implications)
         for sample in track(
             self.samples,
             description="Implying sample attributes",
             disable=not (self.is_sample_table_large and self.progressbar),
             console=Console(file=sys.stderr),
         ):
-            for implication in implications:
-                implier_attrs = list(implication[IMPLIED_IF_KEY].keys())
-                implied_attrs = list(implication[IMPLIED_THEN_KEY].keys())
-                _LOGGER.debug(f"Setting Sample attributes implied by '{implier_attrs}'")
-                for implier_attr in implier_attrs:
-                    implier_val = implication[IMPLIED_IF_KEY][implier_attr]
-                    if implier_attr not in sample:
-                        _LOGGER.debug(
-                            f"Sample lacks implier attr ({implier_attr}), skipping:"
-                        )
-                        break
-                    sample_val = sample[implier_attr]
-                    if sample_val not in implier_val:
-                        _LOGGER.debug(
-                            "Sample attr value does not match any of implier "
-                            f"requirements ({sample_val} not in {implier_val}), skipping"
-                        )
-                        break
-                else:
-                    # only executed if the inner loop did NOT break
-                    for implied_attr in implied_attrs:
-                        imp_val = implication[IMPLIED_THEN_KEY][implied_attr]
-                        _LOGGER.debug(
-                            f"Setting implied attr: '{implied_attr}={imp_val}'"
-                        )
-                        sample.__setitem__(implied_attr, imp_val)
+            # the values the implications replace, to undo them if the
+            # implier attributes are updated
+            replaced = dict(sample.get(IMPLIED_ATTRS_KEY) or {})
+            implication_index.apply(sample, replaced)
+            if replaced:
+                sample._set_raw(IMPLIED_ATTRS_KEY, replaced)
 
-    def attr_derive(self, attrs=None):
+    def attr_derive(self, attrs=None, max_workers=None, lazy=None, samples=None):
         """
         Set derived attributes for all Samples tied to this Project instance
+
+        :param Iterable[str] attrs: names of the attributes to derive,
+            all the declared ones by default
+        :param int max_workers: size of the thread pool to expand the derived
+            sources' glob patterns with; defaults to the value the Project was
+            created with. The patterns are expanded one by one if not set
+        :param bool lazy: whether to only set placeholders that are resolved
+            when the attributes are first accessed; defaults to the value the
+            Project was created with
+        :param Iterable[peppy.Sample] samples: samples to derive the
+            attributes for, all the Project's samples by default
         """
         if not self._modifier_exists(DERIVED_KEY):
             return
         da = self[CONFIG_KEY][SAMPLE_MODS_KEY][DERIVED_KEY][DERIVED_ATTRS_KEY]
-        ds = self[CONFIG_KEY][SAMPLE_MODS_KEY][DERIVED_KEY][DERIVED_SOURCES_KEY]
+        ds = compile_derived_sources(
+            self[CONFIG_KEY][SAMPLE_MODS_KEY][DERIVED_KEY][DERIVED_SOURCES_KEY]
+        )
         derivations = attrs or (da if isinstance(da, list) else [da])
         _LOGGER.debug("Derivations to be done: {}".format(derivations))
+        max_workers = max_workers or getattr(self, "derive_max_workers", None)
+        if lazy is None:
+            lazy = getattr(self, "lazy_derive", False)
+        concurrent = (
+            not lazy
+            and max_workers is not None
+            and max_workers > 1
+            and not _derivations_are_interdependent(ds, derivations)
+        )
+        pending = []
+        # derived values that repeat across samples are stored once
+        pool = {}
         for sample in track(
-            self.samples,
+            self.samples if samples is None else samples,
             description="Deriving sample attributes",
             disable=not (self.is_sample_table_large and self.progressbar),
             console=Console(file=sys.stderr),
@@ -936,15 +1636,62 @@ class Project(MutableMapping):
                 # Set {atr}_key, so the original source can also be retrieved
                 sample[ATTR_KEY_PREFIX + attr] = sample[attr]
 
-                derived_attr = sample.derive_attribute(ds, attr)
-                if derived_attr:
-                    _LOGGER.debug("Setting '{}' to '{}'".format(attr, derived_attr))
-                    sample[attr] = derived_attr
+                if lazy:
+                    sample[attr] = LazyDerivedAttribute(ds, sample[attr])
+                    _mark_derived(sample, attr)
+                    continue
+                if concurrent:
+                    derived_attr = sample._format_derived_source(ds, attr)
+                    if isinstance(derived_attr, list):
+                        if has_glob_patterns(derived_attr):
+                            # filesystem access; expanded in the thread pool below
+                            pending.append((sample, attr, derived_attr))
+                            _mark_derived(sample, attr)
+                            continue
+                        derived_attr = glob_derived_patterns(derived_attr)
                 else:
-                    _LOGGER.debug(
-                        f"Not setting null/empty value for data source '{attr}': {type(derived_attr)}"
-                    )
-                sample._derived_cols_done.append(attr)
+                    derived_attr = sample.derive_attribute(ds, attr)
+                self._set_derived_attr(sample, attr, _pooled_value(derived_attr, pool))
+                _mark_derived(sample, attr)
+        if not pending:
+            return
+        _LOGGER.debug(
+            f"Expanding {len(pending)} derived attribute glob patterns "
+            f"using {max_workers} threads"
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            globbed = executor.map(glob_derived_patterns, [p for _, _, p in pending])
+            for (sample, attr, _), derived_attr in zip(pending, globbed):
+                self._set_derived_attr(sample, attr, _pooled_value(derived_attr, pool))
+
+    @staticmethod
+    def _set_derived_attr(sample, attr, derived_attr):
+        """
+        Set the derived attribute value, unless it is null/empty
+
+        :param peppy.Sample sample: sample to update
+        :param str attr: name of the derived attribute
+        :param str | list[str] derived_attr: derived value
+        """
+        if derived_attr:
+            _LOGGER.debug("Setting '{}' to '{}'".format(attr, derived_attr))
+            sample[attr] = derived_attr
+        else:
+            _LOGGER.debug(
+                f"Not setting null/empty value for data source '{attr}': {type(derived_attr)}"
+            )
+
+    def materialize_derived(self):
+        """
+        Resolve all lazily derived sample attributes
+        """
+        for sample in track(
+            self.samples,
+            description="Resolving derived sample attributes",
+            disable=not (self.is_sample_table_large and self.progressbar),
+            console=Console(file=sys.stderr),
+        ):
+            sample.materialize_derived()
 
     def activate_amendments(self, amendments):
         """
@@ -974,7 +1721,9 @@ class Project(MutableMapping):
             )
         prev = [(k, v) for k, v in self.items() if not k.startswith("_")]
         conf_file = self[CONFIG_FILE_KEY]
-        self.__init__(cfg=conf_file, amendments=amendments)
+        self.__init__(
+            cfg=conf_file, amendments=amendments, **self._processing_options()
+        )
         for k, v in prev:
             if k.startswith("_"):
                 continue
@@ -1009,27 +1758,316 @@ class Project(MutableMapping):
 
         :param peppy.Sample | Iterable[peppy.Sample] samples: samples to add
         """
+        self._assert_not_frozen()
         samples = [samples] if isinstance(samples, Sample) else samples
+        added = []
         for sample in samples:
             if not isinstance(sample, Sample):
                 _LOGGER.warning("Not a peppy.Sample object, not adding")
                 continue
-            self._samples.append(sample)
+            if sample.project is None:
+                # so that the project is notified of the sample edits
+                sample._set_raw(PRJ_REF, self)
+            added.append(sample)
+        self._extend_samples(added)
+        if added and getattr(self, "_table_samples", None) is None:
+            # otherwise the rows are appended to the sample table on access
             self[SAMPLE_EDIT_FLAG_KEY] = True
 
-    def remove_samples(self, sample_names):
+    def _extend_samples(self, samples):
         """
-        Remove Samples from Project
+        Add the samples at the end of the samples list, keeping the sample
+        index in sync
 
-        :param Iterable[str] sample_names: sample names to remove
+        :param list[peppy.Sample] samples: samples to add
         """
-        sample_names = [sample_names] if isinstance(sample_names, str) else sample_names
-        samples_keep = [
-            s for s in self.samples if s[self.sample_name_colname] not in sample_names
+        sample_index = getattr(self, "_sample_index", None)
+        indexed = sample_index is not None and sample_index.covers(self._samples)
+        self._samples.extend(samples)
+        if indexed:
+            for sample in samples:
+                sample_index.add(sample)
+
+    def append_rows(self, rows):
+        """
+        Add sample table rows to the Project
+
+        The sample modifiers and subsample merges are applied to the new
+        samples only, and the sample table is extended rather than regenerated.
+
+        :param pandas.DataFrame | Mapping | Iterable[Mapping] rows: sample
+            table rows to add
+        :return list[peppy.Sample]: the samples created from the rows
+        :raise IllegalStateException: if a new sample is named like a sample
+            that already exists in the Project
+        """
+        self._assert_not_frozen()
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame([rows] if isinstance(rows, Mapping) else list(rows))
+        rows = rows.replace(np.nan, "")
+        if rows.empty:
+            return []
+        touched = self[SAMPLE_EDIT_FLAG_KEY]
+        existing_samples = self._samples
+        table_samples = getattr(self, "_table_samples", None)
+        subsample_tables = self._subsample_tables_for(rows)
+        self._samples = [Sample(r, prj=self) for _, r in rows.iterrows()]
+        # the new samples are not in the sample table, their edits are not tracked
+        self._table_samples = None
+        try:
+            if self._modifier_exists():
+                self.modify_samples()
+            else:
+                self._assert_samples_have_names()
+                self._auto_merge_duplicated_names()
+            new_samples = self._samples
+        finally:
+            self._samples = existing_samples
+            self._table_samples = table_samples
+            if subsample_tables is not None:
+                self[SUBSAMPLE_DF_KEY] = subsample_tables
+        attrs = (
+            self.st_index if isinstance(self.st_index, str) else tuple(self.st_index)
+        )
+        clashing_names = [
+            _SampleIndex.key(s, attrs)
+            for s in self._find_samples(
+                [_SampleIndex.key(s, attrs) for s in new_samples]
+            )
         ]
-        if len(self._samples) != len(samples_keep):
-            self._samples = samples_keep
-            self[SAMPLE_EDIT_FLAG_KEY] = True
+        if clashing_names:
+            raise IllegalStateException(
+                f"Samples to append are already in the project: {clashing_names}"
+            )
+        # the rows of the new samples are appended to the sample table on access
+        self._extend_samples(new_samples)
+        # and to the parsed table when it is read
+        if getattr(self, "_appended_rows", None) is None:
+            self._appended_rows = []
+        self._appended_rows.append(rows)
+        # the rows are not in the sample table file
+        self._raw_tables_rereadable = False
+        # without tracked table samples there is no table to extend
+        self[SAMPLE_EDIT_FLAG_KEY] = touched or table_samples is None
+        return new_samples
+
+    def _subsample_tables_for(self, rows):
+        """
+        Put the subsample table rows of the samples to create from the
+        sample table rows in place of the subsample tables
+
+        The subsample tables are grouped by sample once and the groups are
+        kept, so that the rows are selected without scanning the tables.
+
+        :param pandas.DataFrame rows: sample table rows
+        :return list[pandas.DataFrame]: the subsample tables, to put back
+            once the samples are created; None if there are none
+        """
+        if getattr(self, "_raw_tables_released", False) and (
+            self.get(SUBSAMPLE_DF_KEY) is None
+        ):
+            # the samples are created without the parsed sample table
+            self._read_subsample_data()
+        subsample_tables = self.get(SUBSAMPLE_DF_KEY)
+        if subsample_tables is None:
+            return None
+        cached = getattr(self, "_subsample_chunks", None)
+        if cached is None or cached[0] is not subsample_tables:
+            chunks = _SubsampleChunks(subsample_tables, self.st_index)
+            self._subsample_chunks = cached = (subsample_tables, chunks)
+        names = rows[self.st_index] if self.st_index in rows.columns else []
+        self[SUBSAMPLE_DF_KEY] = cached[1].tables_for(names)
+        return subsample_tables
+
+    def _raw_sample_table(self):
+        """
+        Get the parsed sample table, with the rows added with append_rows
+
+        The appended rows are concatenated to the parsed table once, when it
+        is first needed.
+
+        :return pandas.DataFrame: the parsed sample table
+        """
+        if getattr(self, "_appended_rows", None):
+            appended, self._appended_rows = self._appended_rows, []
+            self._restore_raw_tables()
+            raw_table = self.get(SAMPLE_DF_KEY)
+            if raw_table is not None:
+                appended.insert(0, raw_table)
+            self[SAMPLE_DF_KEY] = pd.concat(appended, ignore_index=True)
+        return self.get(SAMPLE_DF_KEY)
+
+    def apply_patch(self, patch):
+        """
+        Update sample attributes in bulk
+
+        The patch is either in the long form, with the sample table index,
+        'column' and 'value' columns, or in the wide form, with the sample
+        table index column and a column per attribute to update. Missing
+        values in the wide form are not applied. The implications and
+        derivations that depend on the updated attributes are applied again
+        and the sample table is patched rather than regenerated.
+
+        :param pandas.DataFrame patch: sample attribute updates
+        :return list[peppy.Sample]: updated samples
+        :raise KeyError: if the patch lacks any of the sample table index columns
+        :raise ValueError: if the patch refers to samples that are not
+            in the Project
+        """
+        index = self.st_index
+        index_columns = [index] if isinstance(index, str) else list(index)
+        missing_columns = [c for c in index_columns if c not in patch.columns]
+        if missing_columns:
+            raise KeyError(f"Patch requires columns: {missing_columns}")
+        long_form = set(patch.columns) == {
+            *index_columns,
+            PATCH_ATTR_COLUMN,
+            PATCH_VALUE_COLUMN,
+        }
+        updates = []
+        for rowdata in patch.to_dict(orient="records"):
+            name = (
+                rowdata.pop(index)
+                if isinstance(index, str)
+                else tuple(rowdata.pop(column) for column in index_columns)
+            )
+            if long_form:
+                rowdata = {rowdata[PATCH_ATTR_COLUMN]: rowdata[PATCH_VALUE_COLUMN]}
+            for attr, value in rowdata.items():
+                if not long_form and is_scalar(value) and pd.isna(value):
+                    continue
+                if isinstance(value, np.generic):
+                    # the values parsed from tables are Python objects
+                    value = value.item()
+                updates.append((name, attr, value))
+        names = list(dict.fromkeys(name for name, _, _ in updates))
+        attrs = index if isinstance(index, str) else tuple(index)
+        samples_by_name = {
+            _SampleIndex.key(s, attrs): s for s in self._find_samples(names)
+        }
+        missing = [name for name in names if name not in samples_by_name]
+        if missing:
+            raise ValueError(f"Samples to patch not found in the project: {missing}")
+        changes = {}
+        for name, attr, value in updates:
+            sample = samples_by_name[name]
+            replaced = sample.get(IMPLIED_ATTRS_KEY)
+            if replaced and attr in replaced:
+                # the patched value is the one the implications replace
+                sample._set_raw(IMPLIED_ATTRS_KEY, {**replaced, attr: (value,)})
+            sample[attr] = value
+            changes.setdefault(id(sample), (sample, set()))[1].add(attr)
+        self._reapply_dependent_modifiers(changes)
+        return [sample for sample, _ in changes.values()]
+
+    def _reapply_dependent_modifiers(self, changes):
+        """
+        Apply the implications and derivations that depend
+        on the changed sample attributes again
+
+        :param dict[int, tuple[peppy.Sample, set[str]]] changes: the changed
+            samples and the names of their changed attributes, by the sample
+            id; updated with the attributes the modifiers change
+        """
+        if self._modifier_exists(IMPLIED_KEY):
+            implication_index = _ImplicationIndex(
+                self[CONFIG_KEY][SAMPLE_MODS_KEY][IMPLIED_KEY]
+            )
+            rule_attrs = implication_index.implier_attrs | implication_index.implied_attrs
+            for sample, attrs in changes.values():
+                if attrs & rule_attrs:
+                    attrs.update(self._reapply_implications(sample, implication_index))
+        if not self._modifier_exists(DERIVED_KEY):
+            return
+        derived = self[CONFIG_KEY][SAMPLE_MODS_KEY][DERIVED_KEY]
+        da = derived[DERIVED_ATTRS_KEY]
+        ds = compile_derived_sources(derived[DERIVED_SOURCES_KEY])
+        to_derive = []
+        for sample, attrs in changes.values():
+            rederive = False
+            for attr in da if isinstance(da, list) else [da]:
+                if attr in attrs:
+                    # the source key itself has been updated
+                    pass
+                elif attr in sample._derived_cols_done and isinstance(ds, Mapping):
+                    source = ds.get(sample.get(ATTR_KEY_PREFIX + attr))
+                    if not attrs.intersection(getattr(source, "fields", [])):
+                        continue
+                    sample[attr] = sample[ATTR_KEY_PREFIX + attr]
+                else:
+                    continue
+                if attr in sample._derived_cols_done:
+                    sample._set_raw(
+                        "_derived_cols_done",
+                        tuple(a for a in sample._derived_cols_done if a != attr),
+                    )
+                attrs.add(attr)
+                rederive = True
+            if rederive:
+                to_derive.append(sample)
+        if to_derive:
+            self.attr_derive(samples=to_derive)
+
+    @staticmethod
+    def _reapply_implications(sample, implication_index):
+        """
+        Apply the implications to the sample again, as if they were applied
+        to its current attributes before any implication
+
+        The attributes implied by the rules that no longer match the sample
+        get back the values they had before they were implied, or are removed.
+
+        :param peppy.Sample sample: sample to update
+        :param _ImplicationIndex implication_index: implications to apply
+        :return set[str]: names of the attributes that changed
+        """
+        replaced = sample.get(IMPLIED_ATTRS_KEY) or {}
+        attributes = dict(sample.attributes)
+        for attr, value in replaced.items():
+            if value:
+                attributes[attr] = value[0]
+            else:
+                attributes.pop(attr, None)
+        implied = {}
+        implication_index.apply(attributes, implied)
+        changed = set()
+        for attr, value in replaced.items():
+            if attr in implied:
+                continue
+            changed.add(attr)
+            if value:
+                sample[attr] = value[0]
+            elif attr in sample:
+                del sample[attr]
+        for attr in implied:
+            if attr not in sample or sample[attr] != attributes[attr]:
+                changed.add(attr)
+                sample[attr] = attributes[attr]
+        if implied:
+            sample._set_raw(IMPLIED_ATTRS_KEY, implied)
+        elif IMPLIED_ATTRS_KEY in sample:
+            sample._del_raw(IMPLIED_ATTRS_KEY)
+        return changed
+
+    def remove_samples(self, sample_names):
+        """
+        Remove Samples from Project
+
+        :param Iterable[str] sample_names: sample names to remove
+        """
+        self._assert_not_frozen()
+        sample_names = [sample_names] if isinstance(sample_names, str) else sample_names
+        if isinstance(self._samples, SampleStore):
+            if self._samples.remove(sample_names):
+                self[SAMPLE_EDIT_FLAG_KEY] = True
+            return
+        removed = {id(s) for s in self.get_samples(sample_names)}
+        if removed:
+            self._samples = [s for s in self._samples if id(s) not in removed]
+            self._sample_index = None
+            if getattr(self, "_table_samples", None) is None:
+                # otherwise the rows are dropped from the sample table on access
+                self[SAMPLE_EDIT_FLAG_KEY] = True
 
     def infer_name(self):
         """
@@ -1256,14 +2294,17 @@ class Project(MutableMapping):
 
         :return pandas.DataFrame: a data frame with current samples attributes
         """
+        self._apply_sample_edits()
         if self[SAMPLE_EDIT_FLAG_KEY]:
             _LOGGER.debug("Generating new sample_table DataFrame")
             self[SAMPLE_EDIT_FLAG_KEY] = False
             new_df = self._get_table_from_samples(index=self.st_index)
             self._sample_table = new_df
+            self._track_sample_table()
             return new_df
 
         _LOGGER.debug("Returning stashed sample_table DataFrame")
+        self._sample_table_shared = True
         return self._sample_table
 
     @property
@@ -1273,8 +2314,8 @@ class Project(MutableMapping):
 
         :return pandas.DataFrame: a data frame with subsample attributes
         """
-
-        if not self[SUBSAMPLE_DF_KEY]:
+        self._restore_raw_tables()
+        if not self.get(SUBSAMPLE_DF_KEY):
             return None
 
         subsample_dataframes_array = make_list(self[SUBSAMPLE_DF_KEY], pd.DataFrame)
@@ -1335,6 +2376,21 @@ class Project(MutableMapping):
                 return
             st = self[CONFIG_KEY][CFG_SAMPLE_TABLE_KEY]
 
+        if st is not None:
+            parser_class = select_parser(path=st)
+            self[SAMPLE_DF_KEY] = parser_class(path=st).table.replace(np.nan, "")
+            self[SAMPLE_DF_LARGE] = self[SAMPLE_DF_KEY].shape[0] > 1000
+        else:
+            _LOGGER.warning(no_metadata_msg.format(CFG_SAMPLE_TABLE_KEY))
+            self[SAMPLE_DF_KEY] = None
+        self._read_subsample_data()
+        self._raw_tables_rereadable = st is not None
+
+    def _read_subsample_data(self):
+        """
+        Read the subsample tables into dataframes and store them
+        in the object root
+        """
         if self[SUBSAMPLE_TABLES_FILE_KEY] is not None:
             sst = self[SUBSAMPLE_TABLES_FILE_KEY]
         else:
@@ -1346,13 +2402,6 @@ class Project(MutableMapping):
             else:
                 sst = None
 
-        if st is not None:
-            parser_class = select_parser(path=st)
-            self[SAMPLE_DF_KEY] = parser_class(path=st).table.replace(np.nan, "")
-            self[SAMPLE_DF_LARGE] = self[SAMPLE_DF_KEY].shape[0] > 1000
-        else:
-            _LOGGER.warning(no_metadata_msg.format(CFG_SAMPLE_TABLE_KEY))
-            self[SAMPLE_DF_KEY] = None
         if sst is not None:
             ssts = []
             for subsample_table in sst:
@@ -1360,7 +2409,7 @@ class Project(MutableMapping):
                 ssts.append(parser_class(path=subsample_table).table)
             self[SUBSAMPLE_DF_KEY] = ssts
         else:
-            _LOGGER.debug(no_metadata_msg.format(CFG_SUBSAMPLE_TABLE_KEY))
+            _LOGGER.debug("No {} specified".format(CFG_SUBSAMPLE_TABLE_KEY))
             self[SUBSAMPLE_DF_KEY] = None
 
     @property
@@ -1433,10 +2482,152 @@ class Project(MutableMapping):
         """
         Returns a list of sample objects given a list of sample names
 
+        The samples are looked up in an index of the sample table index
+        values, which are tuples of the values if the index has multiple
+        columns. The names that are not in the index are skipped without
+        visiting the samples.
+
         :param list sample_names: A list of sample names to retrieve
         :return list[peppy.Sample]: A list of Sample objects
         """
-        return [s for s in self.samples if s[self.st_index] in sample_names]
+        sample_names = (
+            [sample_names] if isinstance(sample_names, str) else list(sample_names)
+        )
+        return self._find_samples(sample_names)
+
+    def _find_samples(self, sample_names):
+        """
+        Look the samples up in the index of the sample table index values
+
+        :param list sample_names: sample table index values of the samples
+        :return list[peppy.Sample]: matching samples, in order
+        """
+        if isinstance(self._samples, (SampleStore, FrozenSamples)):
+            return self._samples.find(sample_names)
+        attrs = (
+            self.st_index if isinstance(self.st_index, str) else tuple(self.st_index)
+        )
+        positions = self._indexed_samples().find(sample_names, attrs)
+        if positions is None:
+            # a sample was changed without the project knowing
+            positions = self._index_samples().find(sample_names, attrs)
+        return [self._samples[position] for position in positions]
+
+    def column(self, attr: str, default=None, dtype=None) -> np.ndarray:
+        """
+        Get the values of an attribute of all samples as an array
+
+        The values are read from the index of the attribute, built when it
+        is first used and kept in sync with the sample edits, rather than
+        from every sample. The merged attribute values come back as lists.
+        The samples kept in a sample store or frozen are read one by one.
+
+        :param str attr: name of the attribute
+        :param object default: value for the samples that lack the attribute
+        :param type | str dtype: data type to convert the values to; the
+            values are returned as objects if not set
+        :return numpy.ndarray: values of the attribute, in the samples order
+        """
+        if isinstance(self._samples, (SampleStore, FrozenSamples)):
+            values = [
+                _obj2dict(s[attr]) if attr in s else default for s in self._samples
+            ]
+            array = np.fromiter(values, dtype=object, count=len(values))
+        else:
+            values, positions, unhashable = self._indexed_samples().column(attr)
+            array = np.fromiter(values, dtype=object, count=len(values))
+            for position in positions.get(_MISSING, ()):
+                array[position] = default
+            for position in unhashable:
+                array[position] = _obj2dict(array[position])
+        return array if dtype is None else array.astype(dtype)
+
+    def columns(self, attrs: Iterable[str], default=None, dtype=None) -> dict:
+        """
+        Get the values of attributes of all samples as arrays
+
+        :param Iterable[str] attrs: names of the attributes
+        :param object default: value for the samples that lack an attribute
+        :param type | str dtype: data type to convert the values to; the
+            values are returned as objects if not set
+        :return dict[str, numpy.ndarray]: values of every attribute,
+            in the samples order
+        """
+        return {attr: self.column(attr, default=default, dtype=dtype) for attr in attrs}
+
+    def select(self, expression: str = None, **criteria) -> List[Sample]:
+        """
+        Select the samples by their attribute values
+
+        The criteria map attribute names to the values to match, or to lists
+        of values any of which matches. The expression is a condition on the
+        attributes in Python syntax: comparisons of attributes with literal
+        values ('==', '!=', '<', '<=', '>', '>=', 'in', 'not in') combined
+        with 'and', 'or' and 'not'. The samples that lack an attribute do
+        not match any comparison of it. All of the given conditions have to
+        match.
+
+        The attributes are indexed when they are first selected by, and the
+        indexes are kept in sync with the sample edits, so only the samples
+        with the required values are visited. The samples kept in a sample
+        store or frozen are scanned instead.
+
+        :param str expression: condition on the sample attributes
+        :param criteria: attribute values to match
+        :return list[peppy.Sample]: matching samples, in order
+        :raise ValueError: if the expression is not a supported condition
+
+        :Example:
+
+        .. code-block:: python
+
+            prj.select(protocol="ATAC", genome=["hg38", "mm10"])
+            prj.select("protocol == 'ATAC' and not read_length < 50")
+        """
+        conditions = [] if expression is None else [_parse_condition(expression)]
+        for attr, value in criteria.items():
+            if isinstance(value, (list, tuple, set, frozenset)):
+                conditions.append(("cmp", attr, "in", tuple(value)))
+            else:
+                conditions.append(("cmp", attr, "==", value))
+        condition = ("and", conditions)
+        if isinstance(self._samples, (SampleStore, FrozenSamples)):
+            return [
+                sample
+                for sample in self._samples
+                if _condition_matches(
+                    condition,
+                    lambda attr: sample[attr] if attr in sample else _MISSING,
+                )
+            ]
+        positions = self._indexed_samples().select(condition)
+        return [self._samples[position] for position in positions]
+
+    def _indexed_samples(self):
+        """
+        Get the index of the samples, built anew if the samples list changed
+
+        :return _SampleIndex: index of the samples
+        """
+        sample_index = getattr(self, "_sample_index", None)
+        if sample_index is None or not sample_index.covers(self._samples):
+            sample_index = self._index_samples()
+        return sample_index
+
+    def _index_samples(self):
+        """
+        Create a new index of the samples
+
+        The samples put into the samples list directly are bound to the
+        project, so that it is notified of their edits.
+
+        :return _SampleIndex: index of the samples
+        """
+        for sample in self._samples:
+            if sample.project is None:
+                sample._set_raw(PRJ_REF, self)
+        self._sample_index = _SampleIndex(self._samples)
+        return self._sample_index
 
     @property
     def description(self):
@@ -1481,11 +2672,689 @@ class Project(MutableMapping):
     def __repr__(self):
         return str(self)
 
-    def __reduce__(self):
+    def __getstate__(self):
+        """
+        Get the processed project state to pickle, so that unpickling
+        restores the project without processing the samples again
+
+        The samples kept in a sample store are pickled as a list. The samples
+        do not pickle the project they refer to, they are bound to the
+        unpickled project.
+
+        :return dict: project attributes
+        """
+        self._apply_sample_edits()
+        state = dict(self.__dict__)
+        if isinstance(self._samples, SampleStore):
+            state["_samples"] = list(self._samples)
+            state["sample_store"] = None
+        state["_sample_index"] = None
+        state["_subsample_chunks"] = None
+        # tracked by the sample object ids, which are not kept
+        state["_sample_edits"] = {}
+        state["_table_positions"] = None
+        state["_row_stores"] = []
+        state.pop("_held_by_samples", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not isinstance(self._samples, FrozenSamples):
+            for sample in self._samples:
+                sample._set_raw(PRJ_REF, self)
+        self._view_samples()
+
+    def __del__(self):
+        """
+        Keep the project alive for the samples that outlive it
+
+        The samples refer to the project weakly, so that a project nothing
+        else refers to is freed right away, without a garbage collector pass.
+        If any of its samples, or the samples list itself, is still referred
+        to, the samples are bound to the project strongly instead, as they
+        were before, so that they keep it alive.
+        """
+        if not _samples_outlive(self):
+            return
+        self._held_by_samples = True
+        samples = self._samples
+        if isinstance(samples, (SampleStore, FrozenSamples)):
+            samples._project = self
+            if not isinstance(samples, SampleStore):
+                return
+            samples = list(samples._alive.values())
+        for sample in samples:
+            sample._set_raw(PRJ_REF, self)
+
+
+class _SampleTableSchemaChange(Exception):
+    """Sample table changes cannot be patched into the stashed table"""
+
+
+class _SubsampleChunks:
+    """
+    Subsample tables grouped by the sample each row belongs to, so that the
+    rows of a chunk of samples can be selected without scanning the tables.
+
+    The rows that do not belong to any of the samples are kept apart, to be
+    merged with a single chunk, which reports them.
+
+    :param list[pandas.DataFrame] subsample_tables: subsample tables
+    :param str sample_colname: name of the column that identifies samples
+    :param Iterable sample_names: names of all the samples; the rows are not
+        told apart if not given
+    """
+
+    def __init__(self, subsample_tables, sample_colname, sample_names=None):
+        sample_names = None if sample_names is None else set(sample_names)
+        self._tables = []
+        for table in subsample_tables:
+            if sample_colname not in table.columns:
+                # cannot be merged; every chunk fails the same way
+                self._tables.append((table, None, None))
+                continue
+            positions = table.groupby(sample_colname, sort=False, dropna=False).indices
+            orphans = [
+                rows
+                for name, rows in positions.items()
+                if sample_names is not None and name not in sample_names
+            ]
+            self._tables.append((table, positions, orphans))
+
+    def tables_for(self, sample_names, orphans=False):
+        """
+        Get the subsample table rows of a chunk of samples
+
+        :param Iterable sample_names: names of the samples in the chunk
+        :param bool orphans: whether to include the rows that do not
+            belong to any of the samples
+        :return list[pandas.DataFrame]: subsample tables of the chunk
+        """
+        tables = []
+        for table, positions, orphan_rows in self._tables:
+            if positions is None:
+                tables.append(table)
+                continue
+            rows = [positions[n] for n in sample_names if n in positions]
+            if orphans:
+                rows.extend(orphan_rows)
+            rows = np.sort(np.concatenate(rows)) if rows else []
+            tables.append(table.iloc[rows])
+        return tables
+
+
+class _SampleIndex:
+    """
+    Positions of the samples in the samples list, hashed by the values of
+    the indexed attributes, so that the samples can be looked up without
+    visiting all of them.
+
+    An attribute is indexed when it is first looked up by. The index is tied
+    to the list it was built for and to its length; appended samples are
+    indexed as they are added and the edited ones when the index is used
+    next. The indexed samples are bound to the project, which is notified of
+    their edits, so the values not found are not looked for any further. The
+    samples found are checked to still have the values they were indexed by,
+    and the index is rebuilt if one does not, e.g. if it was assigned into the
+    list in place; such a sample is not found by its own values otherwise.
+
+    :param list[peppy.Sample] samples: samples to index
+    """
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.size = len(samples)
+        # values, positions by hashable value and positions of the others
+        self._columns = {}
+        self._ids = None
+        # names of the edited attributes by the sample positions, None if unknown
+        self._edited = {}
+
+    def covers(self, samples):
+        """
+        Check whether the index is in sync with the samples list
+
+        :param list[peppy.Sample] samples: samples list
+        :return bool: whether the index can be used to look the samples up
+        """
+        return samples is self.samples and len(samples) == self.size
+
+    @staticmethod
+    def key(sample, attrs):
+        """
+        Get the value of the indexed attribute(s) of the sample
+
+        :param peppy.Sample sample: sample to get the value of
+        :param str | tuple[str] attrs: attribute name, or names of the
+            attributes whose values make up a composite key
+        :return object: value, a tuple of values for composite keys
+        :raise KeyError: if the sample lacks any of the attributes
+        """
+        if isinstance(attrs, str):
+            return sample[attrs]
+        return tuple(sample[attr] for attr in attrs)
+
+    def column(self, attrs):
+        """
+        Get the index of the attribute(s), built on first use
+
+        :param str | tuple[str] attrs: attribute name, or names of the
+            attributes whose values make up a composite key
+        :return (list, dict, list): value of every sample, positions by the
+            hashable values and positions of the samples with the other ones;
+            the samples that lack the attribute have the _MISSING value
+        """
+        if self._edited:
+            edited, self._edited = self._edited, {}
+            for position, edited_attrs in edited.items():
+                for column_attrs, column in self._columns.items():
+                    if _keys_on(column_attrs, edited_attrs):
+                        self._unindex(column, position)
+                        self._index(column, column_attrs, position)
+        column = self._columns.get(attrs)
+        if column is None:
+            values, positions, unhashable = column = ([], {}, [])
+            if isinstance(attrs, str):
+                get_value = operator.itemgetter(attrs)
+            else:
+                get_value = partial(self.key, attrs=attrs)
+            for position, sample in enumerate(self.samples):
+                try:
+                    value = get_value(sample)
+                except KeyError:
+                    value = _MISSING
+                values.append(value)
+                try:
+                    positions.setdefault(value, []).append(position)
+                except TypeError:
+                    unhashable.append(position)
+            self._columns[attrs] = column
+        return column
+
+    def _index(self, column, attrs, position):
+        values, positions, unhashable = column
+        try:
+            value = self.key(self.samples[position], attrs)
+        except KeyError:
+            value = _MISSING
+        values[position] = value
+        try:
+            positions.setdefault(value, []).append(position)
+        except TypeError:
+            unhashable.append(position)
+
+    def _unindex(self, column, position):
+        values, positions, unhashable = column
+        value = values[position]
+        try:
+            found = positions[value]
+        except TypeError:
+            unhashable.remove(position)
+            return
+        found.remove(position)
+        if not found:
+            del positions[value]
+
+    def add(self, sample):
+        """
+        Index the sample appended to the samples list
+
+        :param peppy.Sample sample: appended sample
+        """
+        position = self.size
+        self.size += 1
+        if self._ids is not None:
+            self._ids[id(sample)] = position
+        for attrs, column in self._columns.items():
+            column[0].append(None)
+            self._index(column, attrs, position)
+
+    def edit(self, sample, attr):
+        """
+        Mark the sample to index again, if the edited attribute is indexed
+
+        :param peppy.Sample sample: edited sample
+        :param str attr: name of the edited attribute, None if not known
+        """
+        edited_attrs = None if attr is None else {attr}
+        if not any(_keys_on(attrs, edited_attrs) for attrs in self._columns):
+            return
+        if self._ids is None:
+            self._ids = {id(s): position for position, s in enumerate(self.samples)}
+        position = self._ids.get(id(sample))
+        if position is None:
+            return
+        if position in self._edited:
+            known = self._edited[position]
+            edited_attrs = None if known is None or attr is None else known | {attr}
+        self._edited[position] = edited_attrs
+
+    def find(self, names, attrs):
+        """
+        Get the positions of the samples with any of the given values of the
+        indexed attribute(s)
+
+        :param Iterable names: values of the samples to find
+        :param str | tuple[str] attrs: indexed attribute name(s)
+        :return list[int]: positions of the matching samples, in order;
+            None if the index is out of sync
+        """
+        positions = self.column(attrs)[1]
+        found = set()
+        for name in names:
+            try:
+                name_positions = positions.get(name)
+            except TypeError:
+                name_positions = None
+            if name_positions is None:
+                continue
+            for position in name_positions:
+                try:
+                    key = self.key(self.samples[position], attrs)
+                except (KeyError, IndexError):
+                    return None
+                if key is not name and key != name:
+                    return None
+                found.add(position)
+        return sorted(found)
+
+    def select(self, condition):
+        """
+        Get the positions of the samples that match the condition
+
+        The samples to check are narrowed down to the ones with the values
+        the condition requires, if it requires any.
+
+        :param tuple condition: parsed condition, see _parse_condition
+        :return list[int]: positions of the matching samples, in order
+        """
+        candidates = self._candidates(condition)
+        positions = range(self.size) if candidates is None else sorted(candidates)
+        values = {attr: self.column(attr)[0] for attr in _condition_attrs(condition)}
+        return [
+            position
+            for position in positions
+            if _condition_matches(condition, lambda attr: values[attr][position])
+        ]
+
+    def _candidates(self, condition):
+        """
+        Get the positions of the samples that can match the condition
+
+        :param tuple condition: parsed condition
+        :return Collection[int]: positions, None if any sample can match
+        """
+        kind = condition[0]
+        if kind == "and":
+            candidates = [self._candidates(c) for c in condition[1]]
+            candidates = [c for c in candidates if c is not None]
+            return min(candidates, key=len) if candidates else None
+        if kind == "or":
+            candidates = set()
+            for c in condition[1]:
+                found = self._candidates(c)
+                if found is None:
+                    return None
+                candidates.update(found)
+            return candidates
+        if kind == "not":
+            return None
+        _, attr, op, value = condition
+        if op in ("!=", "not in"):
+            return None
+        _, positions, unhashable = self.column(attr)
+        if op == "==":
+            try:
+                found = positions.get(value, [])
+            except TypeError:
+                found = []
+            return set(found).union(unhashable) if unhashable else found
+        candidates = set(unhashable)
+        if op == "in":
+            for accepted in value:
+                try:
+                    candidates.update(positions.get(accepted, []))
+                except TypeError:
+                    pass
+            return candidates
+        for key, found in positions.items():
+            if _compare(key, op, value):
+                candidates.update(found)
+        return candidates
+
+
+class _ImplicationIndex:
+    """
+    Sample attribute implications compiled into hash indexes.
+
+    Every rule is indexed by the value(s) its first 'if' attribute accepts,
+    so a sample only evaluates the rules that can possibly match it, regardless
+    of how many rules are declared. A single string accepts any of its
+    substrings, as 'in' does, so it is indexed by all of them; rules anchored
+    on long strings are checked for every sample instead. Rules are still
+    applied in the declared order and attributes implied by one rule can
+    trigger the rules that follow it.
+
+    :param list[Mapping] implications: the 'imply' section of sample modifiers
+    :raise InvalidConfigFileException: if the implications are malformed
+    """
+
+    def __init__(self, implications):
+        if not isinstance(implications, list):
+            raise InvalidConfigFileException(
+                f"{SAMPLE_MODS_KEY}.{IMPLIED_KEY} has to be a list of key-value pairs"
+            )
+        self._rules = []
+        # rules checked for every sample
+        self._scanned = []
+        self._index = {}
+        self.implier_attrs = set()
+        self.implied_attrs = set()
+        for rule_id, implication in enumerate(implications):
+            if not isinstance(implication, Mapping) or not all(
+                [isinstance(implication.get(key), Mapping) for key in IMPLIED_COND_KEYS]
+            ):
+                raise InvalidConfigFileException(
+                    f"{SAMPLE_MODS_KEY}.{IMPLIED_KEY} section is invalid: {implication}"
+                )
+            conditions = [
+                (attr, *_accepted_values(val))
+                for attr, val in implication[IMPLIED_IF_KEY].items()
+            ]
+            self._rules.append((conditions, dict(implication[IMPLIED_THEN_KEY])))
+            self.implier_attrs.update(implication[IMPLIED_IF_KEY])
+            self.implied_attrs.update(implication[IMPLIED_THEN_KEY])
+            if not conditions:
+                self._scanned.append(rule_id)
+                continue
+            anchor_attr, accepted, _ = conditions[0]
+            if isinstance(accepted, str):
+                if len(accepted) > _MAX_INDEXED_STRING_LEN:
+                    self._scanned.append(rule_id)
+                    continue
+                accepted = _substrings(accepted)
+            by_value = self._index.setdefault(anchor_attr, {})
+            for value in accepted:
+                by_value.setdefault(value, []).append(rule_id)
+
+    def _rules_for(self, attr, value, after=-1):
+        """
+        Get ids of the rules anchored on the given attribute value
+
+        :param str attr: attribute name
+        :param object value: attribute value
+        :param int after: only return rules declared after this one
+        :return list[int]: matching rule ids
+        """
+        try:
+            rule_ids = self._index[attr].get(value, [])
+        except (KeyError, TypeError):
+            return []
+        return [rule_id for rule_id in rule_ids if rule_id > after]
+
+    @staticmethod
+    def _matches(sample, conditions):
+        """
+        Check whether the sample satisfies all conditions of a rule
+
+        :param peppy.Sample sample: sample to check
+        :param list[tuple] conditions: compiled rule conditions
+        :return bool: whether the rule applies to the sample
+        """
+        for attr, accepted, unhashable in conditions:
+            try:
+                sample_val = sample[attr]
+            except KeyError:
+                _LOGGER.debug(f"Sample lacks implier attr ({attr}), skipping")
+                return False
+            try:
+                matched = sample_val in accepted
+            except TypeError:
+                matched = sample_val in unhashable
+            if not matched:
+                _LOGGER.debug(
+                    "Sample attr value does not match any of implier "
+                    f"requirements ({sample_val} not in {accepted}), skipping"
+                )
+                return False
+        return True
+
+    def apply(self, sample, replaced=None):
+        """
+        Set the attributes implied by every matching rule on the sample
+
+        :param peppy.Sample | MutableMapping sample: sample to update
+        :param dict replaced: updated with the value each implied attribute
+            had before it was first implied, as a 1-tuple, or an empty tuple
+            if the sample lacked the attribute
+        """
+        candidates = list(self._scanned)
+        for attr in self._index:
+            try:
+                candidates.extend(self._rules_for(attr, sample[attr]))
+            except KeyError:
+                continue
+        heapq.heapify(candidates)
+        last_applied = -1
+        while candidates:
+            rule_id = heapq.heappop(candidates)
+            if rule_id <= last_applied:
+                continue
+            last_applied = rule_id
+            conditions, implied = self._rules[rule_id]
+            if not self._matches(sample, conditions):
+                continue
+            for implied_attr, imp_val in implied.items():
+                _LOGGER.debug(f"Setting implied attr: '{implied_attr}={imp_val}'")
+                if replaced is not None and implied_attr not in replaced:
+                    replaced[implied_attr] = (
+                        (sample[implied_attr],) if implied_attr in sample else ()
+                    )
+                sample[implied_attr] = imp_val
+                for later_rule_id in self._rules_for(implied_attr, imp_val, rule_id):
+                    heapq.heappush(candidates, later_rule_id)
+
+
+def _accepted_values(implier_val):
+    """
+    Normalize the value(s) an implication condition accepts
+
+    :param object | list implier_val: accepted value or list of accepted values
+    :return tuple[set | str, list]: hashable accepted values, or the accepted
+        string, which accepts its substrings, and the values that cannot
+        be hashed
+    """
+    if isinstance(implier_val, str):
+        return implier_val, []
+    values = implier_val if isinstance(implier_val, list) else [implier_val]
+    accepted, unhashable = set(), []
+    for value in values:
+        try:
+            accepted.add(value)
+        except TypeError:
+            unhashable.append(value)
+    return accepted, unhashable
+
+
+def _substrings(text):
+    """
+    Get all substrings of a string, including the empty one
+
+    :param str text: string to get the substrings of
+    :return set[str]: substrings
+    """
+    return {
+        text[start:stop]
+        for start in range(len(text) + 1)
+        for stop in range(start, len(text) + 1)
+    }
+
+
+def _keys_on(attrs, edited_attrs):
+    """
+    Check whether the indexed attribute values depend on the edited attributes
+
+    :param str | tuple[str] attrs: indexed attribute name(s)
+    :param set[str] edited_attrs: names of the edited attributes, None if
+        not known
+    :return bool: whether the indexed values may have changed
+    """
+    if edited_attrs is None:
+        return True
+    if isinstance(attrs, str):
+        return attrs in edited_attrs
+    return not edited_attrs.isdisjoint(attrs)
+
+
+_COMPARISONS = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.In: "in",
+    ast.NotIn: "not in",
+}
+
+# comparisons that hold with the operands swapped
+_SWAPPED_COMPARISONS = {
+    "==": "==",
+    "!=": "!=",
+    "<": ">",
+    "<=": ">=",
+    ">": "<",
+    ">=": "<=",
+}
+
+_COMPARATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda value, accepted: value in accepted,
+    "not in": lambda value, accepted: value not in accepted,
+}
+
+
+def _parse_condition(expression):
+    """
+    Parse a condition on the sample attributes
+
+    The condition is parsed into nested tuples: ("and", conditions),
+    ("or", conditions), ("not", condition) and ("cmp", attribute,
+    comparison, value).
+
+    :param str expression: comparisons of attributes with literal values,
+        combined with 'and', 'or' and 'not'
+    :return tuple: parsed condition
+    :raise ValueError: if the expression is not a supported condition
+    """
+    try:
+        node = ast.parse(expression.strip(), mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"Invalid sample selection expression: {expression}") from e
+    return _parse_condition_node(node, expression)
+
+
+def _parse_condition_node(node, expression):
+    """
+    Parse a node of the condition syntax tree
+
+    :param ast.AST node: node to parse
+    :param str expression: the whole condition, to report errors with
+    :return tuple: parsed condition
+    :raise ValueError: if the node is not a supported condition
+    """
+    if isinstance(node, ast.BoolOp):
         return (
-            self.__class__.from_dict,
-            (self.to_dict(extended=True, orient="records"),),
+            "and" if isinstance(node.op, ast.And) else "or",
+            [_parse_condition_node(value, expression) for value in node.values],
         )
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return "not", _parse_condition_node(node.operand, expression)
+    if not isinstance(node, ast.Compare):
+        raise ValueError(f"Unsupported sample selection expression: {expression}")
+    operands = [node.left] + node.comparators
+    conditions = []
+    for left, op, right in zip(operands, node.ops, operands[1:]):
+        comparison = _COMPARISONS.get(type(op))
+        value = None
+        if isinstance(left, ast.Name) and not isinstance(right, ast.Name):
+            attr, value = left.id, right
+        elif isinstance(right, ast.Name) and comparison in _SWAPPED_COMPARISONS:
+            attr, value = right.id, left
+            comparison = _SWAPPED_COMPARISONS[comparison]
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, TypeError, SyntaxError):
+            comparison = None
+        if comparison in ("in", "not in"):
+            if isinstance(value, (list, tuple, set, frozenset)):
+                value = tuple(value)
+            else:
+                comparison = None
+        if comparison is None:
+            raise ValueError(
+                f"Sample selection expression has to compare attributes with "
+                f"literal values: {expression}"
+            )
+        conditions.append(("cmp", attr, comparison, value))
+    return conditions[0] if len(conditions) == 1 else ("and", conditions)
+
+
+def _condition_attrs(condition):
+    """
+    Get the names of the attributes the condition refers to
+
+    :param tuple condition: parsed condition
+    :return set[str]: attribute names
+    """
+    if condition[0] == "cmp":
+        return {condition[1]}
+    if condition[0] == "not":
+        return _condition_attrs(condition[1])
+    return set().union(*[_condition_attrs(c) for c in condition[1]])
+
+
+def _condition_matches(condition, get_value):
+    """
+    Check whether the attribute values match the condition
+
+    :param tuple condition: parsed condition
+    :param callable get_value: function that returns the value of an attribute
+        by its name, or _MISSING if the sample lacks it
+    :return bool: whether the values match
+    """
+    kind = condition[0]
+    if kind == "and":
+        return all(_condition_matches(c, get_value) for c in condition[1])
+    if kind == "or":
+        return any(_condition_matches(c, get_value) for c in condition[1])
+    if kind == "not":
+        return not _condition_matches(condition[1], get_value)
+    _, attr, comparison, value = condition
+    return _compare(get_value(attr), comparison, value)
+
+
+def _compare(value, comparison, other):
+    """
+    Compare an attribute value with a value of the condition
+
+    :param object value: attribute value, _MISSING if the sample lacks it
+    :param str comparison: comparison operator
+    :param object other: value to compare with
+    :return bool: whether the comparison holds; False for the values that
+        cannot be compared
+    """
+    if value is _MISSING:
+        return False
+    try:
+        return bool(_COMPARATORS[comparison](value, other))
+    except (TypeError, ValueError):
+        return False
 
 
 def infer_delimiter(filepath):
@@ -1499,6 +3368,268 @@ def infer_delimiter(filepath):
     return {"txt": "\t", "tsv": "\t", "csv": ","}.get(ext)
 
 
+def _apply_sample_modifiers(config, st_index, modifiers, derive_max_workers, states):
+    """
+    Apply sample modifiers to a chunk of samples; run in a worker process
+
+    :param Mapping config: project config
+    :param str | Iterable[str] st_index: sample table index
+    :param list[str] modifiers: names of the modifier methods to apply
+    :param int derive_max_workers: size of the thread pool to expand the
+        derived attributes' glob patterns with
+    :param list[dict] states: attributes of the samples to modify
+    :return list[dict]: attributes of the modified samples
+    """
+    prj = Project(defer_samples_creation=True, derive_max_workers=derive_max_workers)
+    prj[CONFIG_KEY] = config
+    prj.st_index = st_index
+    prj._samples = [Sample._from_state(state) for state in states]
+    for modifier in modifiers:
+        getattr(prj, modifier)()
+    return [sample._get_state() for sample in prj.samples]
+
+
+def _derivations_are_interdependent(data_sources, derivations):
+    """
+    Check whether any derived source is formatted with another derived attribute
+
+    Such derivations rely on the previous ones being fully expanded first,
+    so they can't be deferred.
+
+    :param Mapping data_sources: compiled derived sources
+    :param Iterable[str] derivations: names of the attributes to derive
+    :return bool: whether the derivations depend on each other
+    """
+    if not isinstance(data_sources, Mapping) or len(derivations) < 2:
+        return False
+    return any(
+        not isinstance(template, DerivedSourceTemplate)
+        or set(template.fields).intersection(derivations)
+        for template in data_sources.values()
+    )
+
+
+def _keeps_dtype(column, values=None):
+    """
+    Check whether a sample table column keeps its type, as a regenerated
+    table would infer it, with the values set in it
+
+    The values have to be of the column type, so that the column stays so
+    whatever values they replace. Without values, check whether the values
+    left in the column, after some were removed, are of the column type;
+    that is not known for float columns, which do not keep the integers
+    they were inferred from.
+
+    :param pandas.Series column: sample table column
+    :param list values: values to set in the column
+    :return bool: whether the column keeps its type
+    """
+    if values is None:
+        if column.dtype.kind == "f":
+            return False
+        if column.dtype != object:
+            return bool(column.notna().any())
+        values = column.tolist()
+    elif all(v is None or v is np.nan for v in values):
+        # missing values make an object column of floats
+        return column.dtype.kind == "f"
+    return pd.DataFrame.from_dict([{0: v} for v in values])[0].dtype == column.dtype
+
+
+def _mark_derived(sample, attr):
+    """
+    Record that the sample attribute has been derived
+
+    The record is replaced rather than modified in place, as the sample may
+    share it with its copies.
+
+    :param peppy.Sample sample: sample the attribute was derived for
+    :param str attr: name of the derived attribute
+    """
+    sample._set_raw("_derived_cols_done", (*sample._derived_cols_done, attr))
+
+
+def _copy_project_data(value):
+    """
+    Copy a project data entry; data frames are shallow copies if pandas
+    copies them on write, and copies of the columns otherwise
+
+    :param value: project data entry to copy
+    :return: copy of the entry
+    """
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=not pandas_copy_on_write())
+    if isinstance(value, list) and any(isinstance(v, pd.DataFrame) for v in value):
+        return [_copy_project_data(v) for v in value]
+    return deepcopy(value)
+
+
+def _samples_outlive(prj):
+    """
+    Check whether the samples of a project that is being freed, or the
+    container that holds them, are referred to by anything but the project
+
+    :param peppy.Project prj: project being freed
+    :return bool: whether any of the samples outlives the project
+    """
+    if prj.__dict__.get("_samples") is None:
+        return False
+    if not hasattr(sys, "getrefcount"):
+        return True
+    container_refs, samples, sample_refs = _project_refs(prj)
+    # the references of this function and of the getrefcount argument,
+    # measured on an object referred to in the same way
+    container = prj.__dict__["_samples"]
+    probe = object()
+    base = sys.getrefcount(probe) - 1
+    if sys.getrefcount(container) - base - 1 > container_refs:
+        return True
+    # and the ones of the samples dict and of the map
+    probe = {0: probe}
+    base = sum(map(sys.getrefcount, probe.values())) - 1
+    total = sum(map(sys.getrefcount, samples.values()))
+    return total - len(samples) * (base + 1) > sample_refs
+
+
+def _project_refs(prj):
+    """
+    Count the references the project holds to its samples and to the
+    container that holds them
+
+    The lists, dicts and peppy objects the project refers to are walked,
+    as deep as the samples are kept; the samples are not walked into.
+
+    :param peppy.Project prj: project to count the references of
+    :return (int, dict, int): number of the references to the container,
+        the samples referred to or alive in the sample store by their ids,
+        and the number of the references to them
+    """
+    container = prj.__dict__["_samples"]
+    container_refs = 0
+    samples = {}
+    sample_refs = 0
+    kinds = {}
+    walked = {id(prj.__dict__)}
+    pending = [(prj.__dict__, 0)]
+    while pending:
+        obj, depth = pending.pop()
+        referents = gc.get_referents(obj)
+        container_refs += sum(map(operator.is_, referents, repeat(container)))
+        found = set(map(type, referents))
+        for kind in found.difference(kinds):
+            kinds[kind] = _walked_kind(kind)
+        found = {kinds[kind] for kind in found}
+        if Sample in found:
+            refs = referents
+            if len(found) > 1:
+                refs = [ref for ref in referents if isinstance(ref, Sample)]
+            sample_refs += len(refs)
+            samples.update(zip(map(id, refs), refs))
+        if True in found and depth + 1 < _SAMPLES_DEPTH:
+            for ref in referents:
+                if kinds[type(ref)] is True and id(ref) not in walked:
+                    walked.add(id(ref))
+                    pending.append((ref, depth + 1))
+    if isinstance(container, SampleStore):
+        samples.update((id(s), s) for s in container._alive.values())
+    return container_refs, samples, sample_refs
+
+
+def _walked_kind(kind):
+    """
+    Tell how the objects of a type the project refers to are walked
+
+    :param type kind: type of the objects
+    :return type | bool: Sample for samples; True for the containers and
+        the peppy objects, which may hold samples; False otherwise
+    """
+    if issubclass(kind, Sample):
+        return Sample
+    if issubclass(kind, (dict, list, tuple, set, frozenset)):
+        return True
+    return kind.__module__.startswith("peppy.") and not issubclass(kind, Project)
+
+
+def _pooled_value(value, pool):
+    """
+    Get the value with its strings replaced by the equal ones in the pool,
+    so that values repeated across samples are stored once
+
+    Lists are not shared, as samples may modify them in place.
+
+    :param value: value to pool
+    :param dict[str, str] pool: strings seen so far, mapped to themselves
+    :return: value with pooled strings
+    """
+    if type(value) is str:
+        return pool.setdefault(value, value)
+    if type(value) is list:
+        return [pool.setdefault(v, v) if type(v) is str else v for v in value]
+    if type(value) is MultiValue:
+        return MultiValue(
+            [pool.setdefault(v, v) if type(v) is str else v for v in value]
+        )
+    return value
+
+
+def _dedupe_table_values(df):
+    """
+    Make the repeated values in the string columns of a table the same
+    objects, so that the samples created from it hold one object per
+    distinct value
+
+    Columns with missing or non-string values are left as they are.
+
+    :param pandas.DataFrame df: table to deduplicate the values of
+    :return pandas.DataFrame: table with deduplicated values; the given one
+        is not modified
+    """
+    columns = [df.iloc[:, position] for position in range(df.shape[1])]
+    deduped = False
+    for position, values in enumerate(columns):
+        if values.hasnans or infer_dtype(values, skipna=False) != "string":
+            continue
+        codes, uniques = pd.factorize(values)
+        if len(uniques) == len(values):
+            continue
+        columns[position] = pd.Series(
+            uniques.take(codes), index=values.index, dtype=values.dtype
+        )
+        deduped = True
+    if not deduped:
+        return df
+    # a new frame, as a shallow copy would keep the replaced columns alive
+    table = pd.DataFrame(dict(enumerate(columns)), index=df.index)
+    table.columns = df.columns
+    return table
+
+
+def _merge_subsample_rows(rows, columns, sample_colname):
+    """
+    Collapse subsample table rows matching a single sample into multi-value attributes
+
+    :param Iterable[tuple] rows: (row label, row data) pairs to merge
+    :param Iterable[str] columns: subsample table columns
+    :param str sample_colname: name of the column that identifies samples
+    :return dict[str, MultiValue]: attributes to update the sample with
+    """
+    merged_attrs = {key: list() for key in columns}
+    for subsample_row_id, rowdata in rows:
+        if SUBSAMPLE_NAME_ATTR not in rowdata:
+            rowdata = dict(rowdata)
+            rowdata[SUBSAMPLE_NAME_ATTR] = str(subsample_row_id)
+        for attname, attval in rowdata.items():
+            if attname == sample_colname or not attval:
+                continue
+            if attname in merged_attrs:
+                merged_attrs[attname].append(attval)
+            else:
+                merged_attrs[attname] = [str(attval).rstrip()]
+    # remove sample name from the data with which to update sample
+    merged_attrs.pop(sample_colname, None)
+    return {key: MultiValue(values) for key, values in merged_attrs.items()}
+
+
 def _make_sections_absolute(object, sections, cfg_path):
     for key in sections:
         try:
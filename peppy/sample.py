@@ -1,7 +1,13 @@
 import glob
+import operator
 import os
-from collections.abc import Mapping
+import re
+import weakref
+from collections import ChainMap
+from collections.abc import Mapping, MutableMapping, Sequence
 from copy import copy as cp
+from copy import deepcopy
+from itertools import repeat
 from logging import getLogger
 from string import Formatter
 from typing import Optional, Union
@@ -20,8 +26,8 @@ from .const import (
     SAMPLE_SHEET_KEY,
 )
 from .exceptions import InvalidSampleTableFileException
-from .utils import copy, grab_project_data
 from .simple_attr_map import SimpleAttMap
+from .utils import grab_project_data, pandas_copy_on_write
 
 _LOGGER = getLogger(PKG_NAME)
 
@@ -31,7 +37,595 @@ class SafeDict(dict):
         return "{" + key + "}"
 
 
-@copy
+class MultiValue(list):
+    """
+    Read-only list of the values of a multi-valued sample attribute, e.g. the
+    files of a sample merged from the subsample table.
+
+    The same object is shared by the sample, its copies and its sample table
+    row, so the rows are built without copying the values. Since it cannot be
+    modified in place, none of them can change the others; augmented
+    assignment rebinds the name to a new list instead. The samples that are
+    trimmed, as in low memory mode, store the values of strings packed into
+    one string, see _PackedValues, and expand them when they are read.
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(
+            f"{self.__class__.__name__} is read-only; assign a new value instead"
+        )
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+    __setitem__ = __delitem__ = _read_only
+
+    def __iadd__(self, other):
+        return list(self) + list(other)
+
+    def __imul__(self, n):
+        return list(self) * n
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self.__class__([deepcopy(v, memo) for v in self])
+
+    def __reduce__(self):
+        return self.__class__, (list(self),)
+
+
+for _dumper in (yaml.SafeDumper, yaml.Dumper):
+    _dumper.add_representer(MultiValue, yaml.SafeDumper.represent_list)
+
+# joins the values of a packed multi-valued attribute
+_UNIT_SEPARATOR = "\x1f"
+
+
+class _PackedValues:
+    """
+    Multi-valued attribute of strings as a sample stores it: one string of
+    the values joined by the unit separator, rather than a list of strings,
+    expanded to a MultiValue when the attribute is read
+
+    :param str joined: the joined values
+    """
+
+    __slots__ = ("joined",)
+
+    def __init__(self, joined):
+        self.joined = joined
+
+    def expand(self):
+        """
+        Get the values
+
+        :return MultiValue: the values
+        """
+        return MultiValue(self.joined.split(_UNIT_SEPARATOR))
+
+    def __eq__(self, other):
+        if type(other) is not _PackedValues:
+            return NotImplemented
+        return self.joined == other.joined
+
+    def __hash__(self):
+        return hash(self.joined)
+
+    def __reduce__(self):
+        return _PackedValues, (self.joined,)
+
+
+def _pack_values(value):
+    """
+    Pack a multi-valued attribute, if all its values are strings
+
+    :param MultiValue value: attribute value to pack
+    :return _PackedValues | MultiValue: packed value, the given one if it
+        cannot be packed
+    """
+    if all(type(v) is str and _UNIT_SEPARATOR not in v for v in value):
+        return _PackedValues(_UNIT_SEPARATOR.join(value))
+    return value
+
+
+class DerivedSourceTemplate:
+    """
+    Derived attribute source, parsed once and formatted for any number of samples.
+
+    :param str template: derived attribute source template,
+        e.g. {identifier}{file_id}_data.txt
+    """
+
+    __slots__ = ("template", "expanded", "keys", "fields")
+
+    def __init__(self, template):
+        self.template = template
+        self.expanded = os.path.expandvars(template)
+        self.keys = [i[1] for i in Formatter().parse(self.expanded) if i[1] is not None]
+        # attributes the replacement fields look up, e.g. 'a' for '{a.b}'
+        self.fields = list(
+            dict.fromkeys([re.split(r"[.\[]", k, maxsplit=1)[0] for k in self.keys])
+        )
+
+    def format(self, sample):
+        """
+        Format the derived source with sample attributes
+
+        If the values are missing the key is wrapped in curly braces.
+        This is intended to preserve the environment variables specified
+        using curly braces notation, for example: "${ENVVAR}/{sample_attr}"
+        would result in "${ENVVAR}/populated" rather than a KeyError.
+
+        :param Mapping sample: attributes to format the source with
+        :raise InvalidSampleTableFileException: if after merging
+            subannotations the lengths of multi-value attrs are not even
+        :return list[str]: formatted source string(s)
+        """
+        if not self.keys:
+            return [self.expanded]
+        if "$" in self.expanded:
+            _LOGGER.warning(
+                "Not all environment variables were populated "
+                "in derived attribute source: {}".format(self.expanded)
+            )
+        items = {}
+        for field in self.fields:
+            try:
+                items[field] = sample[field]
+            except KeyError:
+                continue
+        attr_lens = [
+            len(v) for k, v in items.items() if (isinstance(v, list) and k in self.keys)
+        ]
+        if not bool(attr_lens):
+            return [self.expanded.format_map(SafeDict(items))]
+        if len(set(attr_lens)) != 1:
+            msg = (
+                "All attributes to format the {} ({}) have to be the "
+                "same length, got: {}. Correct your {}".format(
+                    DERIVED_SOURCES_KEY, self.expanded, attr_lens, SAMPLE_SHEET_KEY
+                )
+            )
+            raise InvalidSampleTableFileException(msg)
+        vals = []
+        for i in range(0, attr_lens[0]):
+            items_cpy = cp(items)
+            for k in self.keys:
+                if isinstance(items_cpy[k], list):
+                    items_cpy[k] = items_cpy[k][i]
+            vals.append(self.expanded.format_map(SafeDict(items_cpy)))
+        return vals
+
+
+class LazyDerivedAttribute:
+    """
+    Placeholder for a derived sample attribute that is resolved on first access.
+
+    :param Mapping data_sources: mapping from source key to source template
+    :param str source_key: the derived attribute's source key
+    """
+
+    __slots__ = ("data_sources", "source_key")
+
+    def __init__(self, data_sources, source_key):
+        self.data_sources = data_sources
+        self.source_key = source_key
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({self.source_key})>"
+
+
+def compile_derived_sources(data_sources):
+    """
+    Parse the derived attribute sources so they can be reused for every sample
+
+    Sources that cannot be parsed are kept as they are, so that the error is
+    reported for every sample that refers to them, as before.
+
+    :param Mapping data_sources: mapping from source key to source template
+    :return Mapping: mapping from source key to DerivedSourceTemplate
+    """
+    if not isinstance(data_sources, Mapping):
+        return data_sources
+    compiled = {}
+    for key, template in data_sources.items():
+        try:
+            compiled[key] = DerivedSourceTemplate(template)
+        except Exception:
+            compiled[key] = template
+    return compiled
+
+
+def _project_ref(prj):
+    """
+    Get a weak reference to the project, so that an object the project
+    holds does not form a reference cycle with it
+
+    :param peppy.Project | Mapping prj: project to refer to
+    :return weakref.ref | Mapping: weak reference to the project, or the
+        project itself if it cannot be weakly referenced, e.g. a dict, or if
+        it is kept alive by the samples that outlived it
+    """
+    if getattr(prj, "_held_by_samples", False):
+        return prj
+    try:
+        return weakref.ref(prj)
+    except TypeError:
+        return prj
+
+
+# attribute values that can be modified in place; the private attributes
+# are always replaced instead
+_MUTABLE_TYPES = frozenset([list, dict, set])
+
+
+def _copy_value(value):
+    """
+    Copy the mutable containers of an attribute value, sharing the rest
+
+    :param value: attribute value to copy
+    :return: copy of the value
+    """
+    if type(value) is list:
+        return [_copy_value(v) for v in value]
+    if type(value) is dict:
+        return {k: _copy_value(v) for k, v in value.items()}
+    if type(value) is set:
+        return set(value)
+    return value
+
+
+def has_glob_patterns(patterns):
+    """
+    Check whether any of the patterns requires pathname expansion
+
+    :param Iterable[str] patterns: patterns to check
+    :return bool: whether expanding the patterns involves filesystem access
+    """
+    return any("*" in p or "[" in p for p in patterns)
+
+
+def glob_derived_patterns(patterns):
+    """
+    Perform unix style pathname pattern expansion for multiple patterns
+
+    :param Iterable[str] patterns: patterns to expand
+    :return str | MultiValue: expanded pattern(s)
+    """
+    outputs = []
+    for p in patterns:
+        if "*" in p or "[" in p:
+            _LOGGER.debug("Pre-glob: {}".format(p))
+            val_globbed = sorted(glob.glob(p))
+            if not val_globbed:
+                _LOGGER.debug("No files match the glob: '{}'".format(p))
+            else:
+                p = val_globbed
+                _LOGGER.debug("Post-glob: {}".format(p))
+
+        outputs.extend(p if isinstance(p, list) else [p])
+    return MultiValue(outputs) if len(outputs) > 1 else outputs[0]
+
+
+def _obj2dict(obj, name=None):
+    """
+    Build representation of object as a dict, recursively
+    for all objects that might be sample attributes.
+
+    :param object obj: what to serialize to write to YAML.
+    :param str name: name of the object to represent.
+    :param Iterable[str] to_skip: names of attributes to ignore.
+    """
+    if name:
+        _LOGGER.log(5, "Converting to dict: {name}")
+    if isinstance(obj, list):
+        return [_obj2dict(i) for i in obj]
+    elif isinstance(obj, Mapping):
+        return {
+            k: _obj2dict(v, name=k) for k, v in obj.items() if not k.startswith("_")
+        }
+    if isinstance(obj, set):
+        return [_obj2dict(i) for i in obj]
+    elif isinstance(obj, Series):
+        _LOGGER.warning("Serializing series as mapping, not array-like")
+        return obj.to_dict()
+    elif hasattr(obj, "dtype"):  # numpy data types
+        # TODO: this fails with ValueError for multi-element array.
+        return obj.item()
+    elif isnull(obj):
+        # Missing values as evaluated by pandas.isnull().
+        # This gets correctly written into yaml.
+        return None
+    else:
+        return obj
+
+
+class SampleSchema:
+    """
+    Attribute layout shared by all samples that have the same attributes,
+    set in the same order; the samples only store the attribute values.
+
+    Samples created from one table go through the same layouts, so they share
+    the schema objects instead of each holding a dict of its own.
+
+    :param tuple[str] keys: attribute names, in order
+    """
+
+    __slots__ = ("keys", "slots", "_extended", "_parent", "_prefixes", "__weakref__")
+    _schemas = weakref.WeakValueDictionary()
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.slots = {key: slot for slot, key in enumerate(keys)}
+        self._extended = {}
+        self._parent = None
+        self._prefixes = {}
+
+    @classmethod
+    def for_keys(cls, keys):
+        """
+        Get the schema for the attribute names
+
+        :param Iterable[str] keys: attribute names, in order
+        :return SampleSchema: schema shared by all samples with these attributes
+        """
+        keys = tuple(keys)
+        schema = cls._schemas.get(keys)
+        if schema is None:
+            schema = cls(keys)
+            cls._schemas[keys] = schema
+        return schema
+
+    def __reduce__(self):
+        return self.__class__.for_keys, (self.keys,)
+
+    def with_key(self, key):
+        """
+        Get the schema with an attribute added at the end
+
+        :param str key: name of the attribute to add
+        :return SampleSchema: extended schema
+        """
+        try:
+            return self._extended[key]
+        except KeyError:
+            schema = self._extended[key] = self.for_keys(self.keys + (key,))
+            # keep the layouts the samples go through while they are used
+            schema._parent = schema._parent or self
+            return schema
+
+    def prefix(self, length):
+        """
+        Get the first attribute names, shared by all samples with this schema
+
+        :param int length: number of attribute names to get
+        :return tuple[str]: attribute names
+        """
+        try:
+            return self._prefixes[length]
+        except KeyError:
+            return self._prefixes.setdefault(length, self.keys[:length])
+
+    def without_key(self, key):
+        """
+        Get the schema with an attribute removed
+
+        :param str key: name of the attribute to remove
+        :return SampleSchema: reduced schema
+        """
+        return self.for_keys(k for k in self.keys if k != key)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}({', '.join(map(str, self.keys))})>"
+
+
+# the layout every sample starts with
+_EMPTY_SCHEMA = SampleSchema.for_keys(())
+
+
+class _SampleAttributes(MutableMapping):
+    """
+    Mapping view of a sample's attributes that bypasses the sample's
+    bookkeeping, like lazy derivation and edit tracking
+
+    :param peppy.Sample sample: sample to view
+    """
+
+    __slots__ = ("_sample",)
+
+    def __init__(self, sample):
+        self._sample = sample
+
+    def __getitem__(self, key):
+        return self._sample._get_raw(key)
+
+    def __setitem__(self, key, value):
+        self._sample._set_raw(key, value)
+
+    def __delitem__(self, key):
+        self._sample._del_raw(key)
+
+    def __iter__(self):
+        return iter(self._sample._schema.keys)
+
+    def __len__(self):
+        return len(self._sample._values)
+
+    def __contains__(self, key):
+        return key in self._sample._schema.slots
+
+
+class _SampleRow(Sequence):
+    """
+    Values of a sample that are read from a column store shared with
+    other samples
+
+    :param list[tuple[Sequence, bool]] columns: a column per schema slot,
+        and whether the column is indexed by the table row or by the
+        sample's position in the store
+    :param int row: sample table row of the sample
+    :param int index: position of the sample in the store
+    """
+
+    __slots__ = ("_columns", "_row", "_index")
+
+    def __init__(self, columns, row, index):
+        self._columns = columns
+        self._row = row
+        self._index = index
+
+    def __getitem__(self, slot):
+        column, by_row = self._columns[slot]
+        return column[self._row if by_row else self._index]
+
+    def __iter__(self):
+        for column, by_row in self._columns:
+            yield column[self._row if by_row else self._index]
+
+    def __len__(self):
+        return len(self._columns)
+
+
+class _CopiedValues(Sequence):
+    """
+    Values of a sample bound to another project than the values it reads,
+    such as the ones of the sample it was copied from, which neither sample
+    modifies in place
+
+    :param Sequence values: values of the copied sample
+    :param int slot: schema slot of the project reference
+    :param weakref.ref | Mapping prj: reference to the copy's project
+    """
+
+    __slots__ = ("_base", "_slot", "_project")
+
+    def __init__(self, values, slot, prj):
+        if type(values) is _CopiedValues:
+            values = values._base
+        self._base = values
+        self._slot = slot
+        self._project = prj
+
+    def __getitem__(self, slot):
+        return self._project if slot == self._slot else self._base[slot]
+
+    def __iter__(self):
+        for slot, value in enumerate(self._base):
+            yield self._project if slot == self._slot else value
+
+    def __len__(self):
+        return len(self._base)
+
+
+class _RepeatedValue(Sequence):
+    """
+    Column of a value that all the samples of a column store share
+
+    :param object value: value of every sample
+    :param int length: number of samples
+    """
+
+    __slots__ = ("_value", "_length")
+
+    def __init__(self, value, length):
+        self._value = value
+        self._length = length
+
+    def __getitem__(self, index):
+        if index >= self._length:
+            raise IndexError("column index out of range")
+        return self._value
+
+    def __iter__(self):
+        return repeat(self._value, self._length)
+
+    def __len__(self):
+        return self._length
+
+
+class SampleRows:
+    """
+    Column store of the values of the samples that share a schema
+
+    Attributes that the sample table holds the very same values of are read
+    from the table columns, which covers all the public attributes the
+    sample modifiers set. A value that all the samples share, like the
+    project reference, is stored once. The other attributes, e.g. the
+    private bookkeeping ones that differ between the samples, are kept in
+    a list per attribute. Each sample still has a small view object that
+    points at its row.
+
+    :param SampleSchema schema: schema of the samples
+    :param pandas.DataFrame table: sample table with a row per sample
+    """
+
+    __slots__ = ("schema", "columns", "_table")
+
+    def __init__(self, schema, table):
+        self.schema = schema
+        self.columns = []
+        self._table = table
+
+    @classmethod
+    def from_samples(cls, samples, table):
+        """
+        Make the samples read their values from column stores instead of
+        holding them; a sample gets its own values back when it is written to
+
+        :param Sequence[peppy.Sample] samples: samples, in the table rows order
+        :param pandas.DataFrame table: sample table with a row per sample
+        :return list[SampleRows]: column stores, one per schema
+        """
+        # a shallow copy keeps the columns if the table is modified in place,
+        # but only if pandas copies the shared columns on write
+        table = table.copy(deep=not pandas_copy_on_write())
+        arrays = {}
+        groups = {}
+        for row, sample in enumerate(samples):
+            groups.setdefault(sample._schema, []).append(row)
+        stores = []
+        for schema, rows in groups.items():
+            store = cls(schema, table)
+            for slot, key in enumerate(schema.keys):
+                values = [samples[row]._values[slot] for row in rows]
+                array = arrays.get(key)
+                if array is None and isinstance(table.get(key), Series):
+                    array = arrays[key] = table[key].to_numpy(dtype=object, copy=False)
+                if array is not None and all(
+                    map(operator.is_, values, (array[row] for row in rows))
+                ):
+                    store.columns.append((array, True))
+                elif _is_repeated(key, values):
+                    store.columns.append((_RepeatedValue(values[0], len(rows)), False))
+                else:
+                    store.columns.append((values, False))
+            for index, row in enumerate(rows):
+                object.__setattr__(
+                    samples[row], "_values", _SampleRow(store.columns, row, index)
+                )
+            stores.append(store)
+        return stores
+
+
+def _is_repeated(key, values):
+    """
+    Check whether the samples can share a single value of an attribute
+
+    The samples share the value if they have the very same one, or an equal
+    one of a private attribute, which is replaced rather than modified.
+
+    :param str key: name of the attribute
+    :param list values: values of the attribute of the samples
+    :return bool: whether the values can be stored once
+    """
+    first = values[0]
+    if all(map(operator.is_, values, repeat(first))):
+        return True
+    return key.startswith("_") and all(value == first for value in values)
+
+
 class Sample(SimpleAttMap):
     """
     Class to model Samples based on a pandas Series.
@@ -39,6 +633,11 @@ class Sample(SimpleAttMap):
     :param Mapping | pandas.core.series.Series series: Sample's data.
     """
 
+    # the attribute names are kept in a schema shared with other samples,
+    # the sample itself only holds the values; a sample store refers to
+    # the samples it has handed out weakly
+    __slots__ = ("_schema", "_values", "__weakref__")
+
     def __init__(self, series, prj=None):
         super(Sample, self).__init__()
 
@@ -51,7 +650,7 @@ class Sample(SimpleAttMap):
         except (AttributeError, KeyError):
             data_proj = None
 
-        self.update(**data)
+        self._set_state(dict(**data))
 
         if data_proj and PRJ_REF not in self:
             self[PRJ_REF] = data_proj
@@ -72,8 +671,191 @@ class Sample(SimpleAttMap):
 
             if not isinstance(self[PRJ_REF], Mapping):
                 raise TypeError(f"{prefix}; got {type(self[PRJ_REF]).__name__}")
-        self._derived_cols_done = []
-        self._attributes = list(series.keys())
+        self._set_raw("_derived_cols_done", ())
+        attributes = tuple(series.keys())
+        # samples created from the same table share the names
+        prefix = self._schema.prefix(len(attributes))
+        self._set_raw("_attributes", prefix if prefix == attributes else attributes)
+
+    @classmethod
+    def _from_state(cls, state, prj=None):
+        """
+        Restore a Sample from its attributes, as returned by _get_state
+
+        :param dict state: sample attributes, including the private ones
+        :param peppy.Project prj: project to bind the sample to
+        :return peppy.Sample: restored sample
+        """
+        sample = cls.__new__(cls)
+        sample._set_state(state)
+        if prj is not None:
+            sample._set_raw(PRJ_REF, prj)
+        return sample
+
+    @classmethod
+    def _from_values(cls, schema, values, prj=None):
+        """
+        Create a Sample from its attribute values, as laid out by the schema
+
+        :param SampleSchema schema: layout of the sample attributes
+        :param list values: attribute values, including the private ones;
+            the project reference among them is replaced
+        :param peppy.Project prj: project to bind the sample to
+        :return peppy.Sample: created sample
+        """
+        sample = cls.__new__(cls)
+        if PRJ_REF in schema.slots:
+            values[schema.slots[PRJ_REF]] = None if prj is None else _project_ref(prj)
+        object.__setattr__(sample, "_schema", schema)
+        object.__setattr__(sample, "_values", values)
+        return sample
+
+    def copy(self):
+        """
+        Copy the sample
+
+        The copy shares the project and the attribute values with this
+        sample, copy-on-write: whichever sample is written to first gets its
+        own values. Only the mutable public attribute values, such as lists
+        set by the user, are copied up front, since they can be modified
+        in place.
+
+        :return peppy.Sample: copy of the sample
+        """
+        return self._copy()
+
+    def _copy(self, prj=None):
+        """
+        Copy the sample, optionally binding the copy to another project
+
+        :param peppy.Project prj: project to bind the copy to
+        :return peppy.Sample: copy of the sample
+        """
+        sample = self.__class__.__new__(self.__class__)
+        values = self._values
+        slot = self._schema.slots.get(PRJ_REF) if prj is not None else None
+        if not _MUTABLE_TYPES.isdisjoint(map(type, values)) and any(
+            type(v) in _MUTABLE_TYPES and not k.startswith("_")
+            for k, v in zip(self._schema.keys, values)
+        ):
+            values = [_copy_value(v) for v in values]
+            if slot is not None:
+                values[slot] = _project_ref(prj)
+        else:
+            if type(values) is list:
+                # shared from now on, so neither sample modifies it in place
+                values = tuple(values)
+                object.__setattr__(self, "_values", values)
+            if slot is not None:
+                values = _CopiedValues(values, slot, _project_ref(prj))
+        object.__setattr__(sample, "_schema", self._schema)
+        object.__setattr__(sample, "_values", values)
+        return sample
+
+    def _get_state(self):
+        """
+        Get all sample attributes, including the private ones,
+        without the project reference
+
+        :return dict: sample attributes
+        """
+        state = dict(zip(self._schema.keys, self._values))
+        if PRJ_REF in state:
+            state[PRJ_REF] = None
+        return state
+
+    def _set_state(self, attrs):
+        """
+        Replace all sample attributes, without any bookkeeping
+
+        :param Mapping attrs: sample attributes, including the private ones
+        """
+        schema = SampleSchema.for_keys(attrs.keys())
+        values = list(attrs.values())
+        if PRJ_REF in schema.slots:
+            slot = schema.slots[PRJ_REF]
+            values[slot] = _project_ref(values[slot])
+        object.__setattr__(self, "_schema", schema)
+        object.__setattr__(self, "_values", values)
+
+    def _get_raw(self, key):
+        value = self._values[self._schema.slots[key]]
+        if type(value) is weakref.ref:
+            # the project reference; None if the project is gone
+            return value()
+        if type(value) is _PackedValues:
+            return value.expand()
+        return value
+
+    def _own_values(self):
+        """
+        Get the sample's own values, copied from the column store or the
+        sample copy the sample reads them from, if any
+
+        :return list: values of the sample attributes
+        """
+        values = self._values
+        if type(values) is not list:
+            values = list(values)
+            object.__setattr__(self, "_values", values)
+        return values
+
+    def _trim(self):
+        """
+        Release the spare capacity of the sample's own values, and pack its
+        multi-valued attributes of strings, which are then read expanded
+        """
+        if type(self._values) is not list:
+            return
+        values = self._values.copy()
+        if MultiValue in map(type, values):
+            for slot, value in enumerate(values):
+                if type(value) is MultiValue:
+                    values[slot] = _pack_values(value)
+        object.__setattr__(self, "_values", values)
+
+    def _set_raw(self, key, value):
+        slot = self._schema.slots.get(key)
+        if key == PRJ_REF:
+            value = _project_ref(value)
+            if slot is not None and type(self._values) is not list:
+                # the shared values are not copied to bind the sample
+                values = _CopiedValues(self._values, slot, value)
+                object.__setattr__(self, "_values", values)
+                return
+        if slot is None:
+            values = self._own_values()
+            object.__setattr__(self, "_schema", self._schema.with_key(key))
+            values.append(value)
+        else:
+            self._own_values()[slot] = value
+
+    def _del_raw(self, key):
+        slot = self._schema.slots[key]
+        values = self._own_values()
+        object.__setattr__(self, "_schema", self._schema.without_key(key))
+        del values[slot]
+
+    @property
+    def _mapped_attr(self):
+        return _SampleAttributes(self)
+
+    @_mapped_attr.setter
+    def _mapped_attr(self, attrs):
+        self._set_state(attrs)
+
+    @property
+    def attributes(self):
+        """
+        Get a mapping view of the sample attributes as they are stored
+
+        The view is raw: the lazily derived attributes that have not been
+        accessed yet are LazyDerivedAttribute placeholders, and the edits
+        made through it are not reported to the project.
+
+        :return MutableMapping: view of the sample attributes
+        """
+        return self._mapped_attr
 
     def get_sheet_dict(self):
         """
@@ -95,46 +877,35 @@ class Sample(SimpleAttMap):
             Sample object should be included in the YAML representation
         :return dict: dict representation of this Sample
         """
-
-        def _obj2dict(obj, name=None):
-            """
-            Build representation of object as a dict, recursively
-            for all objects that might be attributes of self.
-
-            :param object obj: what to serialize to write to YAML.
-            :param str name: name of the object to represent.
-            :param Iterable[str] to_skip: names of attributes to ignore.
-            """
-            if name:
-                _LOGGER.log(5, "Converting to dict: {name}")
-            if isinstance(obj, list):
-                return [_obj2dict(i) for i in obj]
-            elif isinstance(obj, Mapping):
-                return {
-                    k: _obj2dict(v, name=k)
-                    for k, v in obj.items()
-                    if not k.startswith("_")
-                }
-            if isinstance(obj, set):
-                return [_obj2dict(i) for i in obj]
-            elif isinstance(obj, Series):
-                _LOGGER.warning("Serializing series as mapping, not array-like")
-                return obj.to_dict()
-            elif hasattr(obj, "dtype"):  # numpy data types
-                # TODO: this fails with ValueError for multi-element array.
-                return obj.item()
-            elif isnull(obj):
-                # Missing values as evaluated by pandas.isnull().
-                # This gets correctly written into yaml.
-                return None
-            else:
-                return obj
-
         serial = _obj2dict(self)
         if add_prj_ref:
             serial.update({"prj": grab_project_data(self[PRJ_REF])})
         return serial
 
+    def _table_dict(self):
+        """
+        Serialize the sample as a sample table row
+
+        Unlike in to_dict, the read-only multi-valued attributes of strings
+        are not converted to lists, but shared with the sample, unless it
+        stores them packed.
+
+        :return dict: sample table row of this Sample
+        """
+        return {k: self._table_value(k) for k in self if not k.startswith("_")}
+
+    def _table_value(self, key):
+        """
+        Get the value of an attribute as it is put in the sample table
+
+        :param str key: name of the attribute
+        :return: sample table cell value of the attribute
+        """
+        value = self[key]
+        if type(value) is MultiValue and all(type(i) is str for i in value):
+            return value
+        return _obj2dict(value, name=key)
+
     def to_yaml(
         self, path: Optional[str] = None, add_prj_ref=False
     ) -> Union[str, None]:
@@ -176,97 +947,40 @@ class Sample(SimpleAttMap):
         variables (encoded by "{variable}"") with sample attributes.
 
         :param Mapping data_sources: mapping from key name (as a value in
-            a cell of a tabular data structure) to, e.g., filepath
+            a cell of a tabular data structure) to, e.g., filepath; the
+            values may be precompiled DerivedSourceTemplate objects
         :param str attr_name: Name of sample attribute
             (equivalently, sample sheet column) specifying a derived column.
         :return str: regex expansion of data source specified in configuration,
             with variable substitutions made
         :raises ValueError: if argument to data_sources parameter is null/empty
         """
+        patterns = self._format_derived_source(data_sources, attr_name)
+        if not isinstance(patterns, list):
+            return patterns
+        return glob_derived_patterns(patterns)
 
-        def _format_regex(regex, items):
-            """
-            Format derived source with object attributes
-
-            :param str regex: string to format,
-                e.g. {identifier}{file_id}_data.txt
-            :param Iterable[Iterable[Iterable | str]] items: items to format
-                the string with
-            :raise InvalidSampleTableFileException: if after merging
-                subannotations the lengths of multi-value attrs are not even
-            :return Iterable | str: formatted regex string(s)
-            """
-            keys = [i[1] for i in Formatter().parse(regex) if i[1] is not None]
-            if not keys:
-                return [regex]
-            if "$" in regex:
-                _LOGGER.warning(
-                    "Not all environment variables were populated "
-                    "in derived attribute source: {}".format(regex)
-                )
-            attr_lens = [
-                len(v) for k, v in items.items() if (isinstance(v, list) and k in keys)
-            ]
-            if not bool(attr_lens):
-                return [_safe_format(regex, items)]
-            if len(set(attr_lens)) != 1:
-                msg = (
-                    "All attributes to format the {} ({}) have to be the "
-                    "same length, got: {}. Correct your {}".format(
-                        DERIVED_SOURCES_KEY, regex, attr_lens, SAMPLE_SHEET_KEY
-                    )
-                )
-                raise InvalidSampleTableFileException(msg)
-            vals = []
-            for i in range(0, attr_lens[0]):
-                items_cpy = cp(items)
-                for k in keys:
-                    if isinstance(items_cpy[k], list):
-                        items_cpy[k] = items_cpy[k][i]
-                vals.append(_safe_format(regex, items_cpy))
-            return vals
-
-        def _safe_format(s, values):
-            """
-            Safely format string.
-
-            If the values are missing the key is wrapped in curly braces.
-            This is intended to preserve the environment variables specified
-            using curly braces notation, for example: "${ENVVAR}/{sample_attr}"
-            would result in "${ENVVAR}/populated" rather than a KeyError.
-
-            :param str s: string with curly braces placeholders to populate
-            :param Mapping values: key-value pairs to pupulate string with
-            :return str: populated string
-            """
-            return Formatter().vformat(s, (), SafeDict(values))
-
-        def _glob_regex(patterns):
-            """
-            Perform unix style pathname pattern expansion for multiple patterns
-
-            :param Iterable[str] patterns: patterns to expand
-            :return str | Iterable[str]: expanded patterns
-            """
-            outputs = []
-            for p in patterns:
-                if "*" in p or "[" in p:
-                    _LOGGER.debug("Pre-glob: {}".format(p))
-                    val_globbed = sorted(glob.glob(p))
-                    if not val_globbed:
-                        _LOGGER.debug("No files match the glob: '{}'".format(p))
-                    else:
-                        p = val_globbed
-                        _LOGGER.debug("Post-glob: {}".format(p))
-
-                outputs.extend(p if isinstance(p, list) else [p])
-            return outputs if len(outputs) > 1 else outputs[0]
+    def _format_derived_source(self, data_sources, attr_name, source_key=None):
+        """
+        Populate the derived attribute source with sample attributes,
+        without expanding the resulting glob patterns.
 
+        :param Mapping data_sources: mapping from key name to source template
+        :param str attr_name: Name of sample attribute specifying a derived column.
+        :param str source_key: source key of the derived attribute, if it is
+            not the attribute's current value
+        :return list[str] | str | None: formatted source pattern(s);
+            an empty string if the source is not declared or None if the
+            source could not be formatted
+        """
         if not data_sources:
             return None
-        sn = self[SAMPLE_NAME_ATTR] if SAMPLE_NAME_ATTR in self else "this sample"
+        sn = self.get(SAMPLE_NAME_ATTR, "this sample")
+        attrs = self
+        if source_key is not None:
+            attrs = ChainMap({attr_name: source_key}, self)
         try:
-            source_key = self[attr_name]
+            source_key = attrs[attr_name]
         except AttributeError:
             reason = (
                 "'{attr}': to locate sample's derived attribute source, "
@@ -288,25 +1002,126 @@ class Sample(SimpleAttMap):
             return ""
         deriv_exc_base = (
             f"In sample '{sn}' cannot correctly parse derived "
-            f"attribute source: {regex}."
+            f"attribute source: {getattr(regex, 'template', regex)}."
         )
         try:
-            expanded_regex = os.path.expandvars(regex)
-            vals = _format_regex(expanded_regex, dict(self.items()))
+            if not isinstance(regex, DerivedSourceTemplate):
+                regex = DerivedSourceTemplate(regex)
+            vals = regex.format(attrs)
             _LOGGER.debug("Formatted regex: {}".format(vals))
         except KeyError as ke:
             _LOGGER.warning(f"{deriv_exc_base} Can't access {str(ke)} attribute")
         except Exception as e:
             _LOGGER.warning(f"{deriv_exc_base} Caught exception: {str(e)}")
         else:
-            return _glob_regex(vals)
+            return vals
         return None
 
+    def __getitem__(self, item):
+        value = self._values[self._schema.slots[item]]
+        if isinstance(value, LazyDerivedAttribute):
+            value = self._resolve_derived_attribute(item, value)
+        elif type(value) is weakref.ref:
+            value = value()
+        elif type(value) is _PackedValues:
+            value = value.expand()
+        return value
+
+    def __setitem__(self, item, value):
+        self._try_touch_samples(item)
+        self._set_raw(item, value)
+
+    def __delitem__(self, key):
+        self._del_raw(key)
+        self._try_touch_samples(key)
+
+    def __iter__(self):
+        return iter(self._schema.keys)
+
+    def __contains__(self, key):
+        return key in self._schema.slots
+
+    def __setattr__(self, item, value):
+        self[item] = value
+
+    def __getattr__(self, item):
+        if item in Sample.__slots__:
+            # not initialized yet, e.g. while unpickling
+            raise AttributeError(item)
+        return super(Sample, self).__getattr__(item)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sample):
+            return NotImplemented
+        if self._schema.slots.keys() != other._schema.slots.keys():
+            return False
+        for key in self._schema.keys:
+            if self._excl_from_eq(key):
+                continue
+            value, other_value = self._get_raw(key), other._get_raw(key)
+            if value is other_value:
+                continue
+            # the lazily derived attributes are compared by their values,
+            # which are not stored, so comparing does not change the samples
+            if (
+                isinstance(value, LazyDerivedAttribute)
+                and isinstance(other_value, LazyDerivedAttribute)
+                and value.source_key == other_value.source_key
+                and value.data_sources is other_value.data_sources
+            ):
+                continue
+            if isinstance(value, LazyDerivedAttribute):
+                value = self._derived_value(key, value)
+            if isinstance(other_value, LazyDerivedAttribute):
+                other_value = other._derived_value(key, other_value)
+            if not value == other_value:
+                return False
+        return True
+
+    def _derived_value(self, attr_name, placeholder):
+        """
+        Derive the value of a lazily derived attribute, without storing it
+
+        :param str attr_name: name of the derived attribute
+        :param LazyDerivedAttribute placeholder: the attribute's placeholder
+        :return str | list[str]: derived value, or the source key if the
+            source does not yield a value
+        """
+        patterns = self._format_derived_source(
+            placeholder.data_sources, attr_name, placeholder.source_key
+        )
+        if isinstance(patterns, list):
+            patterns = glob_derived_patterns(patterns)
+        return patterns or placeholder.source_key
+
+    def _resolve_derived_attribute(self, attr_name, placeholder):
+        """
+        Derive the attribute value in place of its placeholder
+
+        :param str attr_name: name of the derived attribute
+        :param LazyDerivedAttribute placeholder: the attribute's placeholder
+        :return str | list[str]: derived value, or the source key if the
+            source does not yield a value
+        """
+        self._set_raw(attr_name, self._derived_value(attr_name, placeholder))
+        return self._get_raw(attr_name)
+
+    def materialize_derived(self):
+        """
+        Resolve all lazily derived attributes of this sample
+        """
+        for attr_name, value in list(zip(self._schema.keys, self._values)):
+            if isinstance(value, LazyDerivedAttribute):
+                self._resolve_derived_attribute(attr_name, value)
+
     @property
     def project(self):
         """
         Get the project mapping
 
+        The sample refers to the project weakly while the project holds it;
+        a project whose samples outlive it is kept alive by them.
+
         :return peppy.Project: project object the sample was created from
         """
         return self[PRJ_REF]
@@ -316,21 +1131,28 @@ class Sample(SimpleAttMap):
         """
         Get the sample's name
 
-        :return str: current sample name derived from project's st_index
+        :return str | tuple: current sample name derived from project's
+            st_index, or the sample_name attribute of a sample without
+            a project; None if the sample lacks it
         """
+        index = getattr(self[PRJ_REF], "st_index", None) or SAMPLE_NAME_ATTR
+        if isinstance(index, str):
+            return self.get(index)
+        return tuple(self.get(attr) for attr in index)
 
-        return self[self[PRJ_REF].st_index]
-
-    # The __reduce__ function provides an interface for
-    # correct object serialization with the pickle module.
     def __reduce__(self):
-        return (
-            self.__class__,
-            (pd.Series(self.to_dict()),),
-            # (None, {}),
-            # iter([]),
-            # iter({PRJ_REF: self[PRJ_REF]}.items()),
-        )
+        """
+        Pickle the sample attributes as they are, so that unpickling restores
+        the sample without processing it again
+
+        The sample refers to the project weakly, so the project is not
+        pickled along with it; an unpickled project binds its samples.
+        """
+        values = list(self._values)
+        slot = self._schema.slots.get(PRJ_REF)
+        if slot is not None:
+            values[slot] = None
+        return self.__class__._from_values, (self._schema, values)
 
     def __len__(self):
         return len(self.to_dict())
@@ -375,7 +1197,7 @@ class Sample(SimpleAttMap):
 
     def _excl_from_eq(self, k):
         """Exclude the Project reference from object comparison."""
-        return k == PRJ_REF or super(Sample, self)._excl_from_eq(k)
+        return k == PRJ_REF
 
     def _excl_from_repr(self, k, cls):
         """Exclude the Project reference from representation."""
@@ -385,11 +1207,19 @@ class Sample(SimpleAttMap):
         """Exclude pandas.DataFrame from dict representation"""
         return (pd.DataFrame,)
 
-    def _try_touch_samples(self):
+    def _try_touch_samples(self, attr=None):
         """
         Safely sets sample edited flag to true
+
+        If the project records the edits, the edited attribute is reported instead.
+
+        :param str attr: name of the edited attribute
         """
         try:
-            self[PRJ_REF][SAMPLE_EDIT_FLAG_KEY] = True
+            prj = self[PRJ_REF]
+            if hasattr(prj, "_record_sample_edit"):
+                prj._record_sample_edit(self, attr)
+            else:
+                prj[SAMPLE_EDIT_FLAG_KEY] = True
         except (KeyError, AttributeError, TypeError):
             pass
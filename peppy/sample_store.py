@@ -0,0 +1,601 @@
+""" Storage of the processed samples outside of the Sample objects """
+
+import io
+import os
+import pickle
+import sqlite3
+import struct
+import sys
+import tempfile
+import weakref
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from functools import partial
+from logging import getLogger
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from .const import PKG_NAME, SAMPLE_CACHE_SIZE, SAMPLE_NAME_ATTR
+from .sample import Sample, SampleSchema, _project_ref
+
+_LOGGER = getLogger(PKG_NAME)
+
+# name of the table the samples are kept in, so that the tables of
+# a database the user supplied are left alone
+_TABLE = "peppy_samples"
+
+# number of values bound to a single lookup query
+_QUERY_CHUNK = 500
+
+# offsets of a frozen sample record and of the one that follows it
+_RECORD_BOUNDS = struct.Struct("=2q")
+
+# sizes of the sections of a shared memory block holding frozen samples
+_SHARED_HEADER = struct.Struct("=3q")
+
+
+class SampleStore(Sequence):
+    """
+    Samples kept in a SQLite database, indexed by the sample table index,
+    with only the most recently used ones kept in memory.
+
+    The samples are read from the database when they are requested and not
+    in memory already. Edited samples are written back when they are evicted
+    from the cache or before the database is queried. A sample object stays
+    the one the store returns for as long as it is referenced elsewhere.
+
+    :param str path: path to the database file; a temporary file, removed
+        when the store is closed, is used if not set. The samples are kept
+        in a table of their own, the other tables of the database are kept
+    :param int cache_size: number of the recently used samples kept in memory
+    :param str index: name of the attribute to look the samples up by
+    :param peppy.Project prj: project to bind the samples read from the
+        database to
+    """
+
+    def __init__(
+        self, path=None, cache_size=SAMPLE_CACHE_SIZE, index=SAMPLE_NAME_ATTR, prj=None
+    ):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="peppy_samples_", suffix=".sqlite")
+            os.close(fd)
+            temporary = True
+        else:
+            temporary = False
+        self.path = path
+        self.cache_size = max(int(cache_size), 1)
+        self.index = index
+        self._project = _project_ref(prj)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA synchronous = OFF")
+        self._connection.execute("PRAGMA journal_mode = MEMORY")
+        self._ids = array("q")
+        self._next_id = 0
+        self._cache = OrderedDict()
+        self._dirty = set()
+        # samples that are referenced outside of the store, by their ids
+        self._alive = weakref.WeakValueDictionary()
+        self._sample_ids = {}
+        self._finalizer = weakref.finalize(
+            self, _close_database, self._connection, path if temporary else None
+        )
+        self.clear()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self._load(self._ids[item])
+        return self._load([self._ids[item]])[0]
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({len(self)} samples in {self.path})"
+
+    def chunks(self, size=None):
+        """
+        Iterate over the samples in lists of at most the cache size
+
+        :param int size: number of samples in a chunk, the cache size by default
+        :return Iterable[list[peppy.Sample]]: chunks of samples, in order
+        """
+        size = size or self.cache_size
+        for start in range(0, len(self._ids), size):
+            yield self._load(self._ids[start : start + size])
+
+    def clear(self):
+        """
+        Remove all samples from the store
+        """
+        self._connection.execute(f"DROP TABLE IF EXISTS {_TABLE}")
+        self._connection.execute(
+            f"CREATE TABLE {_TABLE} (id INTEGER PRIMARY KEY, name, state BLOB)"
+        )
+        self._connection.execute(f"CREATE INDEX {_TABLE}_name ON {_TABLE} (name)")
+        self._connection.commit()
+        self._ids = array("q")
+        self._next_id = 0
+        self._cache.clear()
+        self._dirty.clear()
+        self._alive = weakref.WeakValueDictionary()
+        self._sample_ids = {}
+
+    def close(self):
+        """
+        Close the database; a temporary one is removed
+        """
+        self._finalizer()
+
+    def append(self, sample):
+        """
+        Add a sample at the end of the store
+
+        :param peppy.Sample sample: sample to add
+        """
+        self.extend([sample])
+
+    def extend(self, samples):
+        """
+        Add samples at the end of the store
+
+        :param Iterable[peppy.Sample] samples: samples to add
+        """
+        rows = []
+        for sample in samples:
+            sample_id = self._next_id
+            self._next_id += 1
+            rows.append((sample_id, self._name(sample), _dump_sample(sample)))
+            self._ids.append(sample_id)
+            self._admit(sample_id, sample)
+        self._connection.executemany(
+            f"INSERT INTO {_TABLE} (id, name, state) VALUES (?, ?, ?)", rows
+        )
+        self._connection.commit()
+
+    def find(self, names):
+        """
+        Get the samples with any of the given index values
+
+        :param Iterable names: index values of the samples to get
+        :return list[peppy.Sample]: matching samples, in order
+        """
+        return self._load(self._find_ids(names))
+
+    def remove(self, names):
+        """
+        Remove the samples with any of the given index values
+
+        :param Iterable names: index values of the samples to remove
+        :return int: number of the removed samples
+        """
+        removed = set(self._find_ids(names))
+        if not removed:
+            return 0
+        self._connection.executemany(
+            f"DELETE FROM {_TABLE} WHERE id = ?", [(i,) for i in removed]
+        )
+        self._connection.commit()
+        self._ids = array("q", (i for i in self._ids if i not in removed))
+        self._dirty.difference_update(removed)
+        for sample_id in removed:
+            self._cache.pop(sample_id, None)
+            sample = self._alive.pop(sample_id, None)
+            if sample is not None:
+                self._sample_ids.pop(id(sample), None)
+        return len(removed)
+
+    def touch(self, sample):
+        """
+        Mark a sample of the store as edited, so that it is written back
+
+        :param peppy.Sample sample: edited sample
+        """
+        try:
+            ref, sample_id = self._sample_ids[id(sample)]
+        except KeyError:
+            return
+        if ref() is not sample:
+            return
+        self._dirty.add(sample_id)
+        if sample_id in self._cache:
+            self._cache.move_to_end(sample_id)
+        else:
+            self._admit(sample_id, sample)
+
+    def sync(self):
+        """
+        Write the edited samples back to the database
+        """
+        if not self._dirty:
+            return
+        self._connection.executemany(
+            f"UPDATE {_TABLE} SET name = ?, state = ? WHERE id = ?",
+            [
+                (self._name(sample), _dump_sample(sample), sample_id)
+                for sample_id, sample in self._cache.items()
+                if sample_id in self._dirty
+            ],
+        )
+        self._connection.commit()
+        self._dirty.clear()
+
+    def _name(self, sample):
+        """
+        Get the value of the sample's index attribute, as stored in the database
+
+        :param peppy.Sample sample: sample to get the index value of
+        :return str | int | float | None: index value
+        """
+        return _index_value(sample.get(self.index))
+
+    def _find_ids(self, names):
+        """
+        Get ids of the samples with any of the given index values
+
+        :param Iterable names: index values of the samples
+        :return list[int]: ids of the matching samples, in order
+        """
+        self.sync()
+        names = list(dict.fromkeys(_index_value(n) for n in names))
+        found = set()
+        for start in range(0, len(names), _QUERY_CHUNK):
+            chunk = names[start : start + _QUERY_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            query = f"SELECT id FROM {_TABLE} WHERE name IN ({placeholders})"
+            found.update(i for (i,) in self._connection.execute(query, chunk))
+        return sorted(found)
+
+    def _load(self, sample_ids):
+        """
+        Get the samples with the given ids, from memory if possible
+
+        :param Iterable[int] sample_ids: ids of the samples to get
+        :return list[peppy.Sample]: the samples, in the order of the ids
+        """
+        samples = {}
+        missing = []
+        for sample_id in sample_ids:
+            sample = self._cache.get(sample_id)
+            if sample is None:
+                sample = self._alive.get(sample_id)
+            if sample is None:
+                missing.append(sample_id)
+            else:
+                samples[sample_id] = sample
+        prj = self._project
+        if isinstance(prj, weakref.ref):
+            prj = prj()
+        for start in range(0, len(missing), _QUERY_CHUNK):
+            chunk = missing[start : start + _QUERY_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            query = f"SELECT id, state FROM {_TABLE} WHERE id IN ({placeholders})"
+            for sample_id, state in self._connection.execute(query, chunk):
+                samples[sample_id] = Sample._from_state(pickle.loads(state), prj=prj)
+        result = [samples[sample_id] for sample_id in sample_ids]
+        for sample_id, sample in zip(sample_ids, result):
+            self._admit(sample_id, sample)
+        return result
+
+    def _admit(self, sample_id, sample):
+        """
+        Put a sample into the cache, writing the evicted samples back
+        if they were edited
+
+        :param int sample_id: id of the sample
+        :param peppy.Sample sample: sample to cache
+        """
+        if self._cache.get(sample_id) is not sample:
+            self._cache[sample_id] = sample
+            self._alive[sample_id] = sample
+            key = id(sample)
+            self._sample_ids[key] = (
+                weakref.ref(sample, partial(_forget_sample, self._sample_ids, key)),
+                sample_id,
+            )
+        self._cache.move_to_end(sample_id)
+        if len(self._cache) <= self.cache_size:
+            return
+        evicted = []
+        while len(self._cache) > self.cache_size:
+            evicted.append(self._cache.popitem(last=False))
+        dirty = [(i, s) for i, s in evicted if i in self._dirty]
+        if dirty:
+            _LOGGER.debug(f"Writing {len(dirty)} edited samples to {self.path}")
+            self._connection.executemany(
+                f"UPDATE {_TABLE} SET name = ?, state = ? WHERE id = ?",
+                [(self._name(s), _dump_sample(s), i) for i, s in dirty],
+            )
+            self._connection.commit()
+            self._dirty.difference_update(i for i, _ in dirty)
+
+
+class FrozenSamples(Sequence):
+    """
+    Samples serialized into a single immutable buffer.
+
+    Neither is the buffer reference counted per sample nor is it tracked by
+    the garbage collector, so the processes forked once the samples are
+    frozen keep sharing the memory pages holding it. A new Sample object is
+    deserialized on every access. The lazily derived attributes are resolved
+    before the samples are serialized.
+
+    :param Iterable[peppy.Sample] samples: samples to freeze
+    :param str index: name of the attribute to look the samples up by
+    :param peppy.Project prj: project to bind the deserialized samples to
+    """
+
+    def __init__(self, samples, index=SAMPLE_NAME_ATTR, prj=None):
+        schemas = {}
+        buffer = io.BytesIO()
+        offsets = array("q", [0])
+        positions = {}
+        for position, sample in enumerate(samples):
+            # resolved once, rather than on every access in every process
+            sample.materialize_derived()
+            state = sample._get_state()
+            schema = schemas.setdefault(tuple(state), len(schemas))
+            pickle.dump(
+                (schema, list(state.values())),
+                buffer,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+            offsets.append(buffer.tell())
+            try:
+                positions.setdefault(state.get(index), []).append(position)
+            except TypeError:
+                # unhashable index values cannot be looked up
+                pass
+        # the offsets follow the records, so a single buffer holds the samples
+        self._offsets_at = buffer.tell()
+        buffer.write(offsets.tobytes())
+        self.index = index
+        self._project = _project_ref(prj)
+        self._buffer = buffer.getvalue()
+        self._base = 0
+        self._count = len(offsets) - 1
+        self._schemas = [SampleSchema.for_keys(keys) for keys in schemas]
+        # most names are unique, a plain position is stored for them
+        self._positions = {
+            name: found[0] if len(found) == 1 else tuple(found)
+            for name, found in positions.items()
+        }
+        self._positions_at = None
+        self._shared_memory = None
+
+    @classmethod
+    def attach(cls, name, prj=None):
+        """
+        Attach to the samples shared by another process with `share`
+
+        The samples are read from the shared memory block, which is not
+        copied; the index values are loaded on the first lookup.
+
+        :param str name: name of the shared memory block
+        :param peppy.Project prj: project to bind the deserialized samples to
+        :return (FrozenSamples, object): the samples and the state stored
+            along with them
+        """
+        if sys.version_info >= (3, 13):
+            shared_memory = SharedMemory(name=name, track=False)
+        else:
+            shared_memory = SharedMemory(name=name)
+        buffer = shared_memory.buf
+        state_size, positions_size, samples_size = _SHARED_HEADER.unpack_from(buffer)
+        start = _SHARED_HEADER.size
+        state = pickle.loads(buffer[start : start + state_size])
+        start += state_size
+        if sys.version_info < (3, 13) and os.name == "posix":
+            tracker = _tracker_pid()
+            if state["pid"] != os.getpid() and (
+                tracker is None or tracker != state["tracker"]
+            ):
+                # this process may have started a resource tracker of its own,
+                # which would remove the block when it shuts down, rather than
+                # leave it to the sharing process
+                resource_tracker.unregister("/" + shared_memory.name, "shared_memory")
+        samples = cls.__new__(cls)
+        samples.index = state["index"]
+        samples._project = _project_ref(prj)
+        # only the view of the block itself is kept, so that it can be closed
+        samples._buffer = buffer
+        samples._base = start + positions_size
+        samples._count = state["count"]
+        samples._offsets_at = samples_size - 8 * (samples._count + 1)
+        samples._schemas = [SampleSchema.for_keys(keys) for keys in state["schemas"]]
+        samples._positions = None
+        samples._positions_at = (start, start + positions_size)
+        samples._shared_memory = shared_memory
+        return samples, state["state"]
+
+    def share(self, state=None):
+        """
+        Copy the samples into a new shared memory block, which other processes
+        can attach to without copying or processing the samples again
+
+        The block is to be closed and unlinked by the caller once it is no
+        longer needed.
+
+        :param object state: picklable object to store along with the samples
+        :return multiprocessing.shared_memory.SharedMemory: the block holding
+            the samples
+        """
+        samples_size = self._offsets_at + 8 * (self._count + 1)
+        state = pickle.dumps(
+            {
+                "pid": os.getpid(),
+                "tracker": _tracker_pid(),
+                "index": self.index,
+                "count": self._count,
+                "schemas": [schema.keys for schema in self._schemas],
+                "state": state,
+            },
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        positions = pickle.dumps(self._index(), protocol=pickle.HIGHEST_PROTOCOL)
+        shared_memory = SharedMemory(
+            create=True,
+            size=_SHARED_HEADER.size + len(state) + len(positions) + samples_size,
+        )
+        buffer = shared_memory.buf
+        _SHARED_HEADER.pack_into(buffer, 0, len(state), len(positions), samples_size)
+        start = _SHARED_HEADER.size
+        for section in (
+            state,
+            positions,
+            memoryview(self._buffer)[self._base : self._base + samples_size],
+        ):
+            buffer[start : start + len(section)] = section
+            start += len(section)
+        return shared_memory
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        size = self._offsets_at + 8 * (self._count + 1)
+        state["_buffer"] = bytes(
+            memoryview(self._buffer)[self._base : self._base + size]
+        )
+        state["_base"] = 0
+        state["_positions"] = self._index()
+        state["_positions_at"] = None
+        state["_shared_memory"] = None
+        prj = self._project
+        state["_project"] = prj() if isinstance(prj, weakref.ref) else prj
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._project = _project_ref(self._project)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._load(p) for p in range(len(self))[item]]
+        return self._load(range(len(self))[item])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._load(position)
+
+    def __repr__(self):
+        size = self._offsets_at + 8 * (self._count + 1)
+        return f"{self.__class__.__name__}({len(self)} samples, {size} bytes)"
+
+    def find(self, names):
+        """
+        Get the samples with any of the given index values
+
+        :param Iterable names: index values of the samples to get
+        :return list[peppy.Sample]: matching samples, in order
+        """
+        index = self._index()
+        found = set()
+        for name in names:
+            positions = index.get(name, ())
+            found.update(positions if isinstance(positions, tuple) else [positions])
+        return [self._load(p) for p in sorted(found)]
+
+    def _load(self, position):
+        """
+        Deserialize the sample at the given position
+
+        :param int position: position of the sample
+        :return peppy.Sample: the sample
+        """
+        start, stop = _RECORD_BOUNDS.unpack_from(
+            self._buffer, self._base + self._offsets_at + 8 * position
+        )
+        schema, values = pickle.loads(
+            memoryview(self._buffer)[self._base + start : self._base + stop]
+        )
+        prj = self._project
+        if isinstance(prj, weakref.ref):
+            prj = prj()
+        return Sample._from_values(self._schemas[schema], values, prj=prj)
+
+    def _index(self):
+        """
+        Get the positions of the samples by their index values, loading them
+        from the shared memory block on the first lookup
+
+        :return dict: positions of the samples, or tuples of them,
+            by the index values
+        """
+        if self._positions is None:
+            start, stop = self._positions_at
+            self._positions = pickle.loads(self._buffer[start:stop])
+        return self._positions
+
+
+def _dump_sample(sample):
+    """
+    Serialize the sample attributes, without the project reference
+
+    :param peppy.Sample sample: sample to serialize
+    :return bytes: serialized sample
+    """
+    return pickle.dumps(sample._get_state(), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _index_value(value):
+    """
+    Convert an index value to a type SQLite can store and compare
+
+    :param object value: index value
+    :return str | int | float | None: storable index value
+    """
+    if hasattr(value, "item"):
+        # numpy scalars
+        value = value.item()
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def _forget_sample(sample_ids, key, ref):
+    """
+    Drop the id mapping of a sample that no longer exists
+
+    :param dict sample_ids: mapping the store keeps
+    :param int key: id of the sample
+    :param weakref.ref ref: the sample's reference that died
+    """
+    if sample_ids.get(key, (None,))[0] is ref:
+        del sample_ids[key]
+
+
+def _tracker_pid():
+    """
+    Get the process ID of the resource tracker of this process, which removes
+    the shared memory blocks registered with it when it shuts down
+
+    The resource tracker does not expose its process ID, so it is read from
+    a private attribute, if there is one.
+
+    :return int: process ID of the resource tracker, None if it is not known
+    """
+    if os.name != "posix" or sys.version_info >= (3, 13):
+        return None
+    resource_tracker.ensure_running()
+    return getattr(getattr(resource_tracker, "_resource_tracker", None), "_pid", None)
+
+
+def _close_database(connection, path):
+    """
+    Close the database connection and remove the file, if given
+
+    :param sqlite3.Connection connection: connection to close
+    :param str path: path to the database file to remove
+    """
+    connection.close()
+    if path is not None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -9,6 +9,8 @@ class SimpleAttMap(MutableMapping):
     In most cases used as SuperClass.
     """
 
+    __slots__ = ("_mapped_attr",)
+
     def __init__(self):
         super(SimpleAttMap, self).__init__()
         super(SimpleAttMap, self).__setattr__("_mapped_attr", {})
@@ -16,10 +18,11 @@ class SimpleAttMap(MutableMapping):
     def __delitem__(self, key):
         value = self[key]
         del self._mapped_attr[key]
+        self._try_touch_samples(key)
         self.pop(value, None)
 
     def __setitem__(self, item, value):
-        self._try_touch_samples()
+        self._try_touch_samples(item)
         self._mapped_attr[item] = value
 
     def __getitem__(self, item):
@@ -32,7 +35,7 @@ class SimpleAttMap(MutableMapping):
         return len(self._mapped_attr)
 
     def __contains__(self, key):
-        return key in list(self.keys())
+        return key in self._mapped_attr
 
     def __delattr__(self, key):
         del self[key]
@@ -42,7 +45,7 @@ class SimpleAttMap(MutableMapping):
 
     def __getattr__(self, item):
         try:
-            return self._mapped_attr[item]
+            return self[item]
         except KeyError:
             raise AttributeError(f"Attribute not found: {item}")
 
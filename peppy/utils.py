@@ -2,9 +2,11 @@
 
 import logging
 import os
+import warnings
 from typing import Dict, Mapping, Type, Union
 from urllib.request import urlopen
 
+import pandas as pd
 import yaml
 from ubiquerg import expandpath, is_url
 
@@ -15,6 +17,18 @@ _LOGGER = logging.getLogger(__name__)
 
 
 def copy(obj):
+    """
+    Class decorator adding a copy method that deep copies the object
+
+    Deprecated: peppy does not use it anymore; Project has a copy method
+    of its own.
+    """
+    warnings.warn(
+        "peppy.utils.copy is deprecated and will be removed in a future release",
+        DeprecationWarning,
+        stacklevel=2,
+    )
+
     def copy(self):
         """
         Copy self to a new object.
@@ -27,6 +41,23 @@ def copy(obj):
     return obj
 
 
+def pandas_copy_on_write():
+    """
+    Check whether pandas copies the data that data frames share when one of
+    them is modified in place, as it always does as of pandas 3.0
+
+    :return bool: whether shallow data frame copies are isolated from
+        in place modifications
+    """
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    try:
+        return pd.get_option("mode.copy_on_write") is True
+    except KeyError:
+        # the option was added in pandas 1.5
+        return False
+
+
 def make_abs_via_cfg(maybe_relpath, cfg_path, check_exists=False):
     """Ensure that a possibly relative path is absolute."""
     if not isinstance(maybe_relpath, str):
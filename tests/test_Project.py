@@ -1,23 +1,39 @@
 """ Classes for peppy.Project smoketesting """
 
+import gc
 import os
+import pickle
+import random
 import socket
+import sqlite3
 import tempfile
+import weakref
+from contextlib import closing, contextmanager
+from multiprocessing import resource_tracker
 
 import numpy as np
+import pandas
 import pytest
 from pandas import DataFrame
-from yaml import dump, safe_load
-import pickle
-
-from peppy import Project
-from peppy.const import SAMPLE_NAME_ATTR, SAMPLE_TABLE_FILE_KEY
+from yaml import dump, safe_dump, safe_load
+
+from peppy import Project, Sample
+from peppy.const import (
+    SAMPLE_DF_KEY,
+    SAMPLE_EDIT_FLAG_KEY,
+    SAMPLE_NAME_ATTR,
+    SAMPLE_TABLE_FILE_KEY,
+    SUBSAMPLE_DF_KEY,
+)
 from peppy.exceptions import (
     IllegalStateException,
     InvalidSampleTableFileException,
     MissingAmendmentError,
     RemoteYAMLError,
 )
+from peppy.sample import LazyDerivedAttribute, MultiValue, _PackedValues
+from peppy.utils import copy as copy_decorator
+from peppy.utils import pandas_copy_on_write
 
 __author__ = "Michal Stolarczyk"
 __email__ = "michal.stolarczyk@nih.gov"
@@ -41,6 +57,27 @@ EXAMPLE_TYPES = [
 ]
 
 
+@contextmanager
+def _copy_on_write_mode(enabled):
+    """
+    Run with the pandas copy-on-write mode enabled or disabled, or skip
+    the test if the installed pandas cannot run in that mode
+
+    :param bool enabled: whether pandas is to copy on write
+    """
+    if pandas_copy_on_write() is enabled:
+        yield
+        return
+    if int(pandas.__version__.split(".")[0]) >= 3:
+        pytest.skip("pandas always copies on write as of 3.0")
+    try:
+        pandas.get_option("mode.copy_on_write")
+    except KeyError:
+        pytest.skip("pandas lacks the copy-on-write mode")
+    with pandas.option_context("mode.copy_on_write", enabled):
+        yield
+
+
 def _get_pair_to_post_init_test(cfg_path):
     """
 
@@ -196,6 +233,23 @@ class TestProjectConstructor:
         # there are 4 rows in the table, but 1 sample has a duplicate
         assert len(p.samples) == 3
 
+    def test_automerge_many_duplicates(self):
+        """
+        Verify that all duplicated sample names are merged in a single pass
+        and merged samples follow the unique ones in order of first appearance
+        """
+        samples_df = DataFrame(
+            {
+                "sample_name": ["b", "a", "c", "b", "a", "b"],
+                "protocol": ["x", "x", "y", "x", "x", "x"],
+                "file": ["b1", "a1", "c1", "b2", "a2", "b3"],
+            }
+        )
+        p = Project.from_pandas(samples_df)
+        assert [s["sample_name"] for s in p.samples] == ["c", "b", "a"]
+        assert p.get_sample("b")["file"] == ["b1", "b2", "b3"]
+        assert p.get_sample("b")["protocol"] == "x"
+
     @pytest.mark.parametrize(
         "example_pep_cfg_path", ["subtable_automerge"], indirect=True
     )
@@ -727,6 +781,77 @@ class TestSampleAttrMap:
         p = Project(cfg=example_pep_cfg_path)
         assert len(p.samples[0]) == 4
 
+    @pytest.mark.parametrize("example_pep_cfg_path", ["append"], indirect=True)
+    def test_sample_shared_schema(self, example_pep_cfg_path):
+        """
+        Verify that samples of one table share the attribute layout and
+        keep their own values when attributes are added or removed
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        s1, s2 = p.samples[:2]
+        assert s1._schema is s2._schema
+        assert not hasattr(s1, "__dict__")
+        s1["extra"] = "value"
+        s1.other = "other"
+        del s1["organism"]
+        assert list(s1.keys())[-2:] == ["extra", "other"]
+        assert "organism" not in s1 and "organism" in s2
+        assert s1.extra == "value" and "extra" not in s2
+        with pytest.raises(AttributeError):
+            s2.extra
+        assert s1._schema is not s2._schema
+        s2["extra"] = "value"
+        s2.other = "other"
+        del s2["organism"]
+        assert s1._schema is s2._schema
+        assert s1 != s2 and s1.to_dict() != s2.to_dict()
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "custom_index"], indirect=True
+    )
+    def test_sample_project_reference_is_weak(self, example_pep_cfg_path):
+        """
+        Verify that samples refer to their project without keeping it alive,
+        so the project is freed without a garbage collector pass
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p.sample_table
+        assert p.samples[0].project is p
+        p_ref = weakref.ref(p)
+        s_ref = weakref.ref(p.samples[0])
+        gc.disable()
+        try:
+            del p
+            assert p_ref() is None and s_ref() is None
+        finally:
+            gc.enable()
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "custom_index"], indirect=True
+    )
+    @pytest.mark.parametrize("row_views", [False, True])
+    def test_samples_outliving_project_keep_it(self, example_pep_cfg_path, row_views):
+        """
+        Verify that the samples, or the samples list, that outlive their
+        project keep it alive
+        """
+        expected = Project(cfg=example_pep_cfg_path)
+        name = expected.samples[0].sample_name
+        s = Project(cfg=example_pep_cfg_path, row_views=row_views).samples[0]
+        samples = Project(cfg=example_pep_cfg_path, row_views=row_views).samples
+        gc.collect()
+        for sample in (s, samples[-1]):
+            assert sample.project is not None
+            assert sample.project.st_index == expected.st_index
+        assert s.sample_name == name
+        assert samples[0].sample_name == name
+        assert "prj: {}" not in s.to_yaml(add_prj_ref=True)
+        assert s.to_dict(add_prj_ref=True)["prj"] == dict(expected.config)
+        p_ref = weakref.ref(s.project)
+        del s, samples
+        gc.collect()
+        assert p_ref() is None
+
     @pytest.mark.parametrize("example_pep_cfg_path", ["subsamples_none"], indirect=True)
     def test_config_with_subsample_null(self, example_pep_cfg_path):
         """
@@ -744,3 +869,996 @@ class TestSampleAttrMap:
         """
         p = Project(cfg=example_pep_cfg_path)
         assert isinstance(p, Project)
+
+
+class TestSampleModifiers:
+    def test_from_pandas_subsamples_merged(self):
+        """
+        Verify that interleaved subsample rows are merged into the matching samples
+        """
+        samples_df = DataFrame(
+            {"sample_name": ["s1", "s2", "s3"], "file": ["multi", "multi", "single"]}
+        )
+        subsamples_df = DataFrame(
+            {
+                "sample_name": ["s2", "s1", "s2", "unknown", "s1"],
+                "file": ["s2_a", "s1_a", "s2_b", "x", "s1_b"],
+            }
+        )
+        p = Project.from_pandas(samples_df, sub_samples_df=[subsamples_df])
+        assert p.get_sample("s1")["file"] == ["s1_a", "s1_b"]
+        assert p.get_sample("s2")["file"] == ["s2_a", "s2_b"]
+        assert p.get_sample("s2")["subsample_name"] == ["0", "2"]
+        assert p.get_sample("s3")["file"] == "single"
+
+    def test_imply_indexed_rules(self):
+        """
+        Verify that implications match on all conditions, accept lists of
+        values and are applied in order, so that earlier rules can trigger later ones
+        """
+        samples_df = DataFrame(
+            {
+                "sample_name": ["s1", "s2", "s3", "s4"],
+                "organism": ["human", "mouse", "human", "frog"],
+                "assembly": ["hg38", "mm10", "hg19", "xt9"],
+            }
+        )
+        implications = [
+            {
+                "if": {"organism": "human", "assembly": ["hg38", "hg19"]},
+                "then": {"genome": "hg38"},
+            },
+            {"if": {"organism": ["mouse"]}, "then": {"genome": "mm10"}},
+            {"if": {"genome": "hg38"}, "then": {"resources": "human_resources"}},
+        ] + [
+            {"if": {"organism": f"org{i}"}, "then": {"genome": f"g{i}"}}
+            for i in range(500)
+        ]
+        config = {
+            "pep_version": "2.1.0",
+            "sample_modifiers": {"imply": implications},
+        }
+        p = Project.from_pandas(samples_df, config=config)
+        assert [s.get("genome") for s in p.samples] == ["hg38", "mm10", "hg38", None]
+        assert [s.get("resources") for s in p.samples] == [
+            "human_resources",
+            None,
+            "human_resources",
+            None,
+        ]
+
+    def test_imply_string_matches_substrings(self):
+        """
+        Verify that a string implier value matches the sample values that
+        are substrings of it, as it always has, and that a list matches
+        whole values only
+        """
+        samples_df = DataFrame(
+            {
+                "sample_name": ["s1", "s2", "s3", "s4"],
+                "organism": ["human", "hum", "mouse", "frog"],
+            }
+        )
+        implications = [
+            {"if": {"organism": "human_female"}, "then": {"genome": "hg38"}},
+            {"if": {"organism": ["mouse_male"]}, "then": {"genome": "mm10"}},
+            {"if": {"organism": "f" * 100 + "frog"}, "then": {"genome": "xt9"}},
+        ]
+        config = {
+            "pep_version": "2.1.0",
+            "sample_modifiers": {"imply": implications},
+        }
+        p = Project.from_pandas(samples_df, config=config)
+        assert [s.get("genome") for s in p.samples] == ["hg38", "hg38", None, "xt9"]
+
+    def test_derive_precompiled_sources(self):
+        """
+        Verify that derived sources are formatted for every sample, preserving
+        unknown placeholders and expanding multi-value attributes
+        """
+        samples_df = DataFrame(
+            {
+                "sample_name": ["s1", "s2", "s3"],
+                "file": ["src", "src", "other"],
+                "run": ["r1", "r2", "r3"],
+            }
+        )
+        subsamples_df = DataFrame({"sample_name": ["s2", "s2"], "run": ["r2a", "r2b"]})
+        config = {
+            "pep_version": "2.1.0",
+            "sample_modifiers": {
+                "derive": {
+                    "attributes": ["file"],
+                    "sources": {
+                        "src": "/data/{sample_name}/{run}.fq",
+                        "other": "{unknown}/{run}.fq",
+                    },
+                }
+            },
+        }
+        p = Project.from_pandas(
+            samples_df, sub_samples_df=[subsamples_df], config=config
+        )
+        assert p.get_sample("s1")["file"] == "/data/s1/r1.fq"
+        assert p.get_sample("s2")["file"] == ["/data/s2/r2a.fq", "/data/s2/r2b.fq"]
+        assert p.get_sample("s3")["file"] == "{unknown}/r3.fq"
+        assert p.get_sample("s3")["_key_file"] == "other"
+
+    def test_derive_concurrent_globbing(self, tmp_path):
+        """
+        Verify that expanding derived glob patterns in a thread pool gives
+        the same results, in the same sample order, as the serial expansion
+        """
+        for i in range(20):
+            for read in ["R1", "R2"]:
+                (tmp_path / f"s{i}_{read}.fq").write_text("")
+        DataFrame(
+            {
+                "sample_name": [f"s{i}" for i in range(20)] + ["missing"],
+                "reads": ["glob"] * 20 + ["glob"],
+                "single": ["exact"] * 21,
+            }
+        ).to_csv(tmp_path / "sample_table.csv", index=False)
+        config = {
+            "pep_version": "2.1.0",
+            "sample_table": "sample_table.csv",
+            "sample_modifiers": {
+                "derive": {
+                    "attributes": ["reads", "single"],
+                    "sources": {
+                        "glob": str(tmp_path / "{sample_name}_R*.fq"),
+                        "exact": str(tmp_path / "{sample_name}_R1.fq"),
+                    },
+                }
+            },
+        }
+        cfg_path = tmp_path / "project_config.yaml"
+        cfg_path.write_text(dump(config))
+        serial = Project(cfg=str(cfg_path))
+        concurrent = Project(cfg=str(cfg_path), derive_max_workers=4)
+        assert serial == concurrent
+        assert concurrent.samples[3]["reads"] == [
+            str(tmp_path / "s3_R1.fq"),
+            str(tmp_path / "s3_R2.fq"),
+        ]
+        assert concurrent.samples[-1]["reads"] == str(tmp_path / "missing_R*.fq")
+
+    def test_derive_lazy(self, tmp_path, monkeypatch):
+        """
+        Verify that lazily derived attributes are resolved on first access only
+        """
+        import peppy.sample
+
+        globbed = []
+        real_glob = peppy.sample.glob.glob
+        monkeypatch.setattr(
+            peppy.sample.glob,
+            "glob",
+            lambda p: globbed.append(p) or real_glob(p),
+        )
+        (tmp_path / "s1_R1.fq").write_text("")
+        DataFrame({"sample_name": ["s1", "s2"], "reads": ["glob", "glob"]}).to_csv(
+            tmp_path / "sample_table.csv", index=False
+        )
+        config = {
+            "pep_version": "2.1.0",
+            "sample_table": "sample_table.csv",
+            "sample_modifiers": {
+                "derive": {
+                    "attributes": ["reads"],
+                    "sources": {"glob": str(tmp_path / "{sample_name}_R*.fq")},
+                }
+            },
+        }
+        cfg_path = tmp_path / "project_config.yaml"
+        cfg_path.write_text(dump(config))
+        p = Project(cfg=str(cfg_path), lazy_derive=True)
+        assert globbed == []
+        p_lazy = Project(cfg=str(cfg_path), lazy_derive=True)
+        p_lazy.samples[0]["reads"]
+        assert p.samples[0] == p_lazy.samples[0] == p.samples[0].copy()
+        assert isinstance(p.samples[0].attributes["reads"], LazyDerivedAttribute)
+        assert p.samples[0] != {"sample_name": "s1"}
+        globbed.clear()
+        p = Project(cfg=str(cfg_path), lazy_derive=True)
+        assert p.samples[0].reads == str(tmp_path / "s1_R1.fq")
+        assert p.samples[0]["reads"] == str(tmp_path / "s1_R1.fq")
+        assert len(globbed) == 1
+        p.materialize_derived()
+        assert len(globbed) == 2
+        assert p.samples[1]["reads"] == str(tmp_path / "s2_R*.fq")
+        assert p == Project(cfg=str(cfg_path))
+        assert p.sample_table.equals(Project(cfg=str(cfg_path)).sample_table)
+
+    def test_modifier_processes(self, tmp_path):
+        """
+        Verify that applying sample modifiers in worker processes gives the
+        same samples, in the same order, as applying them in this process
+        """
+        DataFrame(
+            {
+                "sample_name": [f"s{i % 45}" for i in range(50)],
+                "organism": ["human", "mouse"] * 25,
+                "drop_me": ["x"] * 50,
+                "file": ["src"] * 50,
+            }
+        ).to_csv(tmp_path / "sample_table.csv", index=False)
+        config = {
+            "pep_version": "2.1.0",
+            "sample_table": "sample_table.csv",
+            "sample_modifiers": {
+                "remove": ["drop_me"],
+                "append": {"protocol": "ATAC"},
+                "duplicate": {"organism": "animal"},
+                "imply": [{"if": {"organism": "human"}, "then": {"genome": "hg38"}}],
+                "derive": {
+                    "attributes": ["file"],
+                    "sources": {"src": "/data/{sample_name}_{genome}.fq"},
+                },
+            },
+        }
+        cfg_path = tmp_path / "project_config.yaml"
+        cfg_path.write_text(dump(config))
+        serial = Project(cfg=str(cfg_path))
+        parallel = Project(cfg=str(cfg_path), modifier_processes=2)
+        assert [s.to_dict() for s in serial.samples] == [
+            s.to_dict() for s in parallel.samples
+        ]
+        assert all(s.project is parallel for s in parallel.samples[:40])
+        assert parallel.sample_table.equals(serial.sample_table)
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["subtable2"], indirect=True)
+    def test_multi_value_attributes(self, example_pep_cfg_path):
+        """
+        Verify that the merged attributes are read-only lists, so the sample
+        table cells cannot drift from the samples, and serialized as lists
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        s = p.get_sample("frog_1")
+        assert isinstance(s["file_id"], MultiValue)
+        assert isinstance(s["file"], list)
+        assert s["file_id"] == ["a", "b", "c"] and s["file_id"] != ["a", "b"]
+        assert repr(s["file_id"]) == repr(["a", "b", "c"])
+        assert s["file_id"] + ["d"] == ["a", "b", "c", "d"]
+        cell = p.sample_table.loc["frog_1", "file_id"]
+        assert cell == s["file_id"]
+        with pytest.raises(TypeError):
+            cell.append("d")
+        assert s["file_id"] == ["a", "b", "c"]
+        assert s.to_dict()["file_id"] == ["a", "b", "c"]
+        assert safe_load(s.to_yaml())["file_id"] == ["a", "b", "c"]
+        records = safe_load(safe_dump(p.sample_table.to_dict(orient="records")))
+        assert records[0]["file_id"] == ["a", "b", "c"]
+        s_copy = s.copy()
+        s_copy["file_id"] += ["d"]
+        assert s_copy["file_id"] == ["a", "b", "c", "d"]
+        assert s["file_id"] == ["a", "b", "c"]
+        assert pickle.loads(pickle.dumps(s["file_id"])) == s["file_id"]
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["subtable2"], indirect=True)
+    def test_multi_value_attributes_packed(self, example_pep_cfg_path):
+        """
+        Verify that in low memory mode the merged attributes of strings are
+        stored packed into a string and read as MultiValue lists
+        """
+        p = Project(cfg=example_pep_cfg_path, low_memory=True)
+        expected = Project(cfg=example_pep_cfg_path)
+        s = p.get_sample("frog_1")
+        assert isinstance(s._values[s._schema.slots["file_id"]], _PackedValues)
+        assert isinstance(s["file_id"], MultiValue)
+        assert s["file_id"] == ["a", "b", "c"]
+        assert s.attributes["file_id"] == ["a", "b", "c"]
+        assert [sample.to_dict() for sample in p.samples] == [
+            sample.to_dict() for sample in expected.samples
+        ]
+        assert p.sample_table.equals(expected.sample_table)
+        assert pickle.loads(pickle.dumps(s)) == s
+        s["file_id"] = MultiValue(["d", 1])
+        assert s["file_id"] == ["d", 1]
+
+
+class TestSampleUpdates:
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["basic", "derive_imply", "subtable1"], indirect=True
+    )
+    def test_append_rows(self, example_pep_cfg_path):
+        """
+        Verify that appending sample table rows to a project gives the same
+        samples and sample table as creating the project with all the rows
+        """
+        full = Project(cfg=example_pep_cfg_path)
+        rows = full[SAMPLE_DF_KEY]
+        p = Project.from_pandas(
+            rows.iloc[:2].copy(), full[SUBSAMPLE_DF_KEY], full.config
+        )
+        p.sample_table
+        new_samples = p.append_rows(rows.iloc[2:].to_dict(orient="records"))
+        assert [s.sample_name for s in new_samples] == list(
+            rows.iloc[2:]["sample_name"]
+        )
+        assert not p[SAMPLE_EDIT_FLAG_KEY]
+        assert [s.to_dict() for s in p.samples] == [s.to_dict() for s in full.samples]
+        assert p.sample_table.equals(full.sample_table)
+        assert p._raw_sample_table().to_dict(orient="records") == rows.to_dict(
+            orient="records"
+        )
+        with pytest.raises(IllegalStateException):
+            p.append_rows(rows.iloc[:1])
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["subtable2"], indirect=True)
+    def test_append_rows_low_memory(self, example_pep_cfg_path, monkeypatch):
+        """
+        Verify that appending rows in low memory mode does not read the
+        sample table again, and that the parsed table gets the rows when
+        it is read
+        """
+        p = Project(cfg=example_pep_cfg_path, low_memory=True)
+        read = []
+        monkeypatch.setattr(
+            p, "_read_sample_data", lambda: read.append(True), raising=False
+        )
+        assert p._project_data[SAMPLE_DF_KEY] is None
+        p.append_rows({"sample_name": "new", "protocol": "anySampleType"})
+        p.append_rows([{"sample_name": "newer", "protocol": "anySampleType"}])
+        assert not read and p.samples[-1].sample_name == "newer"
+        monkeypatch.undo()
+        assert p[SAMPLE_DF_KEY] is None
+        rows = p._raw_sample_table()
+        assert list(rows["sample_name"].iloc[-2:]) == ["new", "newer"]
+        assert len(rows) == len(Project(cfg=example_pep_cfg_path)[SAMPLE_DF_KEY]) + 2
+        with pytest.raises(IllegalStateException):
+            p.append_rows({"sample_name": "new"})
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["derive_imply"], indirect=True)
+    def test_apply_patch(self, example_pep_cfg_path):
+        """
+        Verify that patching sample attributes re-applies the dependent
+        implications and derivations and updates the sample table in place
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p.sample_table
+        long_patch = DataFrame(
+            {"sample_name": ["pig_0h"], "column": ["organism"], "value": ["frog"]}
+        )
+        wide_patch = DataFrame(
+            {"sample_name": ["frog_1h", "pig_1h"], "time": ["0", np.nan]}
+        )
+        assert [s.sample_name for s in p.apply_patch(long_patch)] == ["pig_0h"]
+        assert [s.sample_name for s in p.apply_patch(wide_patch)] == ["frog_1h"]
+        assert not p[SAMPLE_EDIT_FLAG_KEY]
+        rows = p[SAMPLE_DF_KEY].copy()
+        rows.loc[0, "organism"] = "frog"
+        rows.loc[3, "time"] = "0"
+        expected = Project.from_pandas(rows, config=p.config)
+        assert [s.to_dict() for s in p.samples] == [
+            s.to_dict() for s in expected.samples
+        ]
+        assert p.get_sample("pig_0h").genome == "xenTro9"
+        assert p.get_sample("frog_1h").file_path.endswith(
+            "frog_xenTro9_untreated.fastq"
+        )
+        assert p.sample_table.equals(expected.sample_table)
+        with pytest.raises(ValueError):
+            p.apply_patch(DataFrame({"sample_name": ["nonexistent"], "time": ["1"]}))
+        p.apply_patch(
+            DataFrame({"sample_name": ["pig_0h"], "column": ["reads"], "value": [5]})
+        )
+        assert type(p.get_sample("pig_0h")["reads"]) is int
+        p.st_index = ["sample_name", "organism"]
+        patched = p.apply_patch(
+            DataFrame({"sample_name": ["pig_0h"], "organism": ["frog"], "reads": [6]})
+        )
+        assert patched == [p.get_sample(("pig_0h", "frog"))]
+        assert patched[0]["reads"] == 6
+        with pytest.raises(KeyError):
+            p.apply_patch(DataFrame({"sample_name": ["pig_0h"], "reads": [7]}))
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["imply"], indirect=True)
+    def test_apply_patch_undoes_implications(self, example_pep_cfg_path):
+        """
+        Verify that patching the implier attributes removes the attributes
+        implied by the rules that no longer match, like reloading does
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p.sample_table
+        p.apply_patch(
+            DataFrame(
+                {
+                    "sample_name": ["human_1h", "mouse_0h", "frog_0h"],
+                    "organism": ["frog", "human", "mouse"],
+                }
+            )
+        )
+        rows = p[SAMPLE_DF_KEY].copy()
+        rows.loc[[2, 5, 0], "organism"] = ["frog", "human", "mouse"]
+        expected = Project.from_pandas(rows, config=p.config)
+        assert [s.to_dict() for s in p.samples] == [
+            s.to_dict() for s in expected.samples
+        ]
+        assert "genome" not in p.get_sample("human_1h")
+        assert p.sample_table.equals(expected.sample_table)
+        p.apply_patch(DataFrame({"sample_name": ["human_0h"], "genome": ["custom"]}))
+        assert p.get_sample("human_0h").genome == "hg38"
+        p.apply_patch(DataFrame({"sample_name": ["human_0h"], "organism": ["frog"]}))
+        assert p.get_sample("human_0h").genome == "custom"
+        assert "macs_genome_size" not in p.get_sample("human_0h")
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path, attrs",
+        [("basic", ["protocol", "file"]), ("imply", ["organism", "time"])],
+        indirect=["example_pep_cfg_path"],
+    )
+    def test_batch(self, example_pep_cfg_path, attrs):
+        """
+        Verify that the sample edits made in a batch are patched into
+        the sample table instead of regenerating it
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        table = p.sample_table
+        with p.batch():
+            for sample in p.samples:
+                sample[attrs[0]] = sample.sample_name.upper()
+        assert not p[SAMPLE_EDIT_FLAG_KEY]
+        patched = p.sample_table
+        assert list(patched[attrs[0]]) == [s.sample_name.upper() for s in p.samples]
+        assert patched is not table
+        p[SAMPLE_EDIT_FLAG_KEY] = True
+        assert patched.equals(p.sample_table)
+
+
+class TestIncrementalSampleTable:
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path, attrs",
+        [("basic", ["protocol", "file"]), ("imply", ["organism", "time"])],
+        indirect=["example_pep_cfg_path"],
+    )
+    def test_sample_table_incremental(self, example_pep_cfg_path, attrs, monkeypatch):
+        """
+        Verify that the sample table patched with sample edits, added and
+        removed samples is the same as the regenerated one
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        get_table = p._get_table_from_samples
+        regenerated = []
+
+        def _get_table_from_samples(index, initial=False, samples=None):
+            regenerated.append(samples is None)
+            return get_table(index, initial=initial, samples=samples)
+
+        def _assert_patched(expect_regenerated):
+            regenerated.clear()
+            patched = p.sample_table
+            assert any(regenerated) is expect_regenerated
+            p[SAMPLE_EDIT_FLAG_KEY] = True
+            assert patched.equals(p.sample_table)
+
+        monkeypatch.setattr(p, "_get_table_from_samples", _get_table_from_samples)
+        assert not p[SAMPLE_EDIT_FLAG_KEY]
+        p.sample_table
+        p.samples[1][attrs[0]] = "edited"
+        _assert_patched(expect_regenerated=False)
+        del p.samples[0][attrs[1]]
+        _assert_patched(expect_regenerated=False)
+        p.add_samples(Sample({"sample_name": "new", attrs[0]: "added"}, prj=p))
+        p.remove_samples([p.samples[0].sample_name])
+        _assert_patched(expect_regenerated=False)
+        p.samples[0]["new_attr"] = "val"
+        _assert_patched(expect_regenerated=True)
+        p._samples = list(reversed(p.samples))
+        _assert_patched(expect_regenerated=True)
+
+    @pytest.mark.parametrize("seed", range(5))
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["basic", "imply", "subtable2"], indirect=True
+    )
+    def test_sample_table_random_edits(self, example_pep_cfg_path, seed):
+        """
+        Verify that the sample table patched with random sample edits is
+        the same as the regenerated one, including the column types,
+        the missing values and the column order
+        """
+        rnd = random.Random(seed)
+        values = ["a", 1, 2.5, None, True, ["x", "y"], np.nan]
+        p = Project(cfg=example_pep_cfg_path)
+        p.sample_table
+        deleted = []
+        for _ in range(40):
+            s = rnd.choice(p.samples)
+            attrs = [k for k in s if not k.startswith("_") and k != p.st_index]
+            action = rnd.random()
+            if action < 0.5 and attrs:
+                s[rnd.choice(attrs)] = rnd.choice(values)
+            elif action < 0.7 and attrs:
+                attr = rnd.choice(attrs)
+                del s[attr]
+                deleted.append((s, attr))
+            elif deleted:
+                s, attr = deleted.pop()
+                if attr not in s:
+                    s[attr] = rnd.choice(values)
+            if rnd.random() < 0.5:
+                patched = p.sample_table
+                assert not p[SAMPLE_EDIT_FLAG_KEY]
+                regenerated = p._get_table_from_samples(index=p.st_index)
+                assert list(patched.columns) == list(regenerated.columns)
+                assert patched.equals(regenerated)
+
+
+class TestProjectCopy:
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "remove"], indirect=True
+    )
+    def test_copy(self, example_pep_cfg_path):
+        """
+        Verify that a project copy shares the tables and sample values with
+        the original until either one is modified
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        table = p.sample_table.copy()
+        p_copy = p.copy()
+        assert p_copy == p and p_copy.sample_table.equals(table)
+        assert p_copy.samples[0].project is p_copy and p.samples[0].project is p
+        s, s_copy = p.samples[0], p_copy.samples[0]
+        assert s_copy["organism"] is s["organism"]
+        assert all(
+            c._values._base is o._values for c, o in zip(p_copy.samples, p.samples)
+        )
+        s_copy["organism"] = "edited"
+        p.samples[1]["organism"] = "edited too"
+        assert s["organism"] != "edited"
+        assert p_copy.samples[1]["organism"] != "edited too"
+        assert p_copy.sample_table["organism"].iloc[0] == "edited"
+        assert p.sample_table["organism"].iloc[0] == table["organism"].iloc[0]
+        sample_copy = s.copy()
+        assert sample_copy == s and sample_copy.project is p
+        p.samples[2]["reads"] = [1]
+        p.copy().samples[2]["reads"].append(2)
+        assert p.samples[2]["reads"] == [1]
+
+    @pytest.mark.parametrize("copy_on_write", [True, False])
+    @pytest.mark.parametrize("example_pep_cfg_path", ["subtable1"], indirect=True)
+    def test_copy_table_edit(self, example_pep_cfg_path, copy_on_write):
+        """
+        Verify that editing the tables of a project copy in place does not
+        change the tables of the original project
+        """
+        with _copy_on_write_mode(copy_on_write):
+            p = Project(cfg=example_pep_cfg_path)
+            tables = [p.sample_table, p[SAMPLE_DF_KEY], p[SUBSAMPLE_DF_KEY][0]]
+            expected = [table.copy() for table in tables]
+            p_copy = p.copy()
+            copied = [
+                p_copy.sample_table,
+                p_copy[SAMPLE_DF_KEY],
+                p_copy[SUBSAMPLE_DF_KEY][0],
+            ]
+            for table in copied:
+                table.iloc[0, 0] = "edited"
+            for table, original in zip(tables, expected):
+                assert table.equals(original)
+            assert p.sample_table.equals(expected[0])
+
+    def test_copy_decorator_deprecated(self):
+        """
+        Verify that the deprecated copy class decorator still adds a deep
+        copying method
+        """
+
+        class Copyable:
+            def __init__(self):
+                self.values = ["a"]
+
+        with pytest.warns(DeprecationWarning):
+            copy_decorator(Copyable)
+        original = Copyable()
+        copied = original.copy()
+        assert copied.values == ["a"] and copied.values is not original.values
+
+
+class TestMemoryOptions:
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["append", "derive_imply", "remove"], indirect=True
+    )
+    def test_sample_row_views(self, example_pep_cfg_path):
+        """
+        Verify that samples can read their values from the sample table
+        and get their own values when they are edited
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p_views = Project(cfg=example_pep_cfg_path, row_views=True)
+        assert [s.to_dict() for s in p_views.samples] == [
+            s.to_dict() for s in p.samples
+        ]
+        assert not any(isinstance(s._values, list) for s in p_views.samples)
+        s1, s2 = p.samples[:2]
+        v1, v2 = p_views.samples[:2]
+        for s in (s1, v1):
+            s["time"] = "edited"
+        assert isinstance(v1._values, list)
+        assert not isinstance(v2._values, list)
+        assert v1 == s1 and v2 == s2
+        assert p_views.sample_table.equals(p.sample_table)
+        assert v1["time"] == "edited" and v2["time"] == s2["time"]
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["append", "derive_imply"], indirect=True
+    )
+    def test_sample_row_views_share_columns(self, example_pep_cfg_path):
+        """
+        Verify that the row views read the attributes the sample modifiers
+        set from the sample table, store the values the samples share once
+        and release the parsed sample table
+        """
+        p = Project(cfg=example_pep_cfg_path, row_views=True)
+        assert p._row_stores
+        for store in p._row_stores:
+            for key, (column, by_row) in zip(store.schema.keys, store.columns):
+                if key.startswith("_"):
+                    assert len(set(map(id, column))) == 1
+                else:
+                    assert by_row
+        assert p[SAMPLE_DF_KEY] is None
+        assert p.to_dict(extended=True) == Project(cfg=example_pep_cfg_path).to_dict(
+            extended=True
+        )
+
+    @pytest.mark.parametrize("copy_on_write", [True, False])
+    @pytest.mark.parametrize("example_pep_cfg_path", ["append"], indirect=True)
+    def test_sample_row_views_table_edit(self, example_pep_cfg_path, copy_on_write):
+        """
+        Verify that editing the sample table in place does not change
+        the samples that read their values from it
+        """
+        with _copy_on_write_mode(copy_on_write):
+            p = Project(cfg=example_pep_cfg_path, row_views=True)
+            expected = [s.to_dict() for s in p.samples]
+            p.sample_table.iloc[0, p.sample_table.columns.get_loc("time")] = "edited"
+            assert [s.to_dict() for s in p.samples] == expected
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "subtable2"], indirect=True
+    )
+    def test_low_memory(self, example_pep_cfg_path):
+        """
+        Verify that the parsed tables are released in low memory mode and
+        read again when they are needed
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p_low = Project(cfg=example_pep_cfg_path, low_memory=True)
+        assert p_low[SAMPLE_DF_KEY] is None and p_low._sample_table is None
+        assert [s.to_dict() for s in p_low.samples] == [s.to_dict() for s in p.samples]
+        assert p_low.sample_table.equals(p.sample_table)
+        assert p_low[SAMPLE_DF_KEY] is None
+        assert str(p_low.to_dict(extended=True)) == str(p.to_dict(extended=True))
+        assert p_low[SAMPLE_DF_KEY] is not None
+
+    def test_repeated_values_shared(self):
+        """
+        Verify that samples share the repeated values of the table
+        and of the derived attributes
+        """
+        samples_df = DataFrame(
+            {
+                "sample_name": ["a", "b", "c"],
+                "protocol": ["".join(["AT", "AC"]) for _ in range(3)],
+                "file": ["src"] * 3,
+            }
+        )
+        config = {
+            "pep_version": "2.1.0",
+            "sample_modifiers": {
+                "derive": {
+                    "attributes": ["file"],
+                    "sources": {"src": "/data/{protocol}.txt"},
+                }
+            },
+        }
+        p = Project.from_pandas(samples_df, config=config)
+        s1, s2, s3 = p.samples
+        assert s1["protocol"] is s2["protocol"] is s3["protocol"]
+        assert s1["file"] == "/data/ATAC.txt" and s1["file"] is s3["file"]
+        assert samples_df["protocol"][0] is not samples_df["protocol"][1]
+
+
+class TestSampleStore:
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "subtable2"], indirect=True
+    )
+    def test_sample_store(self, example_pep_cfg_path, tmp_path):
+        """
+        Verify that the samples kept in a sample store match the ones kept
+        in memory and that the edits of the evicted samples are kept
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        path = str(tmp_path / "samples.sqlite")
+        p_store = Project(
+            cfg=example_pep_cfg_path, sample_store=path, sample_cache_size=1
+        )
+        assert os.path.exists(path)
+        assert [s.to_dict() for s in p_store.samples] == [
+            s.to_dict() for s in p.samples
+        ]
+        assert p_store.sample_table.equals(p.sample_table)
+        name = p.samples[-1]["sample_name"]
+        assert p_store.get_sample(name) is p_store.samples[-1]
+        p_store.samples[0]["edited"] = "yes"
+        for _ in p_store.samples:
+            pass
+        assert p_store.samples[0]["edited"] == "yes"
+        assert p_store.sample_table["edited"].iloc[0] == "yes"
+        p_store.remove_samples(name)
+        assert [s["sample_name"] for s in p_store.samples] == [
+            s["sample_name"] for s in p.samples[:-1]
+        ]
+        assert len(p_store.sample_table) == len(p.samples) - 1
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["basic"], indirect=True)
+    def test_sample_store_keeps_other_tables(self, example_pep_cfg_path, tmp_path):
+        """
+        Verify that a sample store leaves the other tables of the database alone
+        """
+        path = str(tmp_path / "samples.sqlite")
+        with closing(sqlite3.connect(path)) as connection:
+            connection.execute("CREATE TABLE samples (name)")
+            connection.execute("INSERT INTO samples VALUES ('kept')")
+            connection.commit()
+        p = Project(cfg=example_pep_cfg_path, sample_store=path)
+        assert len(p.samples) == 2
+        with closing(sqlite3.connect(path)) as connection:
+            rows = connection.execute("SELECT name FROM samples").fetchall()
+        assert rows == [("kept",)]
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["basic", "derive_imply"], indirect=True
+    )
+    def test_sample_store_append_rows(self, example_pep_cfg_path, tmp_path):
+        """
+        Verify that the rows appended to a project with a sample store are
+        in the sample table
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p_store = Project(
+            cfg=example_pep_cfg_path, sample_store=str(tmp_path / "samples.sqlite")
+        )
+        p_store.sample_table
+        row = {"sample_name": "appended"}
+        p.append_rows(row)
+        p_store.append_rows(row)
+        assert list(p_store.sample_table.index) == list(p.sample_table.index)
+        assert p_store.sample_table.equals(p.sample_table)
+
+
+class TestSharingProcessedProjects:
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "subtable2"], indirect=True
+    )
+    def test_freeze(self, example_pep_cfg_path):
+        """
+        Verify that a frozen project has the same samples, which cannot be changed
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        p_frozen = Project(cfg=example_pep_cfg_path, lazy_derive=True).freeze()
+        assert [s.to_dict() for s in p_frozen.samples] == [
+            s.to_dict() for s in p.samples
+        ]
+        assert p_frozen.sample_table.equals(p.sample_table)
+        name = p.samples[0]["sample_name"]
+        assert p_frozen.get_sample(name).to_dict() == p.get_sample(name).to_dict()
+        assert p_frozen.samples[0].project is p_frozen
+        with pytest.raises(IllegalStateException):
+            p_frozen.samples[0]["sample_name"] = "renamed"
+        with pytest.raises(IllegalStateException):
+            p_frozen.remove_samples(name)
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "subtable2"], indirect=True
+    )
+    def test_publish(self, example_pep_cfg_path):
+        """
+        Verify that a project attached to in shared memory has the same samples
+        and does not keep its own copies of them for the sample table
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        shared_memory = p.publish()
+        try:
+            p_shared = Project.from_shared_memory(shared_memory.name)
+            assert [s.to_dict() for s in p_shared.samples] == [
+                s.to_dict() for s in p.samples
+            ]
+            assert p_shared.sample_table.equals(p.sample_table)
+            assert p_shared._table_samples is None
+            assert p_shared.config == p.config
+            name = p.samples[0]["sample_name"]
+            assert p_shared.get_sample(name).to_dict() == p.get_sample(name).to_dict()
+            with pytest.raises(IllegalStateException):
+                p_shared.samples[0]["sample_name"] = "renamed"
+            del p_shared
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "subtable2"], indirect=True
+    )
+    def test_publish_raw_tables(self, example_pep_cfg_path):
+        """
+        Verify that a project attached to in shared memory reads the parsed
+        tables from the files when they are requested
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        shared_memory = p.publish()
+        try:
+            p_shared = Project.from_shared_memory(shared_memory.name)
+            if p.subsample_table is None:
+                assert p_shared.subsample_table is None
+            else:
+                assert p_shared.subsample_table.equals(p.subsample_table)
+            assert p_shared.to_dict(extended=True) == p.to_dict(extended=True)
+            del p_shared
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    def test_publish_raw_tables_from_pandas(self):
+        """
+        Verify that a project created from a data frame and attached to in
+        shared memory is converted to a dict from its samples
+        """
+        df = DataFrame({"sample_name": ["a", "b"], "protocol": ["x", "y"]})
+        p = Project.from_pandas(df)
+        shared_memory = p.publish()
+        try:
+            p_shared = Project.from_shared_memory(shared_memory.name)
+            assert p_shared.subsample_table is None
+            p_dict = p_shared.to_dict(extended=True)
+            assert [s.to_dict() for s in Project.from_dict(p_dict).samples] == [
+                s.to_dict() for s in p.samples
+            ]
+            del p_shared
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["basic"], indirect=True)
+    def test_publish_unknown_resource_tracker(self, example_pep_cfg_path, monkeypatch):
+        """
+        Verify that a project is published and attached to when the process ID
+        of the resource tracker cannot be read
+        """
+        monkeypatch.setattr(resource_tracker, "_resource_tracker", object())
+        monkeypatch.setattr(resource_tracker, "ensure_running", lambda: None)
+        p = Project(cfg=example_pep_cfg_path)
+        shared_memory = p.publish()
+        try:
+            p_shared = Project.from_shared_memory(shared_memory.name)
+            assert p_shared.sample_table.equals(p.sample_table)
+            del p_shared
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    @pytest.mark.parametrize(
+        "example_pep_cfg_path", ["derive_imply", "subtable2"], indirect=True
+    )
+    def test_pickle_processed_state(self, example_pep_cfg_path, monkeypatch):
+        """
+        Verify that an unpickled project is restored without being processed
+        again, with its samples bound to it
+        """
+        p = Project(cfg=example_pep_cfg_path, lazy_derive=True)
+        data = pickle.dumps(p)
+        monkeypatch.setattr(Project, "create_samples", None)
+        p_unpickled = pickle.loads(data)
+        assert [s.to_dict() for s in p_unpickled.samples] == [
+            s.to_dict() for s in p.samples
+        ]
+        assert all(s.project is p_unpickled for s in p_unpickled.samples)
+        assert p_unpickled.sample_table.equals(p.sample_table)
+        p_unpickled.samples[0]["new_attr"] = "value"
+        assert p_unpickled.sample_table["new_attr"].iloc[0] == "value"
+        assert "new_attr" not in p.samples[0]
+
+
+class TestSampleLookup:
+    def test_sample_index_in_sync(self):
+        """
+        Verify that the samples are looked up by the current index values
+        """
+        samples_df = DataFrame(
+            {"sample_name": ["a", "b", "c"], "lane": ["1", "2", "1"]}
+        )
+        p = Project.from_pandas(samples_df)
+        assert p.get_sample("b")["lane"] == "2"
+        p.add_samples(Sample({"sample_name": "d", "lane": "2"}))
+        assert p.get_sample("d").project is p
+        p.get_sample("a")["sample_name"] = "e"
+        assert [s["sample_name"] for s in p.get_samples(["a", "e"])] == ["e"]
+        p.remove_samples(["b"])
+        assert p.get_samples(["b", "c"]) == [p.samples[1]]
+        p.samples.append(Sample({"sample_name": "f", "lane": "3"}))
+        assert p.get_sample("f")["lane"] == "3"
+        p.st_index = ["sample_name", "lane"]
+        assert p.get_sample(("d", "2")) is p.samples[2]
+        with pytest.raises(ValueError):
+            p.get_sample(("d", "1"))
+
+    def test_sample_index_trusted_on_miss(self, monkeypatch):
+        """
+        Verify that the names not found are looked up without building the
+        index anew, and that the sample edits are still found
+        """
+        samples_df = DataFrame({"sample_name": ["a", "b", "c"]})
+        p = Project.from_pandas(samples_df)
+        assert p.get_sample("b")["sample_name"] == "b"
+
+        def index_samples(prj):
+            raise AssertionError("the index was built anew")
+
+        monkeypatch.setattr(Project, "_index_samples", index_samples)
+        assert p.get_samples(["x", "y"]) == []
+        p.get_sample("a")["sample_name"] = "x"
+        assert p.get_samples(["a", "x"]) == [p.samples[0]]
+        monkeypatch.undo()
+        p.samples[1] = Sample({"sample_name": "y"})
+        # found by the name it replaced
+        assert p.get_samples(["b", "y"]) == [p.samples[1]]
+
+    @pytest.mark.parametrize("frozen", [False, True])
+    def test_select(self, frozen):
+        """
+        Verify that the samples are selected by their current attribute values
+        """
+        samples_df = DataFrame(
+            {
+                "sample_name": ["a", "b", "c", "d"],
+                "protocol": ["ATAC", "RNA", "ATAC", "ChIP"],
+                "genome": ["hg38", "hg38", "mm10", "hg38"],
+            }
+        )
+        p = Project.from_pandas(samples_df)
+        if frozen:
+            p.freeze()
+
+        def names(samples):
+            return [s["sample_name"] for s in samples]
+
+        assert names(p.select(protocol="ATAC", genome="hg38")) == ["a"]
+        assert names(p.select(protocol=["RNA", "ChIP"])) == ["b", "d"]
+        assert names(p.select("protocol == 'ATAC' or genome != 'hg38'")) == ["a", "c"]
+        assert names(p.select("not protocol in ('ATAC', 'RNA')")) == ["d"]
+        assert names(p.select("'b' <= sample_name < 'd'", genome="hg38")) == ["b"]
+        assert p.select(missing="x") == []
+        with pytest.raises(ValueError):
+            p.select("protocol == genome")
+        if not frozen:
+            p.get_sample("b")["protocol"] = "ATAC"
+            p.add_samples(Sample({"sample_name": "e", "protocol": "ATAC"}))
+            assert names(p.select(protocol="ATAC")) == ["a", "b", "c", "e"]
+            p.remove_samples(["a"])
+            assert names(p.select(protocol="ATAC", genome="hg38")) == ["b"]
+            p.get_sample("d").genome = "mm10"
+            p.get_sample("c").organism = "horse"
+            assert names(p.select(genome="mm10")) == ["c", "d"]
+            assert names(p.select(organism="horse")) == ["c"]
+
+    @pytest.mark.parametrize("example_pep_cfg_path", ["subtable2"], indirect=True)
+    def test_column(self, example_pep_cfg_path):
+        """
+        Verify that the attribute columns follow the sample edits and hold
+        the merged attribute values as lists
+        """
+        p = Project(cfg=example_pep_cfg_path)
+        files = p.column("file")
+        assert files.dtype == object and len(files) == len(p.samples)
+        assert list(files) == [s.to_dict()["file"] for s in p.samples]
+        assert any(isinstance(value, list) for value in files)
+        p.samples[0]["file"] = "edited"
+        del p.samples[1]["file"]
+        columns = p.columns(["sample_name", "file"], default="")
+        assert columns["file"][:2].tolist() == ["edited", ""]
+        assert columns["sample_name"].tolist() == [s["sample_name"] for s in p.samples]
+        p.samples[2].file = "assigned"
+        p.samples[2].organism = "horse"
+        assert p.column("file")[2] == "assigned"
+        assert p.column("organism")[2] == "horse"
+        assert p.sample_table["organism"].iloc[2] == "horse"